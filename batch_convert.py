@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Пакетная конвертация фиатных сумм в криптовалюту из командной строки
+
+Читает строки (amount, fiat, crypto) из CSV или JSONL потоком, порциями
+по CHUNK_SIZE строк. Для каждой порции собираются пары валют, цены которых
+еще неизвестны, и запрашиваются минимальным числом вызовов API. Память
+расходуется только на текущую порцию и таблицу уже известных курсов.
+
+Использование:
+    python batch_convert.py input.csv -o output.csv
+    cat input.jsonl | python batch_convert.py --format jsonl > output.jsonl
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+from itertools import islice
+
+from crypto_core import get_crypto_prices
+
+
+# Число строк, обрабатываемых за один проход
+CHUNK_SIZE = 10000
+
+# Сколько раз запрашивается пара, если запрос завершается ошибкой
+FETCH_ATTEMPTS = 3
+
+# Поля результата
+OUTPUT_FIELDS = ("amount", "fiat", "crypto", "price", "crypto_amount", "error")
+
+
+def read_csv_rows(stream):
+    """Чтение строк CSV с заголовком amount,fiat,crypto"""
+    yield from csv.DictReader(stream)
+
+
+def read_jsonl_rows(stream):
+    """Чтение строк JSONL: по одному JSON-объекту в строке"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Некорректная строка попадет в результат с описанием ошибки
+            yield None
+
+
+def csv_row_writer(stream):
+    """Создание функции записи строк результата в CSV"""
+    writer = csv.DictWriter(stream, fieldnames=OUTPUT_FIELDS, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    return writer.writerow
+
+
+def jsonl_row_writer(stream):
+    """Создание функции записи строк результата в JSONL"""
+    def write_row(row):
+        stream.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return write_row
+
+
+def fetch_pair_prices(pairs, client=None):
+    """Получение цен для набора пар минимальным числом запросов к API
+
+    Пары, по которым API ответил без цены, получают значение None; пары из
+    неудавшихся запросов в результат не попадают.
+    """
+    failed = set()
+    price_data = asyncio.run(get_crypto_prices(pairs, client=client, failed=failed))
+    return {
+        (crypto_id, vs_currency): price_data.get(crypto_id, {}).get(vs_currency)
+        for crypto_id, vs_currency in pairs
+        if (crypto_id, vs_currency) not in failed
+    }
+
+
+def convert_stream(rows, write_row, fetch_prices=fetch_pair_prices, chunk_size=CHUNK_SIZE,
+                   max_attempts=FETCH_ATTEMPTS):
+    """Потоковая конвертация строк с запросом курсов только для новых пар"""
+    prices = {}
+    failed_pairs = set()
+    attempts = {}  # пара -> число неудавшихся запросов
+    stats = {"rows": 0, "converted": 0, "errors": 0, "fetches": 0}
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        # Разбор порции и сбор пар, курс которых еще не запрашивался
+        parsed = []
+        missing = set()
+        for row in chunk:
+            try:
+                amount = float(row["amount"])
+                pair = (str(row["crypto"]).strip().lower(), str(row["fiat"]).strip().lower())
+            except (KeyError, TypeError, ValueError):
+                parsed.append((row, None, None))
+                continue
+
+            parsed.append((row, amount, pair))
+            if pair not in prices and pair not in failed_pairs:
+                missing.add(pair)
+
+        # Пары из неудавшихся запросов (таймаут, 429) запрашиваются повторно до записи
+        # порции, но не больше max_attempts раз за весь поток
+        while missing:
+            fetched = fetch_prices(missing)
+            stats["fetches"] += 1
+            retry = set()
+            for pair in missing:
+                if pair not in fetched:
+                    attempts[pair] = attempts.get(pair, 0) + 1
+                    if attempts[pair] >= max_attempts:
+                        failed_pairs.add(pair)
+                    else:
+                        retry.add(pair)
+                elif fetched[pair]:
+                    prices[pair] = fetched[pair]
+                else:
+                    failed_pairs.add(pair)
+            missing = retry
+
+        for row, amount, pair in parsed:
+            stats["rows"] += 1
+            row = row if isinstance(row, dict) else {}
+            result = {
+                "amount": row.get("amount"),
+                "fiat": row.get("fiat"),
+                "crypto": row.get("crypto"),
+                "price": None,
+                "crypto_amount": None,
+                "error": None,
+            }
+
+            if pair is None:
+                result["error"] = "некорректная строка"
+            elif amount <= 0:
+                result["error"] = "сумма должна быть больше нуля"
+            elif not prices.get(pair):
+                result["error"] = "нет данных о цене"
+            else:
+                result["price"] = prices[pair]
+                result["crypto_amount"] = amount / prices[pair]
+
+            if result["error"]:
+                stats["errors"] += 1
+            else:
+                stats["converted"] += 1
+            write_row(result)
+
+    return stats
+
+
+def detect_format(path, requested):
+    """Определение формата по аргументу --format или расширению файла"""
+    if requested:
+        return requested
+    if path and path.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+def main(argv=None):
+    """Точка входа командной строки"""
+    parser = argparse.ArgumentParser(description="Пакетная конвертация фиатных сумм в криптовалюту")
+    parser.add_argument("input", nargs="?", default="-", help="входной файл CSV/JSONL (по умолчанию stdin)")
+    parser.add_argument("-o", "--output", default="-", help="выходной файл (по умолчанию stdout)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="формат входных данных")
+    parser.add_argument("--output-format", choices=("csv", "jsonl"), help="формат результата (по умолчанию как у входа)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="число строк в одной порции")
+    args = parser.parse_args(argv)
+
+    input_format = detect_format(args.input if args.input != "-" else None, args.format)
+    output_format = args.output_format or input_format
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    target = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        rows = read_jsonl_rows(source) if input_format == "jsonl" else read_csv_rows(source)
+        write_row = jsonl_row_writer(target) if output_format == "jsonl" else csv_row_writer(target)
+        stats = convert_stream(rows, write_row, chunk_size=args.chunk_size)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    print(f"Обработано строк: {stats['rows']}, сконвертировано: {stats['converted']}, "
+          f"ошибок: {stats['errors']}, пакетов запросов: {stats['fetches']}", file=sys.stderr)
+    return 0 if stats["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
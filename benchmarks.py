@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Замеры производительности конвертера на локальном заменителе API
+
+Каждый замер выполняется несколько раз, по результатам считаются медиана
+и 95-й перцентиль. Быстрые операции (единицы микросекунд) замеряются
+сериями вызовов, чтобы одна выборка не состояла из шума таймера и
+планировщика. Результаты сравниваются с базовыми значениями из
+JSON-файла: регрессией считается медиана, которая выросла больше чем на
+заданный порог, вышла за 95-й перцентиль базового замера и отличается
+от базовой не меньше чем на BENCH_MIN_DELTA. Базовые значения зависят от
+машины, поэтому файл создается при первом запуске и обновляется флагом
+--update-baseline.
+
+Использование:
+    python run_all_tests.py --bench
+    python benchmarks.py --update-baseline
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from batch_convert import convert_stream, csv_row_writer, fetch_pair_prices, read_csv_rows
+from crypto_core import PriceClient, cryptocurrencies, fiat_currencies, get_crypto_price
+from currency_registry import crypto_registry, fiat_registry
+from mock_api import MockCoinGecko
+from result_view import FieldUpdater, result_fields
+
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Файл базовых значений и допустимое замедление медианы (25%)
+BENCH_BASELINE_PATH = os.path.join(PROJECT_DIR, "benchmark_baseline.json")
+BENCH_THRESHOLD = 0.25
+
+# Минимальное абсолютное замедление медианы, которое считается регрессией (50 мкс)
+BENCH_MIN_DELTA = 0.00005
+
+# Задержка заменителя API: замеры проверяют накладные расходы клиента, а не сети
+BENCH_API_LATENCY = 0.0
+
+# Число строк в замере пакетной конвертации
+BENCH_BATCH_ROWS = 20000
+
+
+def measure(func, repeat, warmup=1, batch=1):
+    """Время одного вызова func в секундах: repeat выборок по batch вызовов после прогрева"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(batch):
+            func()
+        timings.append((time.perf_counter() - start) / batch)
+    return timings
+
+
+def summarize(timings):
+    """Медиана и 95-й перцентиль замеров"""
+    ordered = sorted(timings)
+    return {
+        "median": statistics.median(ordered),
+        "p95": ordered[max(math.ceil(len(ordered) * 0.95) - 1, 0)],
+        "runs": len(ordered),
+    }
+
+
+def bench_price_cold(api):
+    """get_crypto_price без пула: каждый запрос открывает новое соединение"""
+    return measure(lambda: get_crypto_price("bitcoin", "usd", base_url=api.base_url), repeat=30)
+
+
+def bench_price_warm(api):
+    """get_crypto_price через пул постоянных соединений PriceClient"""
+    with PriceClient(base_url=api.base_url, rate=None) as client:
+        return measure(lambda: client.get_price("bitcoin", "usd"), repeat=30, batch=10)
+
+
+def bench_label_resolution(api):
+    """Поиск ключей валют по подписям, как в convert(), для всех пар"""
+    pairs = [(fiat_registry.label(fiat), crypto_registry.label(crypto))
+             for fiat in fiat_currencies for crypto in cryptocurrencies]
+
+    def resolve():
+        for fiat_label, crypto_label in pairs:
+            fiat_registry.id_for_label(fiat_label)
+            crypto_registry.id_for_label(crypto_label)
+
+    return measure(resolve, repeat=40, batch=50)
+
+
+def bench_batch_convert(api):
+    """Пакетная конвертация BENCH_BATCH_ROWS строк CSV"""
+    pairs = [(fiat, crypto) for fiat in fiat_currencies for crypto in cryptocurrencies]
+    lines = ["amount,fiat,crypto"]
+    lines.extend(f"{100 + index % 900},{pairs[index % len(pairs)][0]},{pairs[index % len(pairs)][1]}"
+                 for index in range(BENCH_BATCH_ROWS))
+    source = "\n".join(lines)
+
+    with PriceClient(base_url=api.base_url, rate=None) as client:
+        def run():
+            convert_stream(read_csv_rows(io.StringIO(source)), csv_row_writer(io.StringIO()),
+                           fetch_prices=lambda missing: fetch_pair_prices(missing, client))
+        return measure(run, repeat=5)
+
+
+def bench_result_fields(api):
+    """Форматирование и обновление полей окна результата (без Tk)"""
+    crypto_data = {"usd": 65000.0, "usd_market_cap": 1.2e12, "usd_24h_vol": 3e10, "usd_24h_change": 1.5}
+    updater = FieldUpdater({name: (lambda text: None)
+                            for name in ("result", "price", "market_cap", "volume", "change", "age")})
+    amounts = iter(range(10 ** 9))
+
+    def render():
+        amount = next(amounts)
+        updater.update(result_fields(amount, "usd", "Доллар США (USD)", amount / 65000.0, "Bitcoin (BTC)",
+                                     65000.0, crypto_data, 5))
+
+    return measure(render, repeat=20, batch=100)
+
+
+def bench_show_result(api):
+    """Показ результата в окне Tk (None, если дисплей недоступен)"""
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+
+    import crypto_currency
+    root.withdraw()
+    crypto_currency.root = root
+    # График не загружается: замеряется только обновление окна
+    crypto_currency.chart_loader = type("NoChart", (), {"submit": lambda self, *args, **kwargs: None})()
+    price_data = {"bitcoin": {"usd": 65000.0, "usd_market_cap": 1.2e12, "usd_24h_vol": 3e10,
+                              "usd_24h_change": 1.5}}
+    amounts = iter(range(1, 10 ** 9))
+
+    def show():
+        amount = next(amounts)
+        crypto_currency.show_result(amount, "usd", amount / 65000.0, crypto_registry.label("bitcoin"),
+                                    65000.0, price_data, 5)
+        root.update_idletasks()
+
+    try:
+        return measure(show, repeat=100)
+    finally:
+        root.destroy()
+
+
+def _import_time(module):
+    script = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - start)\n"
+    )
+    output = subprocess.run([sys.executable, "-c", script], cwd=PROJECT_DIR, capture_output=True,
+                            text=True, check=True, env={**os.environ, "DISPLAY": ""}).stdout
+    return float(output)
+
+
+def bench_import_core(api):
+    """Холодный импорт crypto_core в отдельном процессе"""
+    return [_import_time("crypto_core") for _ in range(7)]
+
+
+def bench_import_gui(api):
+    """Холодный импорт модуля интерфейса в отдельном процессе"""
+    return [_import_time("crypto_currency") for _ in range(7)]
+
+
+BENCHMARKS = {
+    "get_crypto_price_cold": bench_price_cold,
+    "get_crypto_price_warm": bench_price_warm,
+    "convert_label_resolution": bench_label_resolution,
+    "batch_convert_20k_rows": bench_batch_convert,
+    "result_fields_update": bench_result_fields,
+    "show_result_render": bench_show_result,
+    "import_crypto_core": bench_import_core,
+    "import_crypto_currency": bench_import_gui,
+}
+
+
+def load_baseline(path=BENCH_BASELINE_PATH):
+    """Базовые значения замеров (пустой словарь, если файла нет)"""
+    try:
+        with open(path, encoding="utf-8") as baseline_file:
+            return json.load(baseline_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baseline(results, path=BENCH_BASELINE_PATH):
+    """Сохранение результатов как новых базовых значений"""
+    with open(path, "w", encoding="utf-8") as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+
+def find_regressions(results, baseline, threshold=BENCH_THRESHOLD, min_delta=BENCH_MIN_DELTA):
+    """Замеры, медиана которых выросла сверх порога и разброса базового замера: {имя: (было, стало)}"""
+    regressions = {}
+    for name, summary in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        # Медиана в пределах разброса базового замера (p95) или меньше min_delta - шум
+        limit = max(previous["median"] * (1 + threshold), previous.get("p95", 0.0),
+                    previous["median"] + min_delta)
+        if summary["median"] > limit:
+            regressions[name] = (previous["median"], summary["median"])
+    return regressions
+
+
+def run_benchmarks(baseline_path=BENCH_BASELINE_PATH, threshold=BENCH_THRESHOLD, update_baseline=False,
+                   names=None):
+    """Выполнение замеров с выводом таблицы; возвращает True, если регрессий нет"""
+    baseline = load_baseline(baseline_path)
+    results = {}
+
+    print(f"{'Замер':<28} {'медиана':>12} {'p95':>12} {'база':>12}")
+    with MockCoinGecko(latency=BENCH_API_LATENCY) as api:
+        for name, bench in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            timings = bench(api)
+            if timings is None:
+                print(f"{name:<28} {'пропущен (нет дисплея)':>38}")
+                continue
+
+            results[name] = summarize(timings)
+            previous = baseline.get(name, {}).get("median")
+            previous_text = f"{previous * 1000:.3f} мс" if previous else "-"
+            print(f"{name:<28} {results[name]['median'] * 1000:>9.3f} мс {results[name]['p95'] * 1000:>9.3f} мс "
+                  f"{previous_text:>12}")
+
+    regressions = find_regressions(results, baseline, threshold)
+    for name, (previous, current) in regressions.items():
+        print(f"❌ Регрессия {name}: {previous * 1000:.3f} мс -> {current * 1000:.3f} мс "
+              f"(+{(current / previous - 1) * 100:.0f}%, порог {threshold * 100:.0f}%)")
+
+    if update_baseline or not baseline:
+        save_baseline({**baseline, **results}, baseline_path)
+        print(f"💾 Базовые значения сохранены в {baseline_path}")
+    return not regressions
+
+
+def main(argv=None):
+    """Запуск замеров из командной строки"""
+    parser = argparse.ArgumentParser(description="Замеры производительности конвертера")
+    parser.add_argument("names", nargs="*", help="выполнить только указанные замеры")
+    parser.add_argument("--baseline", default=BENCH_BASELINE_PATH, help="файл базовых значений")
+    parser.add_argument("--threshold", type=float, default=BENCH_THRESHOLD,
+                        help="допустимое замедление медианы (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="сохранить результаты как базовые")
+    args = parser.parse_args(argv)
+    return 0 if run_benchmarks(args.baseline, args.threshold, args.update_baseline, args.names) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
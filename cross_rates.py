@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Кросс-курсы через базовую валюту
+
+Цены всех криптовалют запрашиваются в одной базовой валюте (USD) одним
+запросом /simple/price, а курсы фиатных валют - одной таблицей
+/exchange_rates (стоимость BTC в каждой валюте). Любой курс
+криптовалюта/фиат, фиат/фиат или криптовалюта/криптовалюта выводится
+локально через стоимость обеих валют в базовой, поэтому число запросов
+к API не зависит от числа пар.
+
+Для каждого курса оценивается относительная погрешность. Она складывается
+из двух частей. Первая - округление исходных чисел API до последнего
+значащего разряда (для целых чисел нули в конце считаются округлением).
+Вторая - расхождение, наблюдаемое при сравнении с прямыми котировками
+(check): цены и таблица курсов запрашиваются в разные моменты, и эта
+составляющая обычно намного больше погрешности округления.
+
+Пример:
+    cross_rates.refresh()
+    cross_rates.rate("ethereum", "bitcoin")
+    cross_rates.rate("eur", "jpy")
+"""
+
+import sys
+import threading
+import time
+from decimal import Decimal
+
+from crypto_core import PRICE_CACHE_TTL, cryptocurrencies, get_price_client, rate_matrix
+from metrics import metrics
+
+
+# Валюта, в которой запрашиваются цены всех криптовалют
+CROSS_BASE = "usd"
+
+# Относительная погрешность одной операции с float
+FLOAT_EPSILON = sys.float_info.epsilon
+
+
+def fetch_exchange_rates(client=None):
+    """Таблица /exchange_rates: {код валюты: стоимость 1 BTC в этой валюте}"""
+    client = get_price_client() if client is None else client
+    data = client.get_json("/exchange_rates")
+    if not data or "rates" not in data:
+        return None
+    return {code: entry["value"] for code, entry in data["rates"].items() if entry.get("value")}
+
+
+def fetch_base_prices(crypto_ids, base=CROSS_BASE, client=None):
+    """Цены криптовалют в базовой валюте одним запросом /simple/price"""
+    client = get_price_client() if client is None else client
+    return client.get_price(",".join(crypto_ids), base)
+
+
+def quoted_precision(value):
+    """Относительная погрешность округления числа из ответа API: половина последнего значащего разряда"""
+    if not value:
+        return 0.0
+    # normalize() отбрасывает нули в конце: 65000 округлено до тысяч, а не до десятых
+    exponent = Decimal(repr(float(value))).normalize().as_tuple().exponent
+    return max(0.5 * 10.0 ** exponent / abs(value), FLOAT_EPSILON)
+
+
+class CrossRates:
+    """Курсы любых пар валют через стоимость каждой валюты в базовой"""
+
+    def __init__(self, crypto_ids=None, base=CROSS_BASE, max_age=PRICE_CACHE_TTL, clock=time.monotonic):
+        self.crypto_ids = list(cryptocurrencies) if crypto_ids is None else list(crypto_ids)
+        self.base = base
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.fetched_at = None
+        self._retry_at = None  # после неудачного обновления запросы откладываются на max_age
+        self.upstream_calls = 0
+        self.base_prices = {}
+        # Стоимость одной единицы валюты в базовой и относительная погрешность ее округления
+        self._values = {}
+        self._precision = {}
+        # Расхождение с прямыми котировками: по последней проверке check() и наибольшее за сеанс
+        self.last_error = None
+        self.peak_error = 0.0
+        self.checked = 0
+
+    def refresh(self, client=None):
+        """Обновление цен в базовой валюте и таблицы курсов: два запроса к API"""
+        with self._lock:
+            base_prices = fetch_base_prices(self.crypto_ids, self.base, client)
+            exchange_rates = fetch_exchange_rates(client)
+            self.upstream_calls += 2
+            if not base_prices or not exchange_rates or self.base not in exchange_rates:
+                self._retry_at = self._clock() + self.max_age
+                return False
+            self.load(base_prices, exchange_rates)
+            self.fetched_at = self._clock()
+            self._retry_at = None
+        # Прямые курсы матрицы уже в памяти: расхождение проверяется без запросов
+        self.check(rate_matrix.data)
+        return True
+
+    def ensure_fresh(self, client=None):
+        """Обновление устаревшей таблицы (не чаще раза в max_age после ошибки)"""
+        if self.is_fresh():
+            return True
+        if self._retry_at is not None and self._clock() < self._retry_at:
+            return False
+        return self.refresh(client)
+
+    def load(self, base_prices, exchange_rates):
+        """Построение таблицы стоимости валют в базовой из ответов API"""
+        values, precision = {}, {}
+        # Стоимость BTC в базовой валюте, деленная на стоимость BTC в валюте code
+        base_per_btc = exchange_rates[self.base]
+        base_precision = quoted_precision(base_per_btc)
+        for code, per_btc in exchange_rates.items():
+            values[code] = base_per_btc / per_btc
+            precision[code] = 0.0 if code == self.base else base_precision + quoted_precision(per_btc)
+
+        # Цены криптовалют в базовой валюте известны напрямую
+        for crypto_id, crypto_data in base_prices.items():
+            price = crypto_data.get(self.base)
+            if price:
+                values[crypto_id] = price
+                precision[crypto_id] = quoted_precision(price)
+
+        self.base_prices = base_prices
+        self._values = values
+        self._precision = precision
+
+    def is_fresh(self):
+        """Проверка, что таблица загружена и не старше max_age"""
+        return self.fetched_at is not None and self._clock() - self.fetched_at <= self.max_age
+
+    def age(self):
+        """Возраст таблицы в секундах (None, если она еще не загружена)"""
+        return None if self.fetched_at is None else self._clock() - self.fetched_at
+
+    def base_values(self):
+        """Стоимость одной единицы каждой валюты в базовой: {код: стоимость}"""
+        return dict(self._values)
+
+    def covers(self, source, target):
+        """Проверка, что курс пары можно вывести из таблицы"""
+        return source in self._values and target in self._values
+
+    def rate(self, source, target):
+        """Сколько единиц target стоит одна единица source (None, если пары нет)"""
+        if not self.covers(source, target):
+            return None
+        return self._values[source] / self._values[target]
+
+    def error_bound(self, source, target):
+        """Оценка относительной погрешности курса rate(source, target)
+
+        Округление исходных чисел плюс расхождение с прямыми котировками
+        по последней проверке check(); до первой проверки - только округление.
+        """
+        if not self.covers(source, target):
+            return None
+        rounding = self._precision[source] + self._precision[target] + FLOAT_EPSILON
+        return rounding + (self.last_error or 0.0)
+
+    def quote(self, crypto_id, vs_currency):
+        """Данные по паре в формате get_crypto_price (без изменения за 24ч)"""
+        price = self.rate(crypto_id, vs_currency)
+        crypto_data = self.base_prices.get(crypto_id)
+        if price is None or not crypto_data:
+            return None
+
+        # Капитализация и объем пересчитываются по курсу базовой валюты; изменение
+        # за 24ч в другой валюте зависит от движения курса фиата и не выводится
+        fx = self.rate(self.base, vs_currency)
+        quote = {vs_currency: price}
+        for suffix in ("market_cap", "24h_vol"):
+            value = crypto_data.get(f"{self.base}_{suffix}")
+            if value is not None:
+                quote[f"{vs_currency}_{suffix}"] = value * fx
+        if "last_updated_at" in crypto_data:
+            quote["last_updated_at"] = crypto_data["last_updated_at"]
+        return {crypto_id: quote}
+
+    def check(self, price_data):
+        """Сравнение с прямыми котировками {криптовалюта: {валюта: цена}}; наибольшее расхождение или None"""
+        worst = 0.0
+        compared = 0
+        for crypto_id, crypto_data in (price_data or {}).items():
+            for vs_currency, direct in crypto_data.items():
+                if not isinstance(direct, (int, float)) or "_" in vs_currency or not direct:
+                    continue
+                derived = self.rate(crypto_id, vs_currency)
+                if derived is None:
+                    continue
+                worst = max(worst, abs(derived - direct) / abs(direct))
+                compared += 1
+        # Без общих пар расхождение неизвестно: результат прошлой проверки сохраняется
+        if not compared:
+            return None
+        self.checked += compared
+        self.last_error = worst
+        self.peak_error = max(self.peak_error, worst)
+        return worst
+
+
+# Общая таблица кросс-курсов приложения
+cross_rates = CrossRates()
+
+
+def collect_cross_rate_metrics(registry):
+    """Перенос статистики кросс-курсов в метрики"""
+    registry.set_counter("cross_rate_upstream_calls_total", cross_rates.upstream_calls)
+    if cross_rates.last_error is not None:
+        registry.set_gauge("cross_rate_error_ratio", cross_rates.last_error)
+    registry.set_gauge("cross_rate_peak_error_ratio", cross_rates.peak_error)
+
+
+metrics.register_collector(collect_cross_rate_metrics)
@@ -0,0 +1,659 @@
+# -*- coding: utf-8 -*-
+"""
+Ядро конвертера криптовалют без графического интерфейса
+
+Содержит справочники валют, клиент CoinGecko API, кэш котировок,
+матрицу курсов и вспомогательные средства для фоновых запросов.
+Модуль не импортирует tkinter, а requests загружается только при
+первом обращении к API, поэтому импорт занимает единицы миллисекунд
+и не требует графического окружения.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import metrics
+from rate_limit import BULK_TOKEN_CAPACITY, BULK_TOKEN_RATE, TOKEN_CAPACITY, TOKEN_RATE, SingleFlight, TokenBucket
+
+
+def _import_requests():
+    """Отложенный импорт requests при первом обращении к API"""
+    global requests
+    import requests
+    return requests
+
+
+def __getattr__(name):
+    # Доступ к crypto_core.requests (например, из unittest.mock.patch) загружает модуль
+    if name == "requests":
+        return _import_requests()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Словарь ТОП 15 поддерживаемых криптовалют
+cryptocurrencies = {
+    "bitcoin": "Bitcoin (BTC)",
+    "ethereum": "Ethereum (ETH)",
+    "tether": "Tether (USDT)",
+    "solana": "Solana (SOL)",
+    "ripple": "Ripple (XRP)",
+    "cardano": "Cardano (ADA)",
+    "dogecoin": "Dogecoin (DOGE)",
+    "polkadot": "Polkadot (DOT)",
+    "tron": "Tron (TRX)",
+    "chainlink": "Chainlink (LINK)",
+    "polygon": "Polygon (MATIC)",
+    "wrapped-bitcoin": "Wrapped Bitcoin (WBTC)",
+    "litecoin": "Litecoin (LTC)",
+    "bitcoin-cash": "Bitcoin Cash (BCH)",
+    "dai": "Dai (DAI)"
+}
+
+# Словарь ТОП 15 поддерживаемых фиатных валют
+fiat_currencies = {
+    "usd": "Доллар США (USD)",
+    "eur": "Евро (EUR)",
+    "gbp": "Фунт стерлингов (GBP)",
+    "jpy": "Японская иена (JPY)",
+    "cny": "Китайский юань (CNY)",
+    "aud": "Австралийский доллар (AUD)",
+    "cad": "Канадский доллар (CAD)",
+    "chf": "Швейцарский франк (CHF)",
+    "hkd": "Гонконгский доллар (HKD)",
+    "sgd": "Сингапурский доллар (SGD)",
+    "sek": "Шведская крона (SEK)",
+    "nok": "Норвежская крона (NOK)",
+    "krw": "Южнокорейская вона (KRW)",
+    "inr": "Индийская рупия (INR)",
+    "rub": "Российский рубль (RUB)",
+}
+
+
+# Базовый адрес CoinGecko API (можно заменить, например, на локальный mock_api.py)
+API_URL = os.environ.get("VALUTUS_API_URL", "https://api.coingecko.com/api/v3")
+
+
+# Каталог локальных данных приложения (кэш справочников, котировок)
+DATA_DIR = os.environ.get("VALUTUS_DATA_DIR", os.path.join(os.path.expanduser("~"), ".valutus"))
+
+
+def _metric_path(path):
+    """Путь запроса для меток метрик: id монеты заменяется шаблоном, чтобы не плодить серии"""
+    parts = path.split("/")
+    if len(parts) > 3 and parts[1] == "coins":
+        parts[2] = "{id}"
+    return "/".join(parts)
+
+
+def fetch_api_json(path, params=None, session=None, base_url=API_URL):
+    """Выполнение GET-запроса к CoinGecko API (None при любой ошибке)"""
+    metric_path = _metric_path(path)
+    stage = "network"
+    start = time.perf_counter()
+    try:
+        # Запрос через сессию переиспользует уже открытое соединение
+        http = _import_requests() if session is None else session
+        # Этапы запроса замеряются отдельно: сеть, проверка статуса, разбор JSON
+        with metrics.timer("api_stage_seconds", stage=stage):
+            response = http.get(f"{base_url}{path}", params=params, timeout=10)
+        stage = "status"
+        with metrics.timer("api_stage_seconds", stage=stage):
+            response.raise_for_status()
+        stage = "decode"
+        with metrics.timer("api_stage_seconds", stage=stage):
+            data = response.json()
+        metrics.observe("api_request_seconds", time.perf_counter() - start, path=metric_path)
+        return data
+        
+    except Exception as e:
+        # Ошибки считаются по этапу и коду ответа (или типу исключения)
+        status_code = getattr(getattr(e, "response", None), "status_code", None)
+        metrics.increment("api_errors_total", path=metric_path, stage=stage,
+                          kind=str(status_code) if status_code else type(e).__name__)
+        print(f"Ошибка запроса к CoinGecko API ({path}): {e}", file=sys.stderr)
+        return None
+
+
+def get_crypto_price(crypto_id, vs_currency, session=None, base_url=API_URL):
+    """Получение данных о криптовалюте через CoinGecko API"""
+    params = {
+        "ids": crypto_id,
+        "vs_currencies": vs_currency,
+        "include_market_cap": "true",
+        "include_24hr_vol": "true",
+        "include_24hr_change": "true",
+        "include_last_updated_at": "true"
+    }
+    return fetch_api_json("/simple/price", params, session=session, base_url=base_url)
+
+
+# Настройки HTTP-клиента
+PRICE_CLIENT_POOL_SIZE = 4  # число постоянных соединений в пуле
+PRICE_CLIENT_RETRIES = 3  # число повторов при сетевых ошибках и ответах 429/5xx
+
+# Значение limiter по умолчанию: ограничитель самого клиента
+_CLIENT_LIMITER = object()
+
+
+class PriceClient:
+    """Клиент CoinGecko API с пулом постоянных соединений (keep-alive)"""
+
+    def __init__(self, pool_size=PRICE_CLIENT_POOL_SIZE, retries=PRICE_CLIENT_RETRIES,
+                 backoff_factor=0.5, base_url=API_URL, rate=TOKEN_RATE, burst=TOKEN_CAPACITY, limiter=None):
+        _import_requests()
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.base_url = base_url
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+        )
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+
+        # Одинаковые одновременные запросы выполняются один раз, а запросы
+        # к API проходят через ограничитель скорости (rate=None - без ограничения).
+        # Пакетные задания передают в запрос собственный ограничитель (limiter=...)
+        self.flights = SingleFlight()
+        if limiter is None:
+            limiter = TokenBucket(rate, burst) if rate else None
+        self.limiter = limiter
+
+    def _limited(self, limiter, func, *args):
+        limiter = self.limiter if limiter is _CLIENT_LIMITER else limiter
+        if limiter is not None:
+            limiter.acquire()
+        return func(*args)
+
+    def get_price(self, crypto_id, vs_currency, limiter=_CLIENT_LIMITER):
+        """Получение данных о криптовалюте через общий пул соединений (limiter=None - без ограничения)"""
+        # Порядок валют в списке не влияет на ответ, поэтому не влияет и на ключ
+        key = ("/simple/price", ",".join(sorted(crypto_id.split(","))), ",".join(sorted(vs_currency.split(","))))
+        return self.flights.do(key, self._limited, limiter, get_crypto_price, crypto_id, vs_currency,
+                               self.session, self.base_url)
+
+    def get_json(self, path, params=None, limiter=_CLIENT_LIMITER):
+        """Произвольный GET-запрос к API через общий пул соединений"""
+        key = (path, tuple(sorted((params or {}).items())))
+        return self.flights.do(key, self._limited, limiter, fetch_api_json, path, params, self.session,
+                               self.base_url)
+
+    def connection_stats(self):
+        """Статистика переиспользования соединений пула"""
+        requests_sent = 0
+        connections_opened = 0
+        pools = self._adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            requests_sent += pool.num_requests
+            connections_opened += pool.num_connections
+
+        reused = max(requests_sent - connections_opened, 0)
+        return {
+            "requests": requests_sent,
+            "connections_opened": connections_opened,
+            "connections_reused": reused,
+            "reuse_ratio": reused / requests_sent if requests_sent else 0.0,
+        }
+
+    def close(self):
+        """Закрытие всех соединений пула"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Общий HTTP-клиент приложения создается при первом запросе
+price_client = None
+_price_client_lock = threading.Lock()
+
+
+def get_price_client():
+    """Получение общего HTTP-клиента приложения"""
+    global price_client
+    with _price_client_lock:
+        if price_client is None:
+            price_client = PriceClient()
+        return price_client
+
+
+# Настройки кэша котировок
+PRICE_CACHE_TTL = 60  # время жизни котировки в секундах
+PRICE_CACHE_SIZE = 256  # максимальное число хранимых пар
+PRICE_STALE_TTL = 24 * 60 * 60  # сколько секунд устаревшая котировка может показываться до обновления
+
+
+class QuoteCache:
+    """Кэш котировок с временем жизни записей (TTL) и вытеснением LRU"""
+
+    def __init__(self, ttl=PRICE_CACHE_TTL, maxsize=PRICE_CACHE_SIZE, clock=time.monotonic, stale_ttl=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # Записи старше ttl хранятся до stale_ttl для выдачи через get_stale
+        self.stale_ttl = ttl if stale_ttl is None else max(ttl, stale_ttl)
+        # Хранилища на диске, в которые дублируются новые котировки (quote_store, tick_store)
+        self.stores = []
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+
+    def get(self, key):
+        """Получение котировки из кэша (None, если записи нет или она устарела)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            age = self._clock() - stored_at
+            if age > self.ttl:
+                # Устаревшая запись считается промахом и удаляется, если
+                # ее нельзя выдать даже как устаревшую
+                if age > self.stale_ttl:
+                    del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key):
+        """Котировка вместе с возрастом в секундах, даже если она старше TTL"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            stored_at, value = entry
+            age = self._clock() - stored_at
+            if age > self.stale_ttl:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            if age > self.ttl:
+                self.stale_hits += 1
+            return value, age
+
+    def put(self, key, value, age=0.0):
+        """Сохранение котировки с вытеснением давно не использованных записей
+
+        age - возраст котировки в секундах, если она получена не сейчас
+        (например, загружена из хранилища на диске).
+        """
+        with self._lock:
+            self._entries[key] = (self._clock() - age, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+        if not age:
+            for store in self.stores:
+                store.add(key, value)
+
+    def clear(self):
+        """Очистка кэша без сброса счетчиков"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Статистика попаданий, промахов и вытеснений"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale_hits": self.stale_hits,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+# Общий кэш котировок приложения (хранит и устаревшие котировки)
+price_cache = QuoteCache(stale_ttl=PRICE_STALE_TTL)
+
+
+def collect_client_metrics(registry):
+    """Перенос статистики кэша котировок и ограничителя запросов в метрики"""
+    for name, value in price_cache.stats().items():
+        if name == "hit_ratio":
+            registry.set_gauge("price_cache_hit_ratio", value)
+        elif name == "size":
+            registry.set_gauge("price_cache_size", value)
+        else:
+            registry.set_counter(f"price_cache_{name}_total", value)
+    client = price_client
+    if client is not None:
+        registry.set_counter("api_requests_shared_total", client.flights.shared)
+        if client.limiter is not None:
+            registry.set_counter("rate_limit_waits_total", client.limiter.waits)
+            registry.set_counter("rate_limit_wait_seconds_total", client.limiter.waited_seconds)
+
+
+metrics.register_collector(collect_client_metrics)
+metrics.describe("api_stage_seconds", "Длительность этапов запроса к API: network, status, decode")
+metrics.describe("api_request_seconds", "Полная длительность успешного запроса к API")
+metrics.describe("api_errors_total", "Ошибки запросов к API по этапу и коду ответа")
+metrics.describe("price_cache_hit_ratio", "Доля попаданий в кэш котировок")
+
+
+def extract_quote(price_data, crypto_id, vs_currency):
+    """Данные одной пары из пакетного ответа API в формате get_crypto_price"""
+    crypto_data = (price_data or {}).get(crypto_id)
+    if not crypto_data or vs_currency not in crypto_data:
+        return None
+
+    fields = (vs_currency, f"{vs_currency}_market_cap", f"{vs_currency}_24h_vol", f"{vs_currency}_24h_change",
+              "last_updated_at")
+    return {crypto_id: {field: crypto_data[field] for field in fields if field in crypto_data}}
+
+
+def fetch_rate_matrix(crypto_ids=None, vs_currencies=None, client=None):
+    """Получение курсов всех криптовалют ко всем фиатным валютам одним запросом"""
+    client = get_price_client() if client is None else client
+    crypto_ids = list(cryptocurrencies) if crypto_ids is None else list(crypto_ids)
+    vs_currencies = list(fiat_currencies) if vs_currencies is None else list(vs_currencies)
+    # Эндпоинт /simple/price принимает списки ids и vs_currencies через запятую
+    return client.get_price(",".join(crypto_ids), ",".join(vs_currencies))
+
+
+class RateMatrix:
+    """Матрица курсов криптовалюта x фиатная валюта, хранимая в памяти"""
+
+    def __init__(self, crypto_ids=None, vs_currencies=None, max_age=PRICE_CACHE_TTL, clock=time.monotonic):
+        self.crypto_ids = list(cryptocurrencies) if crypto_ids is None else list(crypto_ids)
+        self.vs_currencies = list(fiat_currencies) if vs_currencies is None else list(vs_currencies)
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.data = {}
+        self.fetched_at = None
+
+    def refresh(self):
+        """Обновление всей матрицы одним запросом к API"""
+        with self._lock:
+            data = fetch_rate_matrix(self.crypto_ids, self.vs_currencies)
+            if not data:
+                return False
+            self.data = data
+            self.fetched_at = self._clock()
+            return True
+
+    def is_fresh(self):
+        """Проверка, что матрица загружена и не старше max_age"""
+        return self.fetched_at is not None and self._clock() - self.fetched_at <= self.max_age
+
+    def age(self):
+        """Возраст матрицы в секундах (None, если она еще не загружена)"""
+        return None if self.fetched_at is None else self._clock() - self.fetched_at
+
+    def covers(self, crypto_id, vs_currency):
+        """Проверка, что пара входит в матрицу"""
+        return crypto_id in self.crypto_ids and vs_currency in self.vs_currencies
+
+    def price(self, crypto_id, vs_currency):
+        """Цена одной единицы криптовалюты (None, если пары нет в матрице)"""
+        return self.data.get(crypto_id, {}).get(vs_currency)
+
+    def quote(self, crypto_id, vs_currency):
+        """Данные по паре в том же формате, что возвращает get_crypto_price"""
+        return extract_quote(self.data, crypto_id, vs_currency)
+
+
+# Общая матрица курсов приложения
+rate_matrix = RateMatrix()
+
+
+def get_quote(crypto_id, vs_currency):
+    """Получение котировки: из кэша, из матрицы курсов, через кросс-курс или отдельным запросом"""
+    key = (crypto_id, vs_currency)
+    quote = price_cache.get(key)
+    if quote is not None:
+        return quote
+
+    if rate_matrix.covers(crypto_id, vs_currency):
+        if not rate_matrix.is_fresh():
+            rate_matrix.refresh()
+        quote = rate_matrix.quote(crypto_id, vs_currency)
+
+    elif crypto_id in rate_matrix.crypto_ids:
+        # Валюты вне матрицы выводятся через кросс-курс: два запроса на все пары
+        from cross_rates import cross_rates
+        if cross_rates.ensure_fresh():
+            quote = cross_rates.quote(crypto_id, vs_currency)
+
+    if not quote:
+        quote = get_price_client().get_price(crypto_id, vs_currency)
+    if quote:
+        price_cache.put(key, quote)
+    return quote
+
+
+# Пары, обновляемые в фоне после выдачи устаревшей котировки
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+
+def revalidate_quote(crypto_id, vs_currency):
+    """Фоновое обновление котировки в кэше (не более одного потока на пару)"""
+    key = (crypto_id, vs_currency)
+    with _revalidating_lock:
+        if key in _revalidating:
+            return False
+        _revalidating.add(key)
+
+    def run():
+        try:
+            get_quote(crypto_id, vs_currency)
+        finally:
+            with _revalidating_lock:
+                _revalidating.discard(key)
+
+    threading.Thread(target=run, name=f"revalidate-{crypto_id}-{vs_currency}", daemon=True).start()
+    return True
+
+
+def get_quote_with_age(crypto_id, vs_currency, revalidate=revalidate_quote):
+    """Котировка и ее возраст: последняя известная сразу, обновление в фоне
+
+    Возвращает (котировка, возраст в секундах) или (None, None), если
+    котировки нет ни в кэше, ни в ответе API.
+    """
+    entry = price_cache.get_stale((crypto_id, vs_currency))
+    if entry is None:
+        # Котировки еще нет: ждать ответа API приходится в любом случае
+        quote = get_quote(crypto_id, vs_currency)
+        return (quote, 0.0) if quote else (None, None)
+
+    quote, age = entry
+    if age > price_cache.ttl:
+        revalidate(crypto_id, vs_currency)
+    return quote, age
+
+
+def peek_quote(crypto_id, vs_currency, revalidate=revalidate_quote):
+    """Котировка и ее возраст только из кэша, без ожидания сети
+
+    Отсутствующая или устаревшая котировка запрашивается в фоне,
+    а до ее получения возвращается (None, None) или старое значение.
+    """
+    entry = price_cache.get_stale((crypto_id, vs_currency))
+    if entry is None or entry[1] > price_cache.ttl:
+        revalidate(crypto_id, vs_currency)
+    return entry or (None, None)
+
+
+def quote_age(quote, crypto_id, cached_age=0.0, now=None):
+    """Возраст данных котировки с учетом last_updated_at из CoinGecko"""
+    now = time.time() if now is None else now
+    last_updated_at = ((quote or {}).get(crypto_id) or {}).get("last_updated_at")
+    if last_updated_at is None:
+        return cached_age
+    return max(cached_age, now - last_updated_at)
+
+
+def format_age(seconds):
+    """Возраст данных для показа пользователю"""
+    seconds = max(int(seconds), 0)
+    if seconds < 10:
+        return "только что"
+    if seconds < 60:
+        return f"{seconds} сек назад"
+    if seconds < 60 * 60:
+        return f"{seconds // 60} мин назад"
+    return f"{seconds // 3600} ч {seconds % 3600 // 60} мин назад"
+
+
+# Настройки параллельного получения котировок
+PRICE_FETCH_CONCURRENCY = PRICE_CLIENT_POOL_SIZE  # одновременных запросов к API
+PRICE_BATCH_MAX_IDS = 50  # криптовалют в одном запросе
+
+# Общий ограничитель пакетных заданий: не зависит от ограничения запросов интерфейса
+bulk_limiter = TokenBucket(BULK_TOKEN_RATE, BULK_TOKEN_CAPACITY)
+
+
+def group_price_requests(pairs, max_ids=PRICE_BATCH_MAX_IDS):
+    """Объединение пар (криптовалюта, валюта) в минимальное число запросов к API
+
+    Запрос охватывает все запрошенные криптовалюты (порциями по max_ids) и
+    объединение всех валют: лишние пары в ответе дешевле отдельных запросов,
+    а вызывающий код берет из ответа только нужные пары.
+    """
+    # Порядок первого появления сохраняется, повторяющиеся пары отбрасываются
+    crypto_ids = list(dict.fromkeys(crypto_id for crypto_id, _ in pairs))
+    vs_currencies = ",".join(sorted({vs_currency for _, vs_currency in pairs}))
+    return [(",".join(crypto_ids[start:start + max_ids]), vs_currencies)
+            for start in range(0, len(crypto_ids), max_ids)]
+
+
+async def get_crypto_prices(pairs, max_concurrency=PRICE_FETCH_CONCURRENCY, client=None, failed=None,
+                            max_ids=PRICE_BATCH_MAX_IDS, limiter=bulk_limiter):
+    """Асинхронное получение данных сразу по многим парам (криптовалюта, валюта)
+
+    Запросы проходят через бюджет пакетных заданий (limiter), а не через
+    ограничитель интерфейса; limiter=None - без ограничения.
+
+    Результат содержит только запрошенные пары. Пары из запросов, завершившихся ошибкой (таймаут, 429), добавляются
+    в множество failed, если оно передано.
+    """
+    import asyncio
+
+    client = get_price_client() if client is None else client
+    semaphore = asyncio.Semaphore(max_concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def fetch(ids, vs_currencies):
+        async with semaphore:
+            # Блокирующий запрос выполняется в пуле потоков, не останавливая цикл событий
+            return await loop.run_in_executor(None, client.get_price, ids, vs_currencies, limiter)
+
+    pairs = set(pairs)
+    batches = group_price_requests(pairs, max_ids)
+    responses = await asyncio.gather(*(fetch(ids, vs_currencies) for ids, vs_currencies in batches))
+
+    # Ответы объединяются в формат get_crypto_price: {криптовалюта: {поля}}
+    price_data = {}
+    for (ids, vs_currencies), response in zip(batches, responses):
+        if response is None and failed is not None:
+            batch_pairs = {(crypto_id, vs_currency) for crypto_id in ids.split(",")
+                           for vs_currency in vs_currencies.split(",")}
+            failed.update(batch_pairs & pairs)
+        # Из ответа на объединение валют берутся только запрошенные пары
+        for crypto_id in response or {}:
+            for vs_currency in vs_currencies.split(","):
+                quote = extract_quote(response, crypto_id, vs_currency) if (crypto_id, vs_currency) in pairs else None
+                if quote:
+                    price_data.setdefault(crypto_id, {}).update(quote[crypto_id])
+    return price_data
+
+
+# Интервал проверки готовности фонового запроса в миллисекундах
+FETCH_POLL_INTERVAL = 50
+
+
+class BackgroundFetcher:
+    """Выполнение запросов в фоновом потоке с доставкой результата в главный цикл Tk"""
+
+    def __init__(self, schedule, poll_interval=FETCH_POLL_INTERVAL, executor=None):
+        from concurrent.futures import ThreadPoolExecutor
+
+        # schedule - функция планирования вида root.after(ms, func, *args)
+        self._schedule = schedule
+        self.poll_interval = poll_interval
+        self._executor = executor or ThreadPoolExecutor(max_workers=2, thread_name_prefix="price-fetch")
+        self._generation = 0
+        self._future = None
+
+    @property
+    def busy(self):
+        """Признак выполняющегося запроса"""
+        return self._future is not None
+
+    def submit(self, func, args, on_done, on_error):
+        """Запуск запроса; предыдущий незавершенный запрос отменяется"""
+        self.cancel()
+        future = self._executor.submit(func, *args)
+        self._future = future
+        self._schedule(self.poll_interval, self._poll, self._generation, future, on_done, on_error)
+        return future
+
+    def cancel(self):
+        """Отмена текущего запроса: его результат будет отброшен"""
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+        self._generation += 1
+
+    def shutdown(self):
+        """Остановка пула потоков без ожидания незавершенных запросов"""
+        self.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _poll(self, generation, future, on_done, on_error):
+        # Результат отмененного или вытесненного запроса игнорируется
+        if generation != self._generation:
+            return
+
+        if not future.done():
+            self._schedule(self.poll_interval, self._poll, generation, future, on_done, on_error)
+            return
+
+        self._future = None
+        error = future.exception()
+        if error is not None:
+            on_error(error)
+        else:
+            on_done(future.result())
@@ -1,75 +1,105 @@
 # Импорт необходимых библиотек
-import requests
+import argparse
+import sys
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox
-
-
-# Словарь ТОП 15 поддерживаемых криптовалют
-cryptocurrencies = {
-    "bitcoin": "Bitcoin (BTC)",
-    "ethereum": "Ethereum (ETH)",
-    "tether": "Tether (USDT)",
-    "solana": "Solana (SOL)",
-    "ripple": "Ripple (XRP)",
-    "cardano": "Cardano (ADA)",
-    "dogecoin": "Dogecoin (DOGE)",
-    "polkadot": "Polkadot (DOT)",
-    "tron": "Tron (TRX)",
-    "chainlink": "Chainlink (LINK)",
-    "polygon": "Polygon (MATIC)",
-    "wrapped-bitcoin": "Wrapped Bitcoin (WBTC)",
-    "litecoin": "Litecoin (LTC)",
-    "bitcoin-cash": "Bitcoin Cash (BCH)",
-    "dai": "Dai (DAI)"
-}
+from tkinter import ttk, messagebox, filedialog
+
+# Данные и логика конвертации находятся в модуле без графического интерфейса
+from crypto_core import (
+    cryptocurrencies,
+    fiat_currencies,
+    get_quote_with_age,
+    peek_quote,
+    quote_age,
+    price_cache,
+    BackgroundFetcher,
+)
+from metrics import metrics
+from rate_refresher import RateRefresher
+from quote_store import open_quote_store, warm_start
+from tick_store import open_tick_store
+from market_chart import CHART_DAYS, chart_coordinates, get_chart_points
+from result_view import RESULT_FIELDS, FieldUpdater, ResultHistory, result_fields, route_fields
+from rate_graph import find_conversion
+from currency_registry import (
+    crypto_registry,
+    fiat_registry,
+    CurrencySearchIndex,
+    load_crypto_registry,
+    load_fiat_registry,
+)
+
+
+# Объекты интерфейса создаются в main()
+root = None
+amount_var = None
+fiat_var = None
+crypto_var = None
+target_var = None
+mode_var = None
+status_var = None
+fetcher = None
+registry_loader = None
+chart_loader = None
+refresher = None
+quote_store = None
+tick_store = None
+convert_btn = None
+progress_bar = None
+
+# Окно результата создается при первой конвертации и затем переиспользуется
+result_window = None
+result_labels = {}
+result_chart = None
+history_list = None
+result_history = ResultHistory()
+field_updater = None
+
+# Автообновление открытого результата: (сумма, фиатная валюта, криптовалюта)
+live_var = None
+live_result = None
+LIVE_UPDATE_INTERVAL = 2000  # мс
+
+# Панель статистики создается при первом открытии и обновляется, пока видна
+stats_window = None
+stats_text = None
+STATS_UPDATE_INTERVAL = 1000  # мс
+
+# Размер графика истории цены в пикселях
+CHART_WIDTH = 560
+CHART_HEIGHT = 160
+
+# Функции, профилируемые в режиме --profile (VALUTUS_PROFILE=1)
+PROFILED_FUNCTIONS = ("setup_ui", "convert", "finish_convert", "show_result")
+profiling_session = None
 
-# Словарь ТОП 15 поддерживаемых фиатных валют
-fiat_currencies = {
-    "usd": "Доллар США (USD)",
-    "eur": "Евро (EUR)",
-    "gbp": "Фунт стерлингов (GBP)",
-    "jpy": "Японская иена (JPY)",
-    "cny": "Китайский юань (CNY)",
-    "aud": "Австралийский доллар (AUD)",
-    "cad": "Канадский доллар (CAD)",
-    "chf": "Швейцарский франк (CHF)",
-    "hkd": "Гонконгский доллар (HKD)",
-    "sgd": "Сингапурский доллар (SGD)",
-    "sek": "Шведская крона (SEK)",
-    "nok": "Норвежская крона (NOK)",
-    "krw": "Южнокорейская вона (KRW)",
-    "inr": "Индийская рупия (INR)",
-    "rub": "Российский рубль (RUB)",
+# Направления конвертации: фиат -> криптовалюта по котировке пары,
+# остальные - по лучшему маршруту в графе курсов
+CONVERSION_MODES = {
+    "fiat_to_crypto": "Фиат → криптовалюта",
+    "crypto_to_fiat": "Криптовалюта → фиат",
+    "crypto_to_crypto": "Криптовалюта → криптовалюта",
 }
 
+# Строки выбора фиатной валюты и второй криптовалюты показываются по направлению
+fiat_row = ()
+target_row = ()
 
-def get_crypto_price(crypto_id, vs_currency):
-    """Получение данных о криптовалюте через CoinGecko API"""
-    try:
-        url = "https://api.coingecko.com/api/v3/simple/price"
-        params = {
-            "ids": crypto_id,
-            "vs_currencies": vs_currency,
-            "include_market_cap": "true",
-            "include_24hr_vol": "true",
-            "include_24hr_change": "true"
-        }
-        
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        return response.json()
-        
-    except Exception as e:
-        print(f"Ошибка получения данных о криптовалюте: {e}")
-        return None
+# Поисковые индексы для выпадающих списков
+crypto_index = CurrencySearchIndex(crypto_registry)
+fiat_index = CurrencySearchIndex(fiat_registry)
 
 
-def show_result(amount, fiat_currency, crypto_amount, crypto_name, crypto_price, price_data):
-    """Создание окна с результатами конвертации"""
-    # Создание нового окна
+def build_result_window():
+    """Создание окна результата (один раз за время работы приложения)"""
+    global result_window, result_chart, history_list, field_updater, live_var
+
     result_window = tk.Toplevel(root)
     result_window.title("Результат конвертации")
-    result_window.geometry("600x300")
+    result_window.geometry("600x640")
+    # Закрытие только скрывает окно, чтобы следующий результат показался в нем же
+    result_window.protocol("WM_DELETE_WINDOW", result_window.withdraw)
     
     # Основной контейнер
     frame = tk.Frame(result_window, bg="white", padx=20, pady=20)
@@ -79,33 +109,34 @@ def show_result(amount, fiat_currency, crypto_amount, crypto_name, crypto_price,
     title = tk.Label(frame, text="Результат конвертации", font=("Arial", 14, "bold"), bg="white", fg="black")
     title.grid(row=0, column=0, columnspan=2, pady=(0, 20))
     
-    # Основной результат
-    result_text = f"{amount:,.2f} {fiat_currencies[fiat_currency.lower()]} = {crypto_amount:,.8f} {crypto_name}"
-    result_label = tk.Label(frame, text=result_text, font=("Arial", 12), bg="white", fg="#05658F")
-    result_label.grid(row=1, column=0, columnspan=2, pady=10)
+    # Основной результат и дополнительная информация по выбранной криптовалюте
+    result_labels["result"] = tk.Label(frame, font=("Arial", 12), bg="white", fg="#05658F")
+    result_labels["result"].grid(row=1, column=0, columnspan=2, pady=10)
+    for row, name in enumerate(RESULT_FIELDS[1:], start=2):
+        result_labels[name] = tk.Label(frame, justify=tk.LEFT, bg="white", fg="#05658F")
+        result_labels[name].grid(row=row, column=0, columnspan=2, sticky=tk.W, pady=3)
+    field_updater = FieldUpdater({name: (lambda text, label=label: label.config(text=text))
+                                  for name, label in result_labels.items()})
     
-    # Дополнительная информация
-    crypto_data = price_data[crypto_name.split()[0].lower()]
+    # Результат пересчитывается по свежим курсам, пока окно открыто
+    live_var = tk.BooleanVar(value=True)
+    live_check = ttk.Checkbutton(frame, text="Обновлять автоматически", variable=live_var)
+    live_check.grid(row=11, column=0, columnspan=2, sticky=tk.W, pady=(10, 0))
+    root.after(LIVE_UPDATE_INTERVAL, live_update)
     
-
-    # Дополнительная информация по выбранной криптовалюте
-    info_text = f"""
-Стоимость одного {crypto_name} = {crypto_price:,.2f} {fiat_currencies[fiat_currency.lower()]}
-
-Рыночная капитализация криптовалюты = {crypto_data.get(f'{fiat_currency}_market_cap', 0):,.0f} {fiat_currencies[fiat_currency.lower()]}
-
-Объем торгов на бирже за 24ч = {crypto_data.get(f'{fiat_currency}_24h_vol', 0):,.0f} {fiat_currencies[fiat_currency.lower()]}
-
-Изменение стоимости за последние 24ч = {crypto_data.get(f'{fiat_currency}_24h_change', 0):+.2f}%
-    """
-
+    # График цены загружается в фоне
+    result_chart = tk.Canvas(frame, width=CHART_WIDTH, height=CHART_HEIGHT, bg="white", highlightthickness=0)
+    result_chart.grid(row=8, column=0, columnspan=2, pady=(10, 0))
     
-    info_label = tk.Label(frame, text=info_text.strip(), justify=tk.LEFT, bg="white", fg="#05658F")
-    info_label.grid(row=2, column=0, columnspan=2, pady=10)
+    # Последние результаты конвертации
+    history_title = tk.Label(frame, text="Последние конвертации:", bg="white", fg="black")
+    history_title.grid(row=9, column=0, columnspan=2, sticky=tk.W, pady=(10, 0))
+    history_list = tk.Listbox(frame, height=5, bg="white", fg="#05658F", highlightthickness=0)
+    history_list.grid(row=10, column=0, columnspan=2, sticky=(tk.W, tk.E))
     
     # Кнопка закрытия результирующего окна
-    close_btn = ttk.Button(frame, text="Закрыть", command=result_window.destroy, style='Custom.TButton')
-    close_btn.grid(row=3, column=0, columnspan=2, pady=20)
+    close_btn = ttk.Button(frame, text="Закрыть", command=result_window.withdraw, style='Custom.TButton')
+    close_btn.grid(row=12, column=0, columnspan=2, pady=20)
     
     # Настройка растягивания
     frame.columnconfigure(0, weight=1)
@@ -114,6 +145,175 @@ def show_result(amount, fiat_currency, crypto_amount, crypto_name, crypto_price,
     result_window.configure(bg="white")
 
 
+def show_result(amount, fiat_currency, crypto_amount, crypto_name, crypto_price, price_data, data_age=0.0):
+    """Показ результата конвертации в окне результата"""
+    if result_window is None:
+        with metrics.timer("ui_stage_seconds", stage="widgets"):
+            build_result_window()
+    
+    global live_result
+    
+    with metrics.timer("ui_stage_seconds", stage="update"):
+        # Меняется только текст изменившихся полей, виджеты создаются один раз
+        fiat_label = fiat_registry.label(fiat_currency.lower())
+        crypto_id = crypto_registry.id_for_label(crypto_name)
+        fields = result_fields(amount, fiat_currency, fiat_label, crypto_amount, crypto_name, crypto_price,
+                               price_data[crypto_id], data_age)
+        present_result({**fields, "route": ""})
+        live_result = (amount, fiat_currency, crypto_id)
+    
+    load_chart(crypto_id, fiat_currency, fiat_label)
+
+
+def show_route_result(conversion, source, target):
+    """Показ результата конвертации по маршруту графа курсов"""
+    if result_window is None:
+        with metrics.timer("ui_stage_seconds", stage="widgets"):
+            build_result_window()
+    
+    global live_result
+    
+    with metrics.timer("ui_stage_seconds", stage="update"):
+        source_label, target_label = currency_label(source), currency_label(target)
+        fields = route_fields(conversion["amount"], source_label, target_label, conversion["result"],
+                              conversion["rate"], [currency_label(node) for node in conversion["path"]],
+                              conversion["age"], target_digits=8 if target in crypto_registry else 2)
+        present_result(fields)
+        # Автообновление пересчитывает только результаты фиат -> криптовалюта
+        live_result = None
+    
+    if target in crypto_registry:
+        draw_chart(result_chart, None, target_label)
+    else:
+        load_chart(source, target, target_label)
+
+
+def currency_label(currency_id):
+    """Подпись криптовалюты или фиатной валюты по id"""
+    return crypto_registry.label(currency_id) if currency_id in crypto_registry else fiat_registry.label(currency_id)
+
+
+def present_result(fields):
+    """Обновление полей окна результата, истории и показ окна"""
+    field_updater.update(fields)
+    
+    # Список отображает кольцевой буфер истории (не больше RESULT_HISTORY_SIZE записей)
+    result_history.add(fields["result"])
+    history_list.delete(0, tk.END)
+    history_list.insert(0, *result_history.entries())
+    
+    result_window.deiconify()
+    result_window.lift()
+
+
+def load_chart(crypto_id, fiat_currency, fiat_label):
+    """Загрузка графика цены в фоне; окно показывается сразу"""
+    result_chart.delete("all")
+    result_chart.create_text(CHART_WIDTH / 2, CHART_HEIGHT / 2, text="Загрузка графика...", fill="gray")
+    # Загрузка и прореживание ряда выполняются в фоне, в главном цикле - только отрисовка
+    chart_loader.submit(get_chart_points, (crypto_id, fiat_currency, CHART_WIDTH),
+                        on_done=lambda chart_data: draw_chart(result_chart, chart_data, fiat_label),
+                        on_error=lambda error: draw_chart(result_chart, None, fiat_label))
+
+
+def live_update():
+    """Пересчет открытого результата по последней котировке из кэша"""
+    try:
+        if live_result is not None and live_var.get() and result_window.winfo_viewable():
+            amount, fiat_key, crypto_key = live_result
+            # Котировка берется из кэша без ожидания сети; устаревшая обновляется в фоне
+            quote, cached_age = peek_quote(crypto_key, fiat_key)
+            crypto_data = (quote or {}).get(crypto_key) or {}
+            crypto_price = crypto_data.get(fiat_key)
+            if crypto_price:
+                field_updater.update(result_fields(
+                    amount, fiat_key, fiat_registry.label(fiat_key), amount / crypto_price,
+                    crypto_registry.label(crypto_key), crypto_price, crypto_data,
+                    quote_age(quote, crypto_key, cached_age)))
+    finally:
+        root.after(LIVE_UPDATE_INTERVAL, live_update)
+
+
+def draw_chart(chart, chart_data, fiat_label):
+    """Отрисовка графика цены за CHART_DAYS дней по результату get_chart_points"""
+    chart.delete("all")
+    if not chart_data:
+        chart.create_text(CHART_WIDTH / 2, CHART_HEIGHT / 2, text="История цены недоступна", fill="gray")
+        return
+    
+    # Точки уже прорежены до одной на пиксель ширины
+    points, low, high = chart_data
+    chart.create_line(*chart_coordinates(points, CHART_WIDTH, CHART_HEIGHT, padding=15), fill="#05658F", width=2)
+    
+    chart.create_text(5, 2, anchor=tk.NW, text=f"{high:,.2f} {fiat_label}", fill="gray", font=("Arial", 8))
+    chart.create_text(5, CHART_HEIGHT - 2, anchor=tk.SW, text=f"{low:,.2f} {fiat_label}", fill="gray",
+                      font=("Arial", 8))
+    chart.create_text(CHART_WIDTH - 5, CHART_HEIGHT - 2, anchor=tk.SE, text=f"за {CHART_DAYS} дней", fill="gray",
+                      font=("Arial", 8))
+
+
+def show_stats():
+    """Показ панели статистики (создается один раз, затем только обновляется)"""
+    global stats_window, stats_text
+
+    if stats_window is None:
+        stats_window = tk.Toplevel(root)
+        stats_window.title("Статистика")
+        stats_window.geometry("640x420")
+        stats_window.protocol("WM_DELETE_WINDOW", stats_window.withdraw)
+        stats_window.configure(bg="white")
+
+        frame = tk.Frame(stats_window, bg="white", padx=10, pady=10)
+        frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        # Задержки (p50/p95/p99), доля попаданий в кэш и ошибки API
+        stats_text = tk.Text(frame, width=80, height=20, bg="white", fg="#05658F", font=("Courier", 9))
+        stats_text.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        export_btn = ttk.Button(frame, text="Экспорт...", command=export_stats, style='Custom.TButton')
+        export_btn.grid(row=1, column=0, pady=10)
+        close_btn = ttk.Button(frame, text="Закрыть", command=stats_window.withdraw, style='Custom.TButton')
+        close_btn.grid(row=1, column=1, pady=10)
+
+        frame.columnconfigure(0, weight=1)
+        frame.columnconfigure(1, weight=1)
+        frame.rowconfigure(0, weight=1)
+        stats_window.columnconfigure(0, weight=1)
+        stats_window.rowconfigure(0, weight=1)
+        root.after(STATS_UPDATE_INTERVAL, update_stats)
+
+    update_stats(reschedule=False)
+    stats_window.deiconify()
+    stats_window.lift()
+
+
+def update_stats(reschedule=True):
+    """Обновление текста панели статистики, пока она открыта"""
+    try:
+        if stats_window.winfo_viewable() or not reschedule:
+            lines = metrics.summary_lines() or ["Замеров пока нет"]
+            stats_text.config(state=tk.NORMAL)
+            stats_text.delete("1.0", tk.END)
+            stats_text.insert(tk.END, "\n".join(lines))
+            stats_text.config(state=tk.DISABLED)
+    finally:
+        if reschedule:
+            root.after(STATS_UPDATE_INTERVAL, update_stats)
+
+
+def export_stats():
+    """Сохранение метрик в файл: .json - JSON, иначе текстовый формат Prometheus"""
+    path = filedialog.asksaveasfilename(
+        parent=stats_window, title="Экспорт метрик", defaultextension=".prom",
+        filetypes=[("Prometheus", "*.prom *.txt"), ("JSON", "*.json")])
+    if not path:
+        return
+    try:
+        metrics.write(path)
+    except OSError as e:
+        messagebox.showerror("Ошибка", f"Не удалось сохранить метрики: {e}", parent=stats_window)
+
+
 def convert():
     """Выполнение конвертации с проверками ввода"""
     try:
@@ -129,7 +329,8 @@ def convert():
             return
         
         # Проверка выбора валют
-        if fiat_var.get() == "--выберите валюту--" or not fiat_var.get():
+        mode = conversion_mode()
+        if mode != "crypto_to_crypto" and (fiat_var.get() == "--выберите валюту--" or not fiat_var.get()):
             messagebox.showerror("Ошибка выбора", "Обязательно выберите фиатную валюту")
             return
         
@@ -137,34 +338,166 @@ def convert():
             messagebox.showerror("Ошибка выбора", "Обязательно выберите криптовалюту")
             return
         
-        # Получение ключей валют
-        fiat_key = list(fiat_currencies.keys())[list(fiat_currencies.values()).index(fiat_var.get())]
-        crypto_key = list(cryptocurrencies.keys())[list(cryptocurrencies.values()).index(crypto_var.get())]
+        if mode == "crypto_to_crypto" and (target_var.get() == "--выберите криптовалюту--" or not target_var.get()):
+            messagebox.showerror("Ошибка выбора", "Обязательно выберите криптовалюту, которую хотите получить")
+            return
+        
+        # Получение ключей валют по подписям (поиск по хеш-индексу справочника)
+        started = time.perf_counter()
+        with metrics.timer("convert_stage_seconds", stage="resolve"):
+            crypto_key = crypto_registry.id_for_label(crypto_var.get())
+            if mode == "crypto_to_crypto":
+                fiat_key = None
+                target_key = crypto_registry.id_for_label(target_var.get())
+            else:
+                fiat_key = target_key = fiat_registry.id_for_label(fiat_var.get())
+        if target_key is None or crypto_key is None:
+            messagebox.showerror("Ошибка выбора", "Выберите валюты из списка")
+            return
+        
+        # Повторные нажатия во время выполнения запроса игнорируются
+        if fetcher.busy:
+            return
+        
+        # Выбранная пара обновляется в фоне чаще остальных
+        if fiat_key is not None:
+            refresher.mark_viewed(crypto_key, fiat_key)
         
-        # Получение данных о цене
-        price_data = get_crypto_price(crypto_key, fiat_key)
+        # Обратная конвертация и обмен криптовалют считаются по лучшему маршруту графа курсов
+        if mode != "fiat_to_crypto":
+            set_busy(True)
+            fetcher.submit(find_conversion, (amount, crypto_key, target_key),
+                           on_done=lambda conversion: finish_route(conversion, crypto_key, target_key, started),
+                           on_error=fail_convert)
+            return
         
+        # Получение данных о цене в фоновом потоке, чтобы окно не зависало
+        set_busy(True)
+        # Последняя известная котировка выдается сразу и обновляется в фоне
+        fetcher.submit(get_quote_with_age, (crypto_key, fiat_key),
+                       on_done=lambda result: finish_convert(amount, fiat_key, crypto_key, result, started),
+                       on_error=fail_convert)
+
+        # Вывод информации исключений     
+    except ValueError:
+        messagebox.showerror("Ошибка", "Введите корректную сумму")
+    except Exception as e:
+        messagebox.showerror("Ошибка", f"Произошла ошибка: {e}")
+
+
+def finish_convert(amount, fiat_key, crypto_key, result, started=None):
+    """Расчет и показ результата после получения данных о цене"""
+    set_busy(False)
+    try:
+        price_data, cached_age = result
         if not price_data or crypto_key not in price_data:
+            metrics.increment("convert_failures_total", reason="no_price")
             messagebox.showerror("Ошибка", "Не удалось получить данные о цене криптовалюты")
             return
         
         # Расчет количества криптовалюты
-        crypto_price = price_data[crypto_key][fiat_key]
-        crypto_amount = amount / crypto_price
+        with metrics.timer("convert_stage_seconds", stage="math"):
+            crypto_price = price_data[crypto_key][fiat_key]
+            crypto_amount = amount / crypto_price
         
         # Показ результата
         show_result(amount, fiat_key, crypto_amount, 
-                   cryptocurrencies[crypto_key], crypto_price, price_data)
+                   crypto_registry.label(crypto_key), crypto_price, price_data,
+                   quote_age(price_data, crypto_key, cached_age))
+        # Полное время от нажатия кнопки до показа результата
+        if started is not None:
+            metrics.observe("convert_seconds", time.perf_counter() - started)
+    except Exception as e:
+        messagebox.showerror("Ошибка", f"Произошла ошибка: {e}")
 
-        # Вывод информации исключений     
-    except ValueError:
-        messagebox.showerror("Ошибка", "Введите корректную сумму")
+
+def finish_route(conversion, source, target, started=None):
+    """Показ результата конвертации по маршруту графа курсов"""
+    set_busy(False)
+    try:
+        if conversion is None:
+            metrics.increment("convert_failures_total", reason="no_route")
+            messagebox.showerror("Ошибка", "Не удалось найти курс для выбранных валют")
+            return
+        
+        show_route_result(conversion, source, target)
+        if started is not None:
+            metrics.observe("convert_seconds", time.perf_counter() - started)
     except Exception as e:
         messagebox.showerror("Ошибка", f"Произошла ошибка: {e}")
 
 
+def conversion_mode():
+    """Ключ выбранного направления конвертации"""
+    label = mode_var.get()
+    for mode, mode_label in CONVERSION_MODES.items():
+        if mode_label == label:
+            return mode
+    return "fiat_to_crypto"
+
+
+def apply_mode(event=None):
+    """Показ полей выбора валют для выбранного направления"""
+    crypto_pair = conversion_mode() == "crypto_to_crypto"
+    hidden, shown = (fiat_row, target_row) if crypto_pair else (target_row, fiat_row)
+    for widget in hidden:
+        widget.grid_remove()
+    for widget in shown:
+        widget.grid()
+    cancel_convert()
+
+
+def fail_convert(error):
+    """Показ ошибки, возникшей в фоновом запросе"""
+    set_busy(False)
+    metrics.increment("convert_failures_total", reason=type(error).__name__)
+    messagebox.showerror("Ошибка", f"Произошла ошибка: {error}")
+
+
+def cancel_convert(event=None):
+    """Отмена выполняющегося запроса при смене выбранных валют"""
+    if fetcher.busy:
+        fetcher.cancel()
+        set_busy(False)
+
+
+def set_busy(busy):
+    """Переключение индикатора загрузки и блокировки кнопки"""
+    if busy:
+        convert_btn.state(["disabled"])
+        status_var.set("Получение курса...")
+        progress_bar.start(10)
+    else:
+        progress_bar.stop()
+        status_var.set("")
+        convert_btn.state(["!disabled"])
+
+
+def update_suggestions(event, combo, index):
+    """Подсказки выпадающего списка по введенному тексту (только лучшие совпадения)"""
+    # Навигация по списку не должна перестраивать подсказки
+    if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+        return
+    combo["values"] = index.search_labels(combo.get())
+
+
+def load_registries():
+    """Загрузка полных справочников CoinGecko и построение индексов (в фоновом потоке)"""
+    cryptos = load_crypto_registry()
+    fiats = load_fiat_registry()
+    return cryptos, fiats, CurrencySearchIndex(cryptos), CurrencySearchIndex(fiats)
+
+
+def apply_registries(result):
+    """Подключение загруженных справочников к интерфейсу"""
+    global crypto_registry, fiat_registry, crypto_index, fiat_index
+    crypto_registry, fiat_registry, crypto_index, fiat_index = result
+
+
 def setup_ui():
     """Настройка пользовательского интерфейса"""
+    global convert_btn, progress_bar, fiat_row, target_row
+    
     # Основной фрейм
     main_frame = tk.Frame(root, bg="white", padx=20, pady=20)
     main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -179,33 +512,68 @@ def setup_ui():
     amount_entry = ttk.Entry(main_frame, textvariable=amount_var, width=20, style='Custom.TEntry')
     amount_entry.grid(row=1, column=1, sticky=(tk.W, tk.E), pady=5, padx=(10, 0))
     
+    # Направление конвертации
+    tk.Label(main_frame, text="Направление:", bg="white").grid(row=2, column=0, sticky=tk.W, pady=5)
+    mode_combo = ttk.Combobox(main_frame, textvariable=mode_var, values=list(CONVERSION_MODES.values()),
+                              state="readonly", width=25, style='Custom.TCombobox')
+    mode_combo.grid(row=2, column=1, sticky=(tk.W, tk.E), pady=5, padx=(10, 0))
+    mode_combo.bind("<<ComboboxSelected>>", apply_mode)
+    
     # Выбор фиатной валюты
-    tk.Label(main_frame, text="Выберите валюту:", bg="white").grid(row=2, column=0, sticky=tk.W, pady=5)
+    fiat_title = tk.Label(main_frame, text="Выберите валюту:", bg="white")
+    fiat_title.grid(row=3, column=0, sticky=tk.W, pady=5)
     fiat_combo = ttk.Combobox(main_frame, textvariable=fiat_var, 
-                             values=list(fiat_currencies.values()),
-                             state="readonly", width=25, style='Custom.TCombobox')
-    fiat_combo.grid(row=2, column=1, sticky=(tk.W, tk.E), pady=5, padx=(10, 0))
+                             values=fiat_index.search_labels(""),
+                             width=25, style='Custom.TCombobox')
+    fiat_combo.grid(row=3, column=1, sticky=(tk.W, tk.E), pady=5, padx=(10, 0))
+    fiat_combo.bind("<<ComboboxSelected>>", cancel_convert)
+    fiat_combo.bind("<KeyRelease>", lambda event: update_suggestions(event, fiat_combo, fiat_index))
+    fiat_row = (fiat_title, fiat_combo)
     
     # Выбор криптовалюты
-    tk.Label(main_frame, text="Выберите криптовалюту:", bg="white").grid(row=3, column=0, sticky=tk.W, pady=5)
+    tk.Label(main_frame, text="Выберите криптовалюту:", bg="white").grid(row=4, column=0, sticky=tk.W, pady=5)
     crypto_combo = ttk.Combobox(main_frame, textvariable=crypto_var, 
-                               values=list(cryptocurrencies.values()),
-                               state="readonly", width=25, style='Custom.TCombobox')
-    crypto_combo.grid(row=3, column=1, sticky=(tk.W, tk.E), pady=5, padx=(10, 0))
+                               values=crypto_index.search_labels(""),
+                               width=25, style='Custom.TCombobox')
+    crypto_combo.grid(row=4, column=1, sticky=(tk.W, tk.E), pady=5, padx=(10, 0))
+    crypto_combo.bind("<<ComboboxSelected>>", cancel_convert)
+    crypto_combo.bind("<KeyRelease>", lambda event: update_suggestions(event, crypto_combo, crypto_index))
+    
+    # Криптовалюта, которую нужно получить (только при обмене криптовалют)
+    target_title = tk.Label(main_frame, text="Получить криптовалюту:", bg="white")
+    target_title.grid(row=5, column=0, sticky=tk.W, pady=5)
+    target_combo = ttk.Combobox(main_frame, textvariable=target_var,
+                                values=crypto_index.search_labels(""),
+                                width=25, style='Custom.TCombobox')
+    target_combo.grid(row=5, column=1, sticky=(tk.W, tk.E), pady=5, padx=(10, 0))
+    target_combo.bind("<<ComboboxSelected>>", cancel_convert)
+    target_combo.bind("<KeyRelease>", lambda event: update_suggestions(event, target_combo, crypto_index))
+    target_row = (target_title, target_combo)
+    apply_mode()
 
     # Инструкция для пользователя
     tk.Label(main_frame,
               text="""
 - в поле "Укажите сумму для расчета:" введите положительное число;
-- выберите интересующую вас валюту из выпадающего списка;
-- выберите интересующую вас криптовалюту для покупки;
+- выберите направление: покупка криптовалюты, продажа или обмен;
+- выберите валюту из списка (можно начать вводить название или тикер);
+- выберите криптовалюту (поиск по названию, тикеру или id);
 - нажмите кнопку "Посчитать".""",
              bg="white", fg='#05658F', 
-             font=("Arial", 10), justify=tk.LEFT).grid(row=4, column=0, columnspan=2, pady=(20, 0), sticky=tk.W)
+             font=("Arial", 10), justify=tk.LEFT).grid(row=6, column=0, columnspan=2, pady=(20, 0), sticky=tk.W)
 
     # Кнопка конвертации
     convert_btn = ttk.Button(main_frame, text="Посчитать", command=convert, style='Custom.TButton')
-    convert_btn.grid(row=5, column=0, columnspan=2, pady=10)
+    convert_btn.grid(row=7, column=0, columnspan=2, pady=10)
+    
+    # Панель статистики: задержки, кэш и ошибки API
+    stats_btn = ttk.Button(main_frame, text="Статистика", command=show_stats)
+    stats_btn.grid(row=7, column=1, sticky=tk.E, pady=10)
+    
+    # Индикатор выполнения запроса
+    progress_bar = ttk.Progressbar(main_frame, mode="indeterminate", length=200)
+    progress_bar.grid(row=8, column=0, pady=(0, 5), sticky=tk.W)
+    tk.Label(main_frame, textvariable=status_var, bg="white", fg='#05658F').grid(row=8, column=1, sticky=tk.W, padx=(10, 0))
     
     # Настройка растягивания
     main_frame.columnconfigure(1, weight=1)
@@ -213,58 +581,143 @@ def setup_ui():
     root.rowconfigure(0, weight=1)
 
 
-# Создание главного окна
-root = tk.Tk()
-root.title("ВалютУС")
-root.geometry("550x350")
-root.configure(bg="white")
-
-# Настройка стилей
-style = ttk.Style()
-style.theme_use('clam')
-
-# Стиль для выпадающих списков
-style.configure('Custom.TCombobox', 
-                fieldbackground='white',
-                background='white',
-                bordercolor='#05658F',
-                arrowcolor='#05658F',
-                borderwidth=2,
-                relief='solid')
-
-style.map('Custom.TCombobox',
-          fieldbackground=[('readonly', 'white')],
-          background=[('readonly', 'white')])
-
-# Стиль для полей ввода
-style.configure('Custom.TEntry',
-                fieldbackground='white',
-                background='white',
-                bordercolor='#05658F',
-                borderwidth=2,
-                relief='solid')
-
-# Стиль для кнопок
-style.configure('Custom.TButton',
-                background='#F0672F',
-                foreground='black',
-                bordercolor='#05658F',
-                borderwidth=2,
-                focuscolor='none')
-style.map('Custom.TButton',
-          background=[('active', '#E55A28')])
-
-# Настройка цветов выпадающего списка
-root.option_add('*TCombobox*Listbox.background', 'white')
-root.option_add('*TCombobox*Listbox.selectBackground', '#05658F')
-
-# Дефолтные значения в полях
-amount_var = tk.StringVar(value="100")
-fiat_var = tk.StringVar(value="--выберите валюту--")
-crypto_var = tk.StringVar(value="--выберите криптовалюту--")
-
-# Настройка интерфейса
-setup_ui()
-
-# Запуск приложения
-root.mainloop()
\ No newline at end of file
+def setup_styles():
+    """Настройка стилей виджетов"""
+    style = ttk.Style()
+    style.theme_use('clam')
+
+    # Стиль для выпадающих списков
+    style.configure('Custom.TCombobox', 
+                    fieldbackground='white',
+                    background='white',
+                    bordercolor='#05658F',
+                    arrowcolor='#05658F',
+                    borderwidth=2,
+                    relief='solid')
+
+    style.map('Custom.TCombobox',
+              fieldbackground=[('readonly', 'white')],
+              background=[('readonly', 'white')])
+
+    # Стиль для полей ввода
+    style.configure('Custom.TEntry',
+                    fieldbackground='white',
+                    background='white',
+                    bordercolor='#05658F',
+                    borderwidth=2,
+                    relief='solid')
+
+    # Стиль для кнопок
+    style.configure('Custom.TButton',
+                    background='#F0672F',
+                    foreground='black',
+                    bordercolor='#05658F',
+                    borderwidth=2,
+                    focuscolor='none')
+    style.map('Custom.TButton',
+              background=[('active', '#E55A28')])
+
+    # Настройка цветов выпадающего списка
+    root.option_add('*TCombobox*Listbox.background', 'white')
+    root.option_add('*TCombobox*Listbox.selectBackground', '#05658F')
+
+
+def parse_args(argv=None):
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="Конвертер криптовалют ВалютУС")
+    parser.add_argument("--profile", action="store_true",
+                        help="профилировать интерфейс и записывать зависания главного цикла "
+                             "(то же, что VALUTUS_PROFILE=1)")
+    parser.add_argument("--lag-threshold", type=float, default=None,
+                        help="порог зависания главного цикла в мс (по умолчанию 200)")
+    return parser.parse_args(argv)
+
+
+def install_profiling(args):
+    """Включение профилирования: обертка функций интерфейса cProfile"""
+    global profiling_session
+    from profiling import LAG_THRESHOLD, ProfilingSession
+
+    threshold = LAG_THRESHOLD if args.lag_threshold is None else args.lag_threshold / 1000
+    profiling_session = ProfilingSession(threshold=threshold)
+    # Обернутые функции подменяют глобальные имена до создания кнопок
+    module = globals()
+    for name in PROFILED_FUNCTIONS:
+        module[name] = profiling_session.wrap(module[name])
+
+
+def main(argv=None):
+    """Создание главного окна и запуск приложения"""
+    global root, amount_var, fiat_var, crypto_var, status_var, fetcher, registry_loader, refresher, quote_store
+    global tick_store, chart_loader, target_var, mode_var
+
+    args = parse_args(argv)
+    from profiling import profiling_enabled
+    if args.profile or profiling_enabled():
+        install_profiling(args)
+
+    # Создание главного окна
+    root = tk.Tk()
+    root.title("ВалютУС")
+    root.geometry("550x460")
+    root.configure(bg="white")
+
+    # Настройка стилей
+    setup_styles()
+
+    # Дефолтные значения в полях
+    amount_var = tk.StringVar(value="100")
+    fiat_var = tk.StringVar(value="--выберите валюту--")
+    crypto_var = tk.StringVar(value="--выберите криптовалюту--")
+    target_var = tk.StringVar(value="--выберите криптовалюту--")
+    mode_var = tk.StringVar(value=CONVERSION_MODES["fiat_to_crypto"])
+    status_var = tk.StringVar(value="")
+
+    # Фоновое получение курсов с доставкой результата через root.after
+    fetcher = BackgroundFetcher(root.after)
+
+    # История цены для графиков загружается отдельно от котировок
+    chart_loader = BackgroundFetcher(root.after)
+
+    # Настройка интерфейса
+    setup_ui()
+
+    # Полный список монет подгружается в фоне, пока доступны встроенные валюты
+    registry_loader = BackgroundFetcher(root.after, poll_interval=200)
+    registry_loader.submit(load_registries, (), on_done=apply_registries, on_error=lambda error: None)
+
+    # Котировки прошлого запуска доступны сразу, даже без сети
+    quote_store = open_quote_store()
+    if quote_store is not None:
+        warm_start(quote_store)
+
+    # Все полученные котировки дописываются в историю
+    tick_store = open_tick_store()
+    if tick_store is not None:
+        price_cache.stores.append(tick_store)
+
+    # Курсы встроенных пар поддерживаются свежими в фоновом потоке
+    refresher = RateRefresher([(crypto_id, fiat) for crypto_id in cryptocurrencies for fiat in fiat_currencies])
+    refresher.start()
+
+    # Сторож отмечает каждое зависание главного цикла дольше порога
+    if profiling_session is not None:
+        profiling_session.watch(root.after)
+
+    # Запуск приложения
+    root.mainloop()
+    if profiling_session is not None:
+        for path in profiling_session.save():
+            print(f"Профиль сеанса сохранен: {path}", file=sys.stderr)
+    refresher.stop()
+    registry_loader.shutdown()
+    chart_loader.shutdown()
+    fetcher.shutdown()
+    if quote_store is not None:
+        quote_store.close()
+    if tick_store is not None:
+        tick_store.close()
+
+
+if __name__ == "__main__":
+    main()
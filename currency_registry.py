@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+"""
+Справочник валют с постоянным временем поиска
+
+CurrencyRegistry хранит для каждой валюты идентификатор, название, тикер
+и подпись для выпадающего списка и поддерживает хеш-индексы во все
+стороны: id -> подпись, подпись -> id, тикер -> id. Справочник можно
+собрать из встроенных словарей или загрузить полный список CoinGecko
+(/coins/list и /simple/supported_vs_currencies) с кэшированием в файл.
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from bisect import bisect_left
+
+from crypto_core import DATA_DIR, cryptocurrencies, fiat_currencies, get_price_client
+
+
+# Файлы локального кэша справочников
+COINS_CACHE_PATH = os.path.join(DATA_DIR, "coins_list.json")
+VS_CURRENCIES_CACHE_PATH = os.path.join(DATA_DIR, "vs_currencies.json")
+
+# Срок годности кэша справочников в секундах (сутки)
+REGISTRY_CACHE_MAX_AGE = 24 * 60 * 60
+
+# Подпись вида "Название (ТИКЕР)"
+LABEL_PATTERN = re.compile(r"^(?P<name>.*?)\s*\((?P<symbol>[^()]*)\)\s*$")
+
+
+class CurrencyRegistry:
+    """Справочник валют с индексами id <-> подпись <-> тикер"""
+
+    def __init__(self):
+        self._labels = {}  # id -> подпись
+        self._names = {}  # id -> название
+        self._symbols = {}  # id -> тикер
+        self._ids_by_label = {}  # подпись -> id
+        self._ids_by_symbol = {}  # тикер -> список id (тикеры в CoinGecko не уникальны)
+
+    @classmethod
+    def from_labels(cls, labels):
+        """Создание справочника из словаря {id: "Название (ТИКЕР)"}"""
+        registry = cls()
+        for currency_id, label in labels.items():
+            match = LABEL_PATTERN.match(label)
+            if match:
+                registry.add(currency_id, match.group("name"), match.group("symbol"), label=label)
+            else:
+                registry.add(currency_id, label, currency_id, label=label)
+        return registry
+
+    def add(self, currency_id, name, symbol, label=None):
+        """Добавление валюты; повторное добавление id игнорируется"""
+        if currency_id in self._labels:
+            return self._labels[currency_id]
+
+        symbol = symbol.upper()
+        label = label or f"{name} ({symbol})"
+        # Подписи должны быть уникальными, иначе их нельзя превратить обратно в id
+        if label in self._ids_by_label:
+            label = f"{name} ({symbol}, {currency_id})"
+
+        self._labels[currency_id] = label
+        self._names[currency_id] = name
+        self._symbols[currency_id] = symbol
+        self._ids_by_label[label] = currency_id
+        self._ids_by_symbol.setdefault(symbol.lower(), []).append(currency_id)
+        return label
+
+    def add_coins(self, coins):
+        """Добавление монет из ответа /coins/list: [{"id", "symbol", "name"}, ...]"""
+        for coin in coins:
+            try:
+                self.add(coin["id"], coin["name"], coin["symbol"])
+            except (KeyError, TypeError, AttributeError):
+                continue
+
+    def add_vs_currencies(self, codes, labels=None):
+        """Добавление валют из ответа /simple/supported_vs_currencies: ["usd", ...]"""
+        labels = fiat_currencies if labels is None else labels
+        for code in codes:
+            if not isinstance(code, str):
+                continue
+            label = labels.get(code)
+            if label:
+                match = LABEL_PATTERN.match(label)
+                self.add(code, match.group("name") if match else label, code, label=label)
+            else:
+                self.add(code, code.upper(), code)
+
+    def id_for_label(self, label):
+        """Идентификатор валюты по подписи из выпадающего списка"""
+        return self._ids_by_label.get(label)
+
+    def id_for_symbol(self, symbol):
+        """Идентификатор валюты по тикеру (первая зарегистрированная)"""
+        ids = self._ids_by_symbol.get(symbol.lower())
+        return ids[0] if ids else None
+
+    def ids_for_symbol(self, symbol):
+        """Все идентификаторы валют с данным тикером"""
+        return list(self._ids_by_symbol.get(symbol.lower(), ()))
+
+    def label(self, currency_id):
+        """Подпись валюты для интерфейса"""
+        return self._labels.get(currency_id)
+
+    def name(self, currency_id):
+        """Название валюты"""
+        return self._names.get(currency_id)
+
+    def symbol(self, currency_id):
+        """Тикер валюты"""
+        return self._symbols.get(currency_id)
+
+    def labels(self):
+        """Подписи всех валют в порядке добавления"""
+        return list(self._labels.values())
+
+    def items(self):
+        """Пары (id, подпись) в порядке добавления"""
+        return self._labels.items()
+
+    def __contains__(self, currency_id):
+        return currency_id in self._labels
+
+    def __iter__(self):
+        return iter(self._labels)
+
+    def __len__(self):
+        return len(self._labels)
+
+
+# Число подсказок, показываемых в выпадающем списке
+SEARCH_LIMIT = 20
+
+# Префиксы, которым соответствует больше терминов, получают заранее
+# посчитанный список лучших совпадений длиной SEARCH_TOP_K
+SEARCH_HEAVY_PREFIX = 256
+SEARCH_TOP_K = 50
+
+# Приоритет совпадений: тикер важнее названия, название важнее id
+_SYMBOL_MATCH, _NAME_MATCH, _ID_MATCH = 0, 1, 2
+
+
+class CurrencySearchIndex:
+    """Префиксный индекс для поиска валют по id, названию и тикеру"""
+
+    def __init__(self, registry, featured=None):
+        self.registry = registry
+        # Встроенные (популярные) валюты показываются выше остальных
+        featured = set(cryptocurrencies) | set(fiat_currencies) if featured is None else set(featured)
+
+        self._ids = list(registry)
+        size = len(self._ids)
+        entries = []
+        for rank, currency_id in enumerate(self._ids):
+            name = registry.name(currency_id) or registry.label(currency_id)
+            tier = 0 if currency_id in featured else 3
+            # Оценка не зависит от запроса: сначала популярные валюты, затем
+            # тип совпадения, затем порядок в справочнике; rank = score % size
+            entries.extend((term, (tier + kind) * size + rank)
+                           for term, kind in self._terms(currency_id, name, registry.symbol(currency_id) or ""))
+
+        # Отсортированный массив терминов: все термины с общим префиксом
+        # лежат подряд, и их диапазон находится двоичным поиском
+        entries.sort()
+        self._keys = [term for term, _ in entries]
+        self._scores = [score for _, score in entries]
+        self._ranked_ids = [self._ids[score % size] for score in sorted(
+            (0 if currency_id in featured else 3) * size + rank for rank, currency_id in enumerate(self._ids))]
+        self._top = self._build_top()
+
+    @staticmethod
+    def _terms(currency_id, name, symbol):
+        terms = {(symbol.lower(), _SYMBOL_MATCH), (name.lower(), _NAME_MATCH), (currency_id.lower(), _ID_MATCH)}
+        # Отдельные слова названия и части id тоже ищутся по префиксу
+        terms.update((word, _NAME_MATCH) for word in name.lower().split())
+        terms.update((part, _ID_MATCH) for part in currency_id.lower().split("-"))
+        return {(term, kind) for term, kind in terms if term}
+
+    def _range(self, prefix, lo=0, hi=None):
+        """Диапазон терминов, начинающихся с prefix"""
+        hi = len(self._keys) if hi is None else hi
+        start = bisect_left(self._keys, prefix, lo, hi)
+        return start, bisect_left(self._keys, prefix + "\uffff", start, hi)
+
+    def _best_ids(self, start, end, limit):
+        """Лучшие различные валюты среди терминов диапазона"""
+        result = []
+        seen = set()
+        for score in sorted(self._scores[start:end]):
+            currency_id = self._ids[score % len(self._ids)]
+            if currency_id not in seen:
+                seen.add(currency_id)
+                result.append(currency_id)
+                if len(result) == limit:
+                    break
+        return result
+
+    def _build_top(self):
+        """Лучшие совпадения для частых префиксов (например, "b" или "token")"""
+        keys = self._keys
+        top = {}
+        # Обход отсортированного массива как дерева префиксов: диапазон
+        # частого префикса делится на поддиапазоны по следующему символу
+        stack = [("", 0, len(keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if hi - lo <= SEARCH_HEAVY_PREFIX:
+                continue
+            if prefix:
+                top[prefix] = self._best_ids(lo, hi, SEARCH_TOP_K)
+
+            depth = len(prefix)
+            # Термин, равный самому префиксу, не имеет следующего символа
+            while lo < hi and len(keys[lo]) == depth:
+                lo += 1
+            while lo < hi:
+                child = prefix + keys[lo][depth]
+                _, child_hi = self._range(child, lo, hi)
+                stack.append((child, lo, child_hi))
+                lo = child_hi
+        return top
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Идентификаторы лучших совпадений для введенного текста"""
+        query = query.strip().lower()
+        if not query:
+            return self._ranked_ids[:limit]
+
+        best = self._top.get(query)
+        if best is not None and limit <= SEARCH_TOP_K:
+            return best[:limit]
+
+        # Редкий префикс: его диапазон не длиннее SEARCH_HEAVY_PREFIX терминов
+        start, end = self._range(query)
+        return self._best_ids(start, end, limit)
+
+    def search_labels(self, query, limit=SEARCH_LIMIT):
+        """Подписи лучших совпадений для выпадающего списка"""
+        return [self.registry.label(currency_id) for currency_id in self.search(query, limit)]
+
+
+def read_registry_cache(path, max_age=REGISTRY_CACHE_MAX_AGE):
+    """Чтение кэша справочника (None, если файла нет или он устарел)"""
+    try:
+        with open(path, encoding="utf-8") as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(cache, dict) or "items" not in cache:
+        return None
+    if max_age is not None and time.time() - cache.get("fetched_at", 0) > max_age:
+        return None
+    return cache["items"]
+
+
+def write_registry_cache(path, items):
+    """Сохранение справочника в файл кэша"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as cache_file:
+            json.dump({"fetched_at": time.time(), "items": items}, cache_file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Не удалось сохранить кэш справочника {path}: {e}", file=sys.stderr)
+
+
+def load_cached_list(path, api_path, max_age=REGISTRY_CACHE_MAX_AGE, client=None):
+    """Загрузка списка из свежего кэша, затем из API, затем из устаревшего кэша"""
+    items = read_registry_cache(path, max_age)
+    if items is not None:
+        return items
+
+    client = get_price_client() if client is None else client
+    items = client.get_json(api_path)
+    if isinstance(items, list):
+        write_registry_cache(path, items)
+        return items
+
+    # Нет сети - используем последний сохраненный список, даже устаревший
+    return read_registry_cache(path, max_age=None) or []
+
+
+def load_crypto_registry(cache_path=COINS_CACHE_PATH, max_age=REGISTRY_CACHE_MAX_AGE, client=None):
+    """Справочник всех криптовалют CoinGecko; встроенные монеты идут первыми"""
+    registry = CurrencyRegistry.from_labels(cryptocurrencies)
+    registry.add_coins(load_cached_list(cache_path, "/coins/list", max_age, client))
+    return registry
+
+
+def load_fiat_registry(cache_path=VS_CURRENCIES_CACHE_PATH, max_age=REGISTRY_CACHE_MAX_AGE, client=None):
+    """Справочник всех валют котирования CoinGecko; встроенные валюты идут первыми"""
+    registry = CurrencyRegistry.from_labels(fiat_currencies)
+    registry.add_vs_currencies(load_cached_list(cache_path, "/simple/supported_vs_currencies", max_age, client))
+    return registry
+
+
+# Справочники по умолчанию из встроенных словарей (без обращения к сети)
+crypto_registry = CurrencyRegistry.from_labels(cryptocurrencies)
+fiat_registry = CurrencyRegistry.from_labels(fiat_currencies)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+История цены для графика в окне результата
+
+Ряд цен загружается из /coins/{id}/market_chart и кэшируется. Перед
+отрисовкой ряд из десятков тысяч точек прореживается алгоритмом LTTB
+(Largest-Triangle-Three-Buckets) до числа точек, равного ширине графика
+в пикселях: форма кривой и экстремумы сохраняются, а отрисовка
+занимает миллисекунды даже для всей истории монеты. Загрузка и
+прореживание (get_chart_points) выполняются в фоновом потоке, главному
+циклу Tk остается только нарисовать готовые точки.
+"""
+
+from crypto_core import QuoteCache, get_price_client
+
+
+# Период истории по умолчанию в днях (CoinGecko также принимает "max")
+CHART_DAYS = 30
+
+# Кэш рядов цен: история меняется медленно, поэтому живет дольше котировок
+CHART_CACHE_TTL = 5 * 60
+CHART_CACHE_SIZE = 32
+
+
+# Общий кэш рядов цен приложения
+chart_cache = QuoteCache(ttl=CHART_CACHE_TTL, maxsize=CHART_CACHE_SIZE)
+
+
+def fetch_market_chart(crypto_id, vs_currency, days=CHART_DAYS, client=None):
+    """Ряд цен [(момент в секундах, цена), ...] или None при ошибке"""
+    client = get_price_client() if client is None else client
+    data = client.get_json(f"/coins/{crypto_id}/market_chart", {"vs_currency": vs_currency, "days": days})
+    try:
+        return [(timestamp / 1000, price) for timestamp, price in data["prices"] if price is not None]
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def get_market_chart(crypto_id, vs_currency, days=CHART_DAYS, cache=None, client=None):
+    """Ряд цен с использованием кэша"""
+    cache = chart_cache if cache is None else cache
+    key = (crypto_id, vs_currency, days)
+    series = cache.get(key)
+    if series is None:
+        series = fetch_market_chart(crypto_id, vs_currency, days, client)
+        # Пустые и ошибочные ответы не кэшируются
+        if series:
+            cache.put(key, series)
+    return series
+
+
+def get_chart_points(crypto_id, vs_currency, width, days=CHART_DAYS, cache=None, client=None):
+    """Ряд цен, прореженный до width точек, и диапазон исходных цен: (точки, минимум, максимум) или None"""
+    series = get_market_chart(crypto_id, vs_currency, days, cache, client)
+    if not series or len(series) < 2:
+        return None
+    prices = [price for _, price in series]
+    return lttb(series, width), min(prices), max(prices)
+
+
+def lttb(points, threshold):
+    """Прореживание ряда [(x, y), ...] до threshold точек алгоритмом LTTB"""
+    size = len(points)
+    if threshold >= size or threshold < 3:
+        return list(points)
+
+    # Первая и последняя точки сохраняются, остальные делятся на корзины,
+    # из каждой выбирается точка, образующая наибольший треугольник с
+    # выбранной точкой предыдущей корзины и средним следующей
+    sampled = [points[0]]
+    bucket_size = (size - 2) / (threshold - 2)
+    selected = 0
+    for bucket in range(threshold - 2):
+        next_start = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, size)
+        next_count = next_end - next_start
+        avg_x = sum(point[0] for point in points[next_start:next_end]) / next_count
+        avg_y = sum(point[1] for point in points[next_start:next_end]) / next_count
+
+        ax, ay = points[selected]
+        best_area = -1.0
+        for index in range(int(bucket * bucket_size) + 1, next_start):
+            x, y = points[index]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best_index = index
+
+        sampled.append(points[best_index])
+        selected = best_index
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def chart_coordinates(series, width, height, padding=0):
+    """Координаты точек ряда на холсте width x height (ось y направлена вниз)"""
+    if len(series) < 2:
+        return []
+
+    xs = [point[0] for point in series]
+    ys = [point[1] for point in series]
+    min_x, max_x = min(xs), max(xs)
+    min_y, max_y = min(ys), max(ys)
+    span_x = (max_x - min_x) or 1
+    span_y = (max_y - min_y) or 1
+    inner_width = width - 2 * padding
+    inner_height = height - 2 * padding
+
+    coordinates = []
+    for x, y in series:
+        coordinates.append(padding + (x - min_x) / span_x * inner_width)
+        coordinates.append(padding + (max_y - y) / span_y * inner_height)
+    return coordinates
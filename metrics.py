@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики горячих путей приложения
+
+Гистограммы задержек, счетчики и показатели (gauge) с метками, как в
+Prometheus. Замеры добавляются через metrics.timer(...) или
+metrics.observe(...), а перед экспортом вызываются сборщики, которые
+считывают текущие показатели (например, долю попаданий в кэш).
+Экспорт - в текстовом формате Prometheus или в JSON.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Границы корзин гистограмм задержек в секундах
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Префикс имен метрик приложения
+METRIC_PREFIX = "valutus_"
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами и оценкой квантилей"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последняя корзина - +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Оценка квантиля линейной интерполяцией внутри корзины, как histogram_quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    # Значения больше последней границы: известна только она
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Набор метрик приложения с экспортом в Prometheus и JSON"""
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._histograms = {}  # имя -> {метки: Histogram}
+        self._counters = {}  # имя -> {метки: значение}
+        self._gauges = {}  # имя -> {метки: значение}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name, text):
+        """Описание метрики для строки # HELP"""
+        self._help[name] = text
+
+    def observe(self, name, value, **labels):
+        """Добавление значения в гистограмму"""
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _labels_key(labels)
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, value=1, **labels):
+        """Увеличение счетчика"""
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _labels_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def set_counter(self, name, value, **labels):
+        """Установка значения счетчика, который ведется в другом объекте (для сборщиков)"""
+        with self._lock:
+            self._counters.setdefault(name, {})[_labels_key(labels)] = value
+
+    def set_gauge(self, name, value, **labels):
+        """Установка текущего значения показателя"""
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels_key(labels)] = value
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Замер длительности блока в гистограмму name"""
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.observe(name, self._clock() - start, **labels)
+
+    def register_collector(self, collector):
+        """Функция, обновляющая показатели перед экспортом (вызывается с этим набором)"""
+        self._collectors.append(collector)
+
+    def collect(self):
+        for collector in self._collectors:
+            collector(self)
+
+    def reset(self):
+        """Сброс всех значений (сборщики сохраняются)"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def snapshot(self):
+        """Текущие значения всех метрик в виде словаря для JSON"""
+        self.collect()
+        with self._lock:
+            return {
+                "histograms": {name: [{"labels": dict(key), **histogram.summary(),
+                                       "buckets": dict(zip(map(str, histogram.buckets + (float("inf"),)),
+                                                           histogram.counts))}
+                                      for key, histogram in series.items()]
+                               for name, series in self._histograms.items()},
+                "counters": {name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                             for name, series in self._counters.items()},
+                "gauges": {name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                           for name, series in self._gauges.items()},
+            }
+
+    def to_json(self, indent=2):
+        """Экспорт в JSON"""
+        import json
+        return json.dumps(self.snapshot(), indent=indent, ensure_ascii=False)
+
+    def to_prometheus(self):
+        """Экспорт в текстовом формате Prometheus"""
+        self.collect()
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                self._header(lines, name, "counter")
+                for key, value in series.items():
+                    lines.append(f"{METRIC_PREFIX}{name}{_format_labels(key)} {_format_number(value)}")
+
+            for name, series in sorted(self._gauges.items()):
+                self._header(lines, name, "gauge")
+                for key, value in series.items():
+                    lines.append(f"{METRIC_PREFIX}{name}{_format_labels(key)} {_format_number(value)}")
+
+            for name, series in sorted(self._histograms.items()):
+                self._header(lines, name, "histogram")
+                for key, histogram in series.items():
+                    # Корзины в Prometheus накопительные
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += bucket_count
+                        labels = _format_labels(key, [("le", _format_number(bound))])
+                        lines.append(f"{METRIC_PREFIX}{name}_bucket{labels} {cumulative}")
+                    lines.append(f"{METRIC_PREFIX}{name}_sum{_format_labels(key)} {_format_number(histogram.sum)}")
+                    lines.append(f"{METRIC_PREFIX}{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines, name, kind):
+        if name in self._help:
+            lines.append(f"# HELP {METRIC_PREFIX}{name} {self._help[name]}")
+        lines.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+
+    def summary_lines(self):
+        """Краткая сводка для панели статистики в приложении"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, series in sorted(snapshot["histograms"].items()):
+            for item in series:
+                labels = ", ".join(f"{key}={value}" for key, value in sorted(item["labels"].items()))
+                lines.append(f"{name}{f' [{labels}]' if labels else ''}: n={item['count']}, "
+                             f"p50={item['p50'] * 1000:.1f} мс, p95={item['p95'] * 1000:.1f} мс, "
+                             f"p99={item['p99'] * 1000:.1f} мс")
+        for kind in ("counters", "gauges"):
+            for name, series in sorted(snapshot[kind].items()):
+                for item in series:
+                    labels = ", ".join(f"{key}={value}" for key, value in sorted(item["labels"].items()))
+                    value = item["value"]
+                    value = f"{value:.3f}" if isinstance(value, float) else value
+                    lines.append(f"{name}{f' [{labels}]' if labels else ''}: {value}")
+        return lines
+
+    def write(self, path):
+        """Сохранение метрик в файл: .json - JSON, иначе формат Prometheus"""
+        text = self.to_json() if path.lower().endswith(".json") else self.to_prometheus()
+        with open(path, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(text)
+
+
+# Общий набор метрик приложения
+metrics = MetricsRegistry()
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+"""
+Локальный заменитель CoinGecko API для тестов и замеров без сети
+
+MockCoinGecko поднимает HTTP-сервер (HTTP/1.1, keep-alive) с эндпоинтами
+/simple/price, /coins/markets, /coins/{id}/market_chart, /coins/list,
+/simple/supported_vs_currencies и /exchange_rates. Ответы имеют формат CoinGecko, а цены
+детерминированы для каждой пары. Настраиваются задержка и ее разброс,
+доля ответов 429 и 5xx, а все запросы подсчитываются по эндпоинтам.
+
+Использование:
+    python mock_api.py --port 8000 --latency 0.05 --error-rate 0.1
+    VALUTUS_API_URL=http://127.0.0.1:8000/api/v3 python crypto_currency.py
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from crypto_core import cryptocurrencies, fiat_currencies
+
+
+# Префикс пути, как у настоящего API
+API_PREFIX = "/api/v3"
+
+# Курсы фиатных валют к доллару для согласованных цен в разных валютах
+USD_RATES = {
+    "usd": 1.0, "eur": 0.92, "gbp": 0.79, "jpy": 151.0, "cny": 7.2, "aud": 1.52, "cad": 1.36,
+    "chf": 0.9, "hkd": 7.8, "sgd": 1.35, "sek": 10.6, "nok": 10.8, "krw": 1350.0, "inr": 83.0, "rub": 92.0,
+    "brl": 5.0, "try": 32.0, "zar": 18.5, "mxn": 17.0, "pln": 4.0,
+}
+
+# Примерные цены встроенных монет в долларах; остальным цена назначается по хешу id
+USD_PRICES = {
+    "bitcoin": 65000.0, "ethereum": 3200.0, "tether": 1.0, "solana": 150.0, "ripple": 0.55,
+    "cardano": 0.45, "dogecoin": 0.15, "polkadot": 7.0, "tron": 0.12, "chainlink": 15.0,
+    "polygon": 0.7, "wrapped-bitcoin": 65000.0, "litecoin": 80.0, "bitcoin-cash": 450.0, "dai": 1.0,
+}
+
+
+def _unit(*parts):
+    """Детерминированное число из [0, 1) для набора строк"""
+    digest = hashlib.sha256(":".join(map(str, parts)).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def usd_price(crypto_id):
+    """Детерминированная цена монеты в долларах"""
+    if crypto_id in USD_PRICES:
+        return USD_PRICES[crypto_id]
+    return round(10 ** (_unit(crypto_id, "price") * 6 - 1), 6)
+
+
+def quote_fields(crypto_id, vs_currency, updated_at):
+    """Поля котировки пары в формате ответа /simple/price"""
+    rate = USD_RATES.get(vs_currency, 1.0 + _unit(vs_currency))
+    price = usd_price(crypto_id) * rate
+    return {
+        vs_currency: price,
+        f"{vs_currency}_market_cap": price * (1e6 + _unit(crypto_id, "supply") * 1e9),
+        f"{vs_currency}_24h_vol": price * (1e4 + _unit(crypto_id, "volume") * 1e7),
+        f"{vs_currency}_24h_change": (_unit(crypto_id, "change") - 0.5) * 20,
+        "last_updated_at": updated_at,
+    }
+
+
+class MockCoinGecko:
+    """Локальный HTTP-сервер, отвечающий как CoinGecko API"""
+
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit_rate=0.0, server_error_rate=0.0,
+                 retry_after=1, coins=None, vs_currencies=None, seed=None, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.retry_after = retry_after  # значение заголовка Retry-After в ответах 429
+        self.coins = list(cryptocurrencies) if coins is None else list(coins)
+        self.vs_currencies = list(fiat_currencies) if vs_currencies is None else list(vs_currencies)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._failures = []  # принудительные ответы для следующих запросов
+        self.counts = Counter()
+        self.errors = Counter()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def serve_forever(self):
+        """Обработка запросов в текущем потоке до остановки сервера"""
+        self._server.serve_forever(poll_interval=0.05)
+
+    def start(self):
+        """Запуск сервера в фоновом потоке; возвращает базовый адрес API"""
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-coingecko", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        """Остановка сервера"""
+        if self._thread is not None:
+            self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def fail_next(self, status, count=1):
+        """Ответ с кодом status на следующие count запросов"""
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def reset_counts(self):
+        """Сброс счетчиков запросов"""
+        with self._lock:
+            self.counts.clear()
+            self.errors.clear()
+
+    def total_requests(self):
+        """Общее число запросов ко всем эндпоинтам"""
+        with self._lock:
+            return sum(self.counts.values())
+
+    def _plan(self, endpoint):
+        """Учет запроса, выбор задержки и внедряемой ошибки"""
+        with self._lock:
+            self.counts[endpoint] += 1
+            delay = max(self.latency + self._random.uniform(-self.jitter, self.jitter), 0.0)
+            if self._failures:
+                status = self._failures.pop(0)
+            elif self._random.random() < self.rate_limit_rate:
+                status = 429
+            elif self._random.random() < self.server_error_rate:
+                status = self._random.choice((500, 502, 503))
+            else:
+                status = 200
+            if status != 200:
+                self.errors[status] += 1
+        return delay, status
+
+    # Эндпоинты API
+
+    def simple_price(self, params):
+        ids = [crypto_id for crypto_id in params.get("ids", "").split(",") if crypto_id in self.coins]
+        vs_currencies = [code for code in params.get("vs_currencies", "").split(",") if code in self.vs_currencies]
+        updated_at = int(time.time()) // 60 * 60
+        result = {}
+        for crypto_id in ids:
+            data = {}
+            for vs_currency in vs_currencies:
+                fields = quote_fields(crypto_id, vs_currency, updated_at)
+                data[vs_currency] = fields[vs_currency]
+                for flag, field in (("include_market_cap", "_market_cap"), ("include_24hr_vol", "_24h_vol"),
+                                    ("include_24hr_change", "_24h_change")):
+                    if params.get(flag) == "true":
+                        data[vs_currency + field] = fields[vs_currency + field]
+            if params.get("include_last_updated_at") == "true":
+                data["last_updated_at"] = updated_at
+            result[crypto_id] = data
+        return 200, result
+
+    def exchange_rates(self):
+        # Как у CoinGecko: стоимость 1 BTC в каждой валюте
+        btc_usd = usd_price("bitcoin")
+        rates = {"btc": {"name": "Bitcoin", "unit": "BTC", "value": 1.0, "type": "crypto"},
+                 "eth": {"name": "Ether", "unit": "ETH", "value": btc_usd / usd_price("ethereum"), "type": "crypto"}}
+        for code, rate in USD_RATES.items():
+            rates[code] = {"name": code.upper(), "unit": code.upper(), "value": btc_usd * rate, "type": "fiat"}
+        return 200, {"rates": rates}
+
+    def coins_markets(self, params):
+        vs_currency = params.get("vs_currency")
+        if vs_currency not in self.vs_currencies:
+            return 400, {"error": "invalid vs_currency"}
+        ids = params.get("ids")
+        coins = [crypto_id for crypto_id in ids.split(",") if crypto_id in self.coins] if ids else self.coins
+        per_page = int(params.get("per_page", 100))
+        page = int(params.get("page", 1))
+        updated_at = int(time.time()) // 60 * 60
+
+        markets = []
+        for crypto_id in coins:
+            fields = quote_fields(crypto_id, vs_currency, updated_at)
+            markets.append({
+                "id": crypto_id,
+                "symbol": crypto_id[:4],
+                "name": crypto_id.replace("-", " ").title(),
+                "current_price": fields[vs_currency],
+                "market_cap": fields[f"{vs_currency}_market_cap"],
+                "total_volume": fields[f"{vs_currency}_24h_vol"],
+                "price_change_percentage_24h": fields[f"{vs_currency}_24h_change"],
+                "last_updated": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(updated_at)),
+            })
+        markets.sort(key=lambda market: market["market_cap"], reverse=True)
+        for rank, market in enumerate(markets, start=1):
+            market["market_cap_rank"] = rank
+        return 200, markets[(page - 1) * per_page:page * per_page]
+
+    def market_chart(self, crypto_id, params):
+        vs_currency = params.get("vs_currency")
+        if crypto_id not in self.coins:
+            return 404, {"error": "coin not found"}
+        if vs_currency not in self.vs_currencies:
+            return 400, {"error": "invalid vs_currency"}
+
+        days = params.get("days", "1")
+        days = 365 * 10 if days == "max" else float(days)
+        # Как у CoinGecko: 5-минутные точки за сутки, часовые до 90 дней, дальше дневные
+        step = 300 if days <= 1 else 3600 if days <= 90 else 86400
+        end = int(time.time()) // step * step
+        count = int(days * 86400 // step) + 1
+        base = quote_fields(crypto_id, vs_currency, end)[vs_currency]
+
+        prices, caps, volumes = [], [], []
+        for index in range(count):
+            ts = end - (count - 1 - index) * step
+            price = base * (1 + 0.2 * (_unit(crypto_id, "chart", ts // step) - 0.5) * index / count)
+            prices.append([ts * 1000, price])
+            caps.append([ts * 1000, price * 1e7])
+            volumes.append([ts * 1000, price * 1e5])
+        return 200, {"prices": prices, "market_caps": caps, "total_volumes": volumes}
+
+    def route(self, path, params):
+        """Эндпоинт для пути запроса и ответ (код, тело)"""
+        if path.startswith(API_PREFIX):
+            path = path[len(API_PREFIX):]
+        if path == "/simple/price":
+            return "/simple/price", lambda: self.simple_price(params)
+        if path == "/coins/markets":
+            return "/coins/markets", lambda: self.coins_markets(params)
+        if path == "/coins/list":
+            return "/coins/list", lambda: (200, [{"id": crypto_id, "symbol": crypto_id[:4],
+                                                  "name": crypto_id.replace("-", " ").title()}
+                                                 for crypto_id in self.coins])
+        if path == "/simple/supported_vs_currencies":
+            return "/simple/supported_vs_currencies", lambda: (200, list(self.vs_currencies))
+        if path == "/exchange_rates":
+            return "/exchange_rates", self.exchange_rates
+        parts = path.strip("/").split("/")
+        if len(parts) == 3 and parts[0] == "coins" and parts[2] == "market_chart":
+            return "/coins/{id}/market_chart", lambda: self.market_chart(parts[1], params)
+        return path, lambda: (404, {"error": "not found"})
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Заголовки и тело уходят отдельными пакетами; без TCP_NODELAY
+            # ответы по постоянному соединению задерживались бы на ~40 мс
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                endpoint, respond = api.route(url.path, params)
+                delay, status = api._plan(endpoint)
+                if delay:
+                    time.sleep(delay)
+
+                if status == 429:
+                    body = {"status": {"error_code": 429, "error_message": "You've exceeded the Rate Limit."}}
+                elif status != 200:
+                    body = {"error": "upstream error"}
+                else:
+                    status, body = respond()
+                self.send_json(status, body)
+
+            def send_json(self, status, body):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                if status == 429:
+                    self.send_header("Retry-After", str(api.retry_after))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                # Запросы не выводятся в консоль
+                pass
+
+        return Handler
+
+
+def main(argv=None):
+    """Запуск заменителя API из командной строки"""
+    parser = argparse.ArgumentParser(description="Локальный заменитель CoinGecko API")
+    parser.add_argument("--host", default="127.0.0.1", help="адрес сервера")
+    parser.add_argument("--port", type=int, default=8000, help="порт сервера")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа в секундах")
+    parser.add_argument("--jitter", type=float, default=0.0, help="разброс задержки в секундах")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 5xx")
+    parser.add_argument("--seed", type=int, help="зерно генератора ошибок и задержек")
+    args = parser.parse_args(argv)
+
+    api = MockCoinGecko(latency=args.latency, jitter=args.jitter, rate_limit_rate=args.rate_limit_rate,
+                        server_error_rate=args.error_rate, seed=args.seed, host=args.host, port=args.port)
+    print(f"Заменитель CoinGecko API: {api.base_url}")
+    try:
+        api.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.stop()
+        print(f"Запросов: {dict(api.counts)}, ошибок: {dict(api.errors)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
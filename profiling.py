@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Режим профилирования интерфейса и сторож задержек главного цикла Tk
+
+SessionProfiler включает cProfile только на время вызова обернутых
+функций (конвертация, показ результата, построение интерфейса), поэтому
+остальная работа приложения не замедляется. LagWatchdog проверяет
+сердцебиение root.after из отдельного потока: если главный цикл не
+отвечает дольше порога, сохраняется стек, на котором он заблокирован.
+По завершении сеанса в каталог профилей записываются файл pstats,
+свернутые стеки зависаний (формат flamegraph) и журнал зависаний.
+
+Включение:
+    VALUTUS_PROFILE=1 python crypto_currency.py
+    python crypto_currency.py --profile --lag-threshold 100
+"""
+
+import cProfile
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+
+from crypto_core import DATA_DIR
+from metrics import metrics
+
+
+# Переменная окружения, включающая профилирование
+PROFILE_ENV = "VALUTUS_PROFILE"
+
+# Каталог файлов профилирования (по одному набору файлов на сеанс)
+PROFILE_DIR = os.environ.get("VALUTUS_PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+
+# Главный цикл считается заблокированным, если не отвечает дольше порога
+LAG_THRESHOLD = 0.2  # секунды
+HEARTBEAT_INTERVAL = 50  # мс между сердцебиениями root.after
+
+
+def profiling_enabled(environ=os.environ):
+    """Признак включенного профилирования в переменной окружения"""
+    return environ.get(PROFILE_ENV, "").strip().lower() not in ("", "0", "false", "no")
+
+
+def session_name():
+    """Имя сеанса профилирования: время запуска и номер процесса"""
+    return f"session-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+class SessionProfiler:
+    """cProfile, включаемый только на время вызова обернутых функций"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self._depth = 0  # обернутые функции могут вызывать друг друга
+        self.calls = 0
+
+    def wrap(self, func):
+        """Обертка, профилирующая каждый вызов func"""
+        @functools.wraps(func)
+        def profiled(*args, **kwargs):
+            self.calls += 1
+            self._depth += 1
+            if self._depth == 1:
+                self.profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.profile.disable()
+        return profiled
+
+    def save(self, path):
+        """Сохранение статистики в формате pstats (None, если вызовов не было)"""
+        if not self.calls:
+            return None
+        self.profile.dump_stats(path)
+        return path
+
+
+def _stack_frames(frame):
+    """Кадры стека от внешнего вызова к текущему: 'функция (файл:строка)'"""
+    return [f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+            for entry in traceback.extract_stack(frame)]
+
+
+class LagWatchdog:
+    """Сторож главного цикла: сердцебиение через schedule и проверка из отдельного потока"""
+
+    def __init__(self, schedule, threshold=LAG_THRESHOLD, interval=HEARTBEAT_INTERVAL,
+                 thread_id=None, clock=time.perf_counter):
+        # schedule - функция планирования вида root.after(ms, func)
+        self._schedule = schedule
+        self.threshold = threshold
+        self.interval = interval
+        self._thread_id = threading.get_ident() if thread_id is None else thread_id
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_beat = clock()
+        self._open = None  # зависание, стек которого уже снят, но цикл еще не ответил
+        self._stop = threading.Event()
+        self._thread = None
+        self.stalls = []
+
+    def start(self):
+        """Запуск сердцебиения и потока проверки"""
+        self._last_beat = self._clock()
+        self._schedule(self.interval, self.beat)
+        self._thread = threading.Thread(target=self._watch, name="lag-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Остановка потока проверки"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def beat(self):
+        """Сердцебиение в главном цикле: измеряет задержку и закрывает зависание"""
+        now = self._clock()
+        with self._lock:
+            lag = max(now - self._last_beat - self.interval / 1000, 0.0)
+            self._last_beat = now
+            stall, self._open = self._open, None
+        metrics.observe("event_loop_lag_seconds", lag)
+        if stall is None and lag > self.threshold:
+            # Поток проверки не успел снять стек (например, процесс был приостановлен)
+            stall = {"started": time.time() - lag, "stack": []}
+        if stall is not None:
+            stall["duration"] = lag
+            self.stalls.append(stall)
+            metrics.increment("event_loop_stalls_total")
+        if not self._stop.is_set():
+            self._schedule(self.interval, self.beat)
+
+    def check(self):
+        """Проверка из потока сторожа: снятие стека заблокированного главного цикла"""
+        with self._lock:
+            blocked = self._clock() - self._last_beat - self.interval / 1000
+            if self._open is not None or blocked <= self.threshold:
+                return False
+            frame = sys._current_frames().get(self._thread_id)
+            self._open = {"started": time.time() - blocked, "stack": _stack_frames(frame) if frame else []}
+            return True
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 4):
+            self.check()
+
+    def folded_stacks(self):
+        """Свернутые стеки зависаний для flamegraph: 'f1;f2;f3 миллисекунды'"""
+        weights = {}
+        for stall in self.stalls:
+            key = ";".join(stall["stack"]) or "unknown"
+            weights[key] = weights.get(key, 0) + int(stall["duration"] * 1000)
+        return [f"{stack} {weight}" for stack, weight in weights.items()]
+
+
+class ProfilingSession:
+    """Профилировщик и сторож одного запуска приложения с сохранением файлов"""
+
+    def __init__(self, directory=PROFILE_DIR, threshold=LAG_THRESHOLD, name=None):
+        self.directory = directory
+        self.threshold = threshold
+        self.name = session_name() if name is None else name
+        self.profiler = SessionProfiler()
+        self.watchdog = None
+
+    def wrap(self, func):
+        return self.profiler.wrap(func)
+
+    def watch(self, schedule):
+        """Запуск сторожа главного цикла (вызывается из потока Tk)"""
+        self.watchdog = LagWatchdog(schedule, threshold=self.threshold)
+        self.watchdog.start()
+
+    def save(self):
+        """Остановка сторожа и запись файлов сеанса; возвращает список путей"""
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, self.name)
+        paths = []
+        if self.profiler.save(base + ".pstats"):
+            paths.append(base + ".pstats")
+
+        if self.watchdog is not None:
+            self.watchdog.stop()
+            if self.watchdog.stalls:
+                with open(base + "-stalls.folded", "w", encoding="utf-8") as folded_file:
+                    folded_file.write("\n".join(self.watchdog.folded_stacks()) + "\n")
+                with open(base + "-stalls.log", "w", encoding="utf-8") as log_file:
+                    for stall in self.watchdog.stalls:
+                        started = time.strftime("%H:%M:%S", time.localtime(stall["started"]))
+                        log_file.write(f"{started} главный цикл заблокирован на {stall['duration'] * 1000:.0f} мс\n")
+                        for entry in stall["stack"]:
+                            log_file.write(f"    {entry}\n")
+                paths.extend([base + "-stalls.folded", base + "-stalls.log"])
+        return paths
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилище котировок на диске (SQLite) для мгновенного старта
+
+QuoteStore записывает котировки вместе с капитализацией, объемом и
+изменением за 24ч в локальную базу SQLite в режиме WAL. Записи
+накапливаются в памяти и сохраняются пакетами, а индекс по
+(crypto, fiat, ts) позволяет быстро выбрать последнюю котировку
+каждой пары. При запуске последний снимок загружается в кэш котировок,
+поэтому первая конвертация не ждет сеть и работает без интернета.
+Котировки старше срока хранения удаляются при записи не реже раза
+в QUOTE_STORE_PRUNE_INTERVAL, поэтому база не растет в долгом сеансе.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from crypto_core import DATA_DIR, PRICE_STALE_TTL, price_cache
+
+
+# Файл базы котировок
+QUOTE_DB_PATH = os.path.join(DATA_DIR, "quotes.sqlite3")
+
+# Пакетная запись: сохранение после стольких котировок или секунд
+QUOTE_STORE_BATCH_SIZE = 50
+QUOTE_STORE_FLUSH_INTERVAL = 5.0
+
+# Сколько секунд хранятся старые котировки (неделя)
+QUOTE_STORE_RETENTION = 7 * 24 * 60 * 60
+
+# Как часто при записи удаляются котировки старше срока хранения
+QUOTE_STORE_PRUNE_INTERVAL = 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    crypto TEXT NOT NULL,
+    fiat TEXT NOT NULL,
+    ts REAL NOT NULL,
+    price REAL NOT NULL,
+    market_cap REAL,
+    volume_24h REAL,
+    change_24h REAL,
+    last_updated_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_quotes_pair_ts ON quotes (crypto, fiat, ts);
+"""
+
+_COLUMNS = "crypto, fiat, ts, price, market_cap, volume_24h, change_24h, last_updated_at"
+
+
+class QuoteStore:
+    """Котировки в базе SQLite с пакетной записью"""
+
+    def __init__(self, path=QUOTE_DB_PATH, batch_size=QUOTE_STORE_BATCH_SIZE,
+                 flush_interval=QUOTE_STORE_FLUSH_INTERVAL, retention=QUOTE_STORE_RETENTION,
+                 prune_interval=QUOTE_STORE_PRUNE_INTERVAL, clock=time.time):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self._clock = clock
+        self._pruned_at = clock()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._pending_since = None
+        self._closed = False
+        self.rows_written = 0
+        self.rows_pruned = 0
+        self.flushes = 0
+
+        # Соединение используется из фоновых потоков под общей блокировкой
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def add(self, pair, quote, ts=None):
+        """Добавление котировки пары в очередь на запись"""
+        crypto_id, vs_currency = pair
+        crypto_data = (quote or {}).get(crypto_id) or {}
+        price = crypto_data.get(vs_currency)
+        if price is None:
+            return False
+
+        ts = self._clock() if ts is None else ts
+        row = (crypto_id, vs_currency, ts, price,
+               crypto_data.get(f"{vs_currency}_market_cap"),
+               crypto_data.get(f"{vs_currency}_24h_vol"),
+               crypto_data.get(f"{vs_currency}_24h_change"),
+               crypto_data.get("last_updated_at"))
+
+        with self._lock:
+            # Фоновые потоки могут обновлять кэш и после закрытия базы
+            if self._closed:
+                return False
+            self._pending.append(row)
+            if self._pending_since is None:
+                self._pending_since = ts
+            due = (len(self._pending) >= self.batch_size
+                   or self._clock() - self._pending_since >= self.flush_interval)
+        if due:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Запись накопленных котировок одной транзакцией (с периодической очисткой старых)"""
+        with self._lock:
+            rows, self._pending, self._pending_since = self._pending, [], None
+            if not rows or self._closed:
+                return 0
+            now = self._clock()
+            with self._db:
+                self._db.executemany(f"INSERT INTO quotes ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                if now - self._pruned_at >= self.prune_interval:
+                    self._delete_older(now - self.retention)
+            self.rows_written += len(rows)
+            self.flushes += 1
+            return len(rows)
+
+    @staticmethod
+    def _quote(row):
+        crypto_id, vs_currency, ts, price, market_cap, volume, change, last_updated_at = row
+        fields = {
+            vs_currency: price,
+            f"{vs_currency}_market_cap": market_cap,
+            f"{vs_currency}_24h_vol": volume,
+            f"{vs_currency}_24h_change": change,
+            "last_updated_at": last_updated_at,
+        }
+        return {crypto_id: {field: value for field, value in fields.items() if value is not None}}, ts
+
+    def latest(self, crypto_id, vs_currency):
+        """Последняя котировка пары и момент ее получения или None"""
+        self.flush()
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {_COLUMNS} FROM quotes WHERE crypto = ? AND fiat = ? ORDER BY ts DESC LIMIT 1",
+                (crypto_id, vs_currency)).fetchone()
+        return self._quote(row) if row else None
+
+    def snapshot(self, max_age=None):
+        """Последние котировки всех пар: {(crypto, fiat): (котировка, момент получения)}"""
+        self.flush()
+        since = float("-inf") if max_age is None else self._clock() - max_age
+        with self._lock:
+            # В SQLite остальные столбцы берутся из строки с MAX(ts)
+            rows = self._db.execute(
+                f"SELECT crypto, fiat, MAX(ts), price, market_cap, volume_24h, change_24h, last_updated_at "
+                f"FROM quotes GROUP BY crypto, fiat HAVING MAX(ts) >= ?", (since,)).fetchall()
+        return {(row[0], row[1]): self._quote(row) for row in rows}
+
+    def prune(self, max_age=None):
+        """Удаление котировок старше max_age секунд (по умолчанию - срока хранения)"""
+        max_age = self.retention if max_age is None else max_age
+        with self._lock:
+            with self._db:
+                return self._delete_older(self._clock() - max_age)
+
+    def _delete_older(self, cutoff):
+        # Вызывается под блокировкой внутри транзакции
+        deleted = self._db.execute("DELETE FROM quotes WHERE ts < ?", (cutoff,)).rowcount
+        self._pruned_at = self._clock()
+        self.rows_pruned += deleted
+        return deleted
+
+    def close(self):
+        """Запись оставшихся котировок и закрытие базы"""
+        self.flush()
+        with self._lock:
+            self._closed = True
+            self._db.close()
+
+
+def open_quote_store(path=QUOTE_DB_PATH):
+    """Открытие хранилища котировок (None, если база недоступна)"""
+    try:
+        store = QuoteStore(path)
+        store.prune()
+        return store
+    except (sqlite3.Error, OSError) as e:
+        print(f"Не удалось открыть хранилище котировок {path}: {e}", file=sys.stderr)
+        return None
+
+
+def warm_start(store, cache=None, max_age=PRICE_STALE_TTL, now=None):
+    """Загрузка последнего снимка котировок в кэш и подключение хранилища к кэшу"""
+    cache = price_cache if cache is None else cache
+    now = time.time() if now is None else now
+    loaded = 0
+    for pair, (quote, ts) in store.snapshot(max_age).items():
+        # Возраст сохраняется, чтобы устаревшая котировка обновилась в фоне
+        cache.put(pair, quote, age=max(now - ts, 0.0))
+        loaded += 1
+    # Хранилище подключается после загрузки, чтобы снимок не записывался повторно
+    cache.stores.append(store)
+    return loaded
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Векторизованный движок конвертации на NumPy
+
+Хранит цены всех криптовалют во всех фиатных валютах в виде массива
+формы (число криптовалют, число фиатных валют) и конвертирует целые
+массивы сумм по произвольным векторам пар за один вызов, в обе стороны:
+фиат -> криптовалюта и криптовалюта -> фиат.
+
+Пример:
+    engine = RateEngine.from_price_data(rate_matrix.data)
+    engine.to_crypto([100.0, 250.0], ["bitcoin", "ethereum"], ["usd", "eur"])
+"""
+
+import numpy as np
+
+from crypto_core import cryptocurrencies, fiat_currencies
+
+
+class RateEngine:
+    """Матрица цен криптовалюта x фиатная валюта с векторизованной конвертацией"""
+
+    def __init__(self, crypto_ids=None, vs_currencies=None):
+        self.crypto_ids = list(cryptocurrencies) if crypto_ids is None else list(crypto_ids)
+        self.vs_currencies = list(fiat_currencies) if vs_currencies is None else list(vs_currencies)
+
+        # Отсутствующие цены хранятся как NaN и дают NaN в результате
+        self.prices = np.full((len(self.crypto_ids), len(self.vs_currencies)), np.nan)
+
+        # Отсортированные ключи для векторного поиска индексов через searchsorted
+        self._crypto_keys, self._crypto_order = self._build_lookup(self.crypto_ids)
+        self._fiat_keys, self._fiat_order = self._build_lookup(self.vs_currencies)
+
+    @classmethod
+    def from_price_data(cls, price_data, crypto_ids=None, vs_currencies=None):
+        """Создание движка из ответа API формата {криптовалюта: {валюта: цена}}"""
+        engine = cls(crypto_ids, vs_currencies)
+        engine.update(price_data)
+        return engine
+
+    @staticmethod
+    def _build_lookup(keys):
+        keys = np.asarray(keys, dtype=str)
+        order = np.argsort(keys, kind="stable")
+        return keys[order], order
+
+    def update(self, price_data):
+        """Обновление цен из ответа API; пары вне матрицы игнорируются"""
+        fiat_positions = {fiat: j for j, fiat in enumerate(self.vs_currencies)}
+        for i, crypto_id in enumerate(self.crypto_ids):
+            crypto_data = price_data.get(crypto_id)
+            if not crypto_data:
+                continue
+            for fiat, j in fiat_positions.items():
+                price = crypto_data.get(fiat)
+                if price is not None:
+                    self.prices[i, j] = price
+
+    def set_price(self, crypto_id, vs_currency, price):
+        """Изменение цены одной пары"""
+        self.prices[self.crypto_indices(crypto_id), self.fiat_indices(vs_currency)] = price
+
+    def crypto_indices(self, crypto):
+        """Индексы строк матрицы для ключа или массива ключей криптовалют"""
+        return self._lookup(crypto, self._crypto_keys, self._crypto_order)
+
+    def fiat_indices(self, fiat):
+        """Индексы столбцов матрицы для ключа или массива ключей фиатных валют"""
+        return self._lookup(fiat, self._fiat_keys, self._fiat_order)
+
+    @staticmethod
+    def _lookup(keys, sorted_keys, order):
+        keys = np.asarray(keys)
+        # Целочисленные индексы передаются без преобразования
+        if np.issubdtype(keys.dtype, np.integer):
+            return keys
+
+        positions = np.searchsorted(sorted_keys, keys)
+        positions = np.minimum(positions, len(sorted_keys) - 1)
+        found = sorted_keys[positions] == keys
+        if not np.all(found):
+            unknown = np.unique(keys[~found]) if keys.ndim else [keys.item()]
+            raise KeyError(f"Неизвестные валюты: {', '.join(map(str, unknown))}")
+        return order[positions]
+
+    def price(self, crypto, fiat):
+        """Цены единицы криптовалюты для ключей или массивов ключей"""
+        return self.prices[self.crypto_indices(crypto), self.fiat_indices(fiat)]
+
+    def to_crypto(self, amounts, crypto, fiat):
+        """Конвертация сумм в фиатной валюте в количество криптовалюты"""
+        return np.asarray(amounts, dtype=float) / self.price(crypto, fiat)
+
+    def to_fiat(self, amounts, crypto, fiat):
+        """Конвертация количества криптовалюты в сумму в фиатной валюте"""
+        return np.asarray(amounts, dtype=float) * self.price(crypto, fiat)
+
+    def convert(self, amounts, crypto, fiat, reverse=False):
+        """Конвертация фиат -> криптовалюта или, при reverse=True, в обратную сторону"""
+        if reverse:
+            return self.to_fiat(amounts, crypto, fiat)
+        return self.to_crypto(amounts, crypto, fiat)
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Граф курсов и поиск лучшего маршрута конвертации
+
+Вершины графа - валюты (криптовалюты и фиатные), ребро u -> v хранит
+курс: сколько единиц v дают за одну единицу u. Лучший маршрут дает
+наибольшее произведение курсов, то есть наименьшую сумму весов -log(курс).
+К весу каждого ребра добавляется стоимость обмена (HOP_COST, как
+комиссия), поэтому длинный маршрут выбирается, только если выигрыш в
+курсе ее перекрывает. Веса могут быть отрицательными, поэтому поиск -
+алгоритм Беллмана-Форда по слоям с ограничением числа шагов (MAX_HOPS):
+расхождения котировок образуют циклы отрицательного веса, а маршруты
+длиннее нескольких обменов на практике не нужны.
+
+Ребра берутся из матрицы курсов. Если валюты конвертации в ней нет,
+граф дополняется кросс-курсами (стоимость каждой валюты в USD, см.
+cross_rates), а криптовалюта вне списка кросс-курсов - отдельным
+запросом ее цены в базовой валюте. Для каждого ребра запоминается
+источник курса: ребра кросс-курсов и разовых запросов обновляются по
+сроку, а возраст результата считается только по ребрам маршрута.
+
+Результаты поиска из каждой валюты кэшируются (LRU). При изменении
+одного ребра сбрасываются только те результаты, которые оно меняет:
+подешевевшее ребро - если оно улучшает расстояние хотя бы в одном слое,
+подорожавшее или удаленное - если оно входит в найденные маршруты.
+
+Пример:
+    sync_rate_graph()
+    find_conversion(1.5, "bitcoin", "ethereum")
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from crypto_core import get_quote, rate_matrix
+from cross_rates import cross_rates
+
+
+# Наибольшее число обменов в маршруте
+MAX_HOPS = 3
+
+# Стоимость одного обмена в единицах -log курса (около 0.1%)
+HOP_COST = 0.001
+
+# Улучшения меньше этого значения (в единицах -log курса) не учитываются,
+# чтобы погрешность float не порождала ложных "выгодных" циклов
+ROUTE_TOLERANCE = 1e-12
+
+# Сколько валют-источников хранит кэш результатов поиска
+ROUTE_CACHE_SIZE = 256
+
+# Источники курсов ребер: прямые курсы матрицы, кросс-курсы через USD и разовые запросы цены
+EDGE_MATRIX = "matrix"
+EDGE_CROSS = "cross"
+EDGE_QUOTE = "quote"
+
+
+class _Routes:
+    """Результат поиска из одной валюты: расстояния и предшественники по слоям"""
+
+    def __init__(self, layers, preds):
+        self.layers = layers  # layers[k][v] - лучший вес пути не длиннее k ребер
+        self.preds = preds  # preds[k][v] - предшественник v, если слой k улучшил путь
+        self.paths = {}
+
+    def layer(self, hops):
+        # Если поиск остановился раньше, следующие слои совпадают с последним
+        return self.layers[min(hops, len(self.layers) - 1)]
+
+    def path(self, target):
+        """Маршрут до target (None, если валюта недостижима)"""
+        if target in self.paths:
+            return self.paths[target]
+        path = None
+        if target in self.layers[-1]:
+            path = [target]
+            node = target
+            for hops in range(len(self.layers) - 1, 0, -1):
+                previous = self.preds[hops].get(node)
+                if previous is not None:
+                    path.append(previous)
+                    node = previous
+            path.reverse()
+        self.paths[target] = path
+        return path
+
+    def uses(self, source, target):
+        """Проверка, что ребро source -> target выбрано хотя бы в одном слое"""
+        return any(pred.get(target) == source for pred in self.preds)
+
+
+class RateGraph:
+    """Граф курсов валют с кэшируемым поиском лучшего маршрута"""
+
+    def __init__(self, max_hops=MAX_HOPS, hop_cost=HOP_COST, tolerance=ROUTE_TOLERANCE,
+                 cache_size=ROUTE_CACHE_SIZE, clock=time.monotonic):
+        self.max_hops = max_hops
+        self.hop_cost = hop_cost
+        self.tolerance = tolerance
+        self.cache_size = cache_size
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._edges = {}  # u -> {v: -log(курс) + стоимость обмена}
+        self._rates = {}  # (u, v) -> курс
+        self._providers = {}  # (u, v) -> источник курса (EDGE_MATRIX, EDGE_CROSS, EDGE_QUOTE)
+        self._quoted_at = {}  # валюта -> момент разового запроса ее цены
+        self._routes = OrderedDict()  # источник -> _Routes
+        self.synced_at = None
+        self.cross_synced_at = None
+        self.searches = 0
+        self.invalidations = 0
+
+    @property
+    def nodes(self):
+        return set(self._edges)
+
+    def __len__(self):
+        return len(self._rates)
+
+    def __contains__(self, node):
+        return node in self._edges
+
+    def rate(self, source, target):
+        """Курс ребра source -> target (None, если ребра нет)"""
+        return self._rates.get((source, target))
+
+    def provider(self, source, target):
+        """Источник курса ребра source -> target (None, если ребра нет)"""
+        return self._providers.get((source, target))
+
+    def route_providers(self, path):
+        """Источники курсов всех ребер маршрута"""
+        return {self._providers[(step_from, step_to)] for step_from, step_to in zip(path, path[1:])}
+
+    def quote_age(self, currency):
+        """Возраст разового запроса цены валюты в секундах (None, если запроса не было)"""
+        quoted_at = self._quoted_at.get(currency)
+        return None if quoted_at is None else self._clock() - quoted_at
+
+    def set_rate(self, source, target, rate, reverse=True, provider=EDGE_MATRIX):
+        """Установка курса ребра (и обратного ребра 1/курс); сбрасывает только затронутые маршруты"""
+        if not rate or rate <= 0:
+            return
+        with self._lock:
+            self._set_edge(source, target, rate, provider)
+            if reverse:
+                self._set_edge(target, source, 1.0 / rate, provider)
+
+    def remove_rate(self, source, target, reverse=True):
+        """Удаление ребра (и обратного ребра)"""
+        with self._lock:
+            self._remove_edge(source, target)
+            if reverse:
+                self._remove_edge(target, source)
+
+    def update_from_price_data(self, price_data, provider=EDGE_MATRIX):
+        """Ребра криптовалюта <-> валюта из ответа API формата {криптовалюта: {валюта: цена}}"""
+        with self._lock:
+            for crypto_id, crypto_data in price_data.items():
+                for vs_currency, price in crypto_data.items():
+                    # Поля вида usd_market_cap и last_updated_at - не курсы
+                    if "_" not in vs_currency and isinstance(price, (int, float)):
+                        self.set_rate(crypto_id, vs_currency, price, provider=provider)
+
+    def update_from_base_values(self, values, base):
+        """Ребра кросс-курсов валюта <-> base из таблицы {валюта: стоимость одной единицы в base}"""
+        with self._lock:
+            for code, value in values.items():
+                if code != base:
+                    self.set_rate(code, base, value, provider=EDGE_CROSS)
+
+    def add_quote(self, currency, price_data):
+        """Ребра из разового запроса цены валюты; момент запроса запоминается для обновления по сроку"""
+        with self._lock:
+            self.update_from_price_data(price_data, provider=EDGE_QUOTE)
+            self._quoted_at[currency] = self._clock()
+
+    def _set_edge(self, source, target, rate, provider):
+        # Прямые курсы матрицы не заменяются выведенными
+        if provider != EDGE_MATRIX and self._providers.get((source, target)) == EDGE_MATRIX:
+            return
+        self._providers[(source, target)] = provider
+        if self._rates.get((source, target)) == rate:
+            return
+        weight = -math.log(rate) + self.hop_cost
+        old_weight = self._edges.get(source, {}).get(target)
+        self._edges.setdefault(source, {})[target] = weight
+        self._edges.setdefault(target, {})
+        self._rates[(source, target)] = rate
+
+        for origin, routes in list(self._routes.items()):
+            if old_weight is not None and weight > old_weight:
+                affected = routes.uses(source, target)
+            else:
+                affected = self._improves(routes, source, target, weight)
+            if affected:
+                del self._routes[origin]
+                self.invalidations += 1
+
+    def _remove_edge(self, source, target):
+        if (source, target) not in self._rates:
+            return
+        del self._rates[(source, target)]
+        del self._providers[(source, target)]
+        del self._edges[source][target]
+        for origin, routes in list(self._routes.items()):
+            if routes.uses(source, target):
+                del self._routes[origin]
+                self.invalidations += 1
+
+    def _improves(self, routes, source, target, weight):
+        # Ребро меняет результат, если улучшает путь хотя бы в одном слое
+        for hops in range(self.max_hops):
+            distance = routes.layer(hops).get(source)
+            best = routes.layer(hops + 1).get(target, math.inf)
+            if distance is not None and distance + weight < best - self.tolerance:
+                return True
+        return False
+
+    def _search(self, origin):
+        # Беллман-Форд по слоям: слой k + 1 расширяет только вершины, улучшенные в слое k
+        layers = [{origin: 0.0}]
+        preds = [{}]
+        frontier = {origin}
+        for _ in range(self.max_hops):
+            previous = layers[-1]
+            current = dict(previous)
+            pred = {}
+            for node in frontier:
+                base = previous[node]
+                for neighbour, weight in self._edges.get(node, {}).items():
+                    if base + weight < current.get(neighbour, math.inf) - self.tolerance:
+                        current[neighbour] = base + weight
+                        pred[neighbour] = node
+            if not pred:
+                break
+            layers.append(current)
+            preds.append(pred)
+            frontier = set(pred)
+        self.searches += 1
+        return _Routes(layers, preds)
+
+    def _routes_from(self, origin):
+        routes = self._routes.get(origin)
+        if routes is not None:
+            self._routes.move_to_end(origin)
+            return routes
+        routes = self._search(origin)
+        self._routes[origin] = routes
+        if len(self._routes) > self.cache_size:
+            self._routes.popitem(last=False)
+        return routes
+
+    def best_route(self, source, target):
+        """Лучший маршрут и итоговый курс: (курс, [source, ..., target]) или (None, None)"""
+        with self._lock:
+            if source == target:
+                return (1.0, [source]) if source in self._edges else (None, None)
+            path = self._routes_from(source).path(target)
+            if path is None:
+                return None, None
+            # Курс перемножается по исходным значениям, а не восстанавливается из логарифмов
+            rate = 1.0
+            for step_from, step_to in zip(path, path[1:]):
+                rate *= self._rates[(step_from, step_to)]
+            return rate, path
+
+
+# Общий граф курсов приложения
+rate_graph = RateGraph()
+
+
+def sync_rate_graph(graph=None, matrix=None):
+    """Обновление графа по матрице курсов (меняются только ребра с новыми курсами)"""
+    graph = rate_graph if graph is None else graph
+    matrix = rate_matrix if matrix is None else matrix
+    if not matrix.is_fresh() and not matrix.refresh() and matrix.fetched_at is None:
+        return False
+    if graph.synced_at != matrix.fetched_at:
+        graph.update_from_price_data(matrix.data)
+        graph.synced_at = matrix.fetched_at
+    return True
+
+
+def sync_cross_rates(graph=None, rates=None):
+    """Ребра валюта -> базовая валюта из таблицы кросс-курсов (два запроса на все валюты)"""
+    graph = rate_graph if graph is None else graph
+    rates = cross_rates if rates is None else rates
+    if not rates.ensure_fresh():
+        return False
+    if graph.cross_synced_at != rates.fetched_at:
+        graph.update_from_base_values(rates.base_values(), rates.base)
+        graph.cross_synced_at = rates.fetched_at
+    return True
+
+
+def ensure_currency(currency, graph=None, rates=None, fetch_quote=get_quote):
+    """Добавление в граф валюты вне матрицы курсов и обновление ее курсов по сроку; False, если курса нет"""
+    graph = rate_graph if graph is None else graph
+    rates = cross_rates if rates is None else rates
+    # Ребра кросс-курсов, раз попав в граф, обновляются по сроку таблицы
+    if currency not in graph or graph.cross_synced_at is not None:
+        sync_cross_rates(graph, rates)
+    quote_age = graph.quote_age(currency)
+    if currency in graph and (quote_age is None or quote_age <= rates.max_age):
+        return True
+    # Криптовалюта вне списка кросс-курсов: отдельный запрос цены в базовой валюте,
+    # повторяемый по истечении срока
+    quote = fetch_quote(currency, rates.base)
+    if quote:
+        graph.add_quote(currency, quote)
+    return currency in graph
+
+
+def find_conversion(amount, source, target, graph=None, matrix=None, rates=None, fetch_quote=get_quote):
+    """Конвертация суммы по лучшему маршруту: словарь с результатом, курсом, маршрутом и возрастом данных"""
+    graph = rate_graph if graph is None else graph
+    matrix = rate_matrix if matrix is None else matrix
+    rates = cross_rates if rates is None else rates
+    if not sync_rate_graph(graph, matrix):
+        return None
+    if not all(ensure_currency(currency, graph, rates, fetch_quote) for currency in (source, target)):
+        return None
+    rate, path = graph.best_route(source, target)
+    if rate is None:
+        return None
+
+    # Возраст - по самым старым данным среди ребер, через которые прошел маршрут
+    providers = graph.route_providers(path)
+    ages = []
+    if EDGE_MATRIX in providers or not providers:
+        ages.append(matrix.age())
+    if EDGE_CROSS in providers:
+        ages.append(rates.age())
+    if EDGE_QUOTE in providers:
+        ages.extend(graph.quote_age(currency) for currency in path)
+    return {
+        "amount": amount,
+        "result": amount * rate,
+        "rate": rate,
+        "path": path,
+        "age": max((age for age in ages if age is not None), default=None),
+    }
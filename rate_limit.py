@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Ограничение потока запросов к API
+
+TokenBucket - ограничитель скорости "ведро с токенами": запросы сверх
+допустимой скорости не отклоняются, а ждут своей очереди, поэтому API
+не отвечает ошибкой 429 и не накладывает штрафные задержки.
+
+SingleFlight - объединение одинаковых одновременных запросов: пока
+запрос с данным ключом выполняется, остальные потоки с тем же ключом
+ждут его результата вместо отправки собственного HTTP-запроса.
+"""
+
+import threading
+import time
+
+
+# Скорость и запас ведра по умолчанию: 30 запросов в минуту с всплеском до 5
+TOKEN_RATE = 0.5  # токенов в секунду
+TOKEN_CAPACITY = 5
+
+# Отдельный бюджет пакетных заданий (пакетная конвертация, get_crypto_prices):
+# несколько запросов в секунду, чтобы они не ждали ограничения интерфейса
+BULK_TOKEN_RATE = 5.0
+BULK_TOKEN_CAPACITY = 20
+
+
+class TokenBucket:
+    """Ограничитель скорости с очередью ожидания вместо отказа"""
+
+    def __init__(self, rate=TOKEN_RATE, capacity=TOKEN_CAPACITY, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated_at = clock()
+        self.waits = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, timeout=None):
+        """Получение токена; при нехватке поток ждет своей очереди"""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            # Токен резервируется сразу (баланс может уйти в минус), поэтому
+            # ожидающие потоки обслуживаются в порядке обращения
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if timeout is not None and wait > timeout:
+                return False
+            self._tokens -= 1
+            if wait:
+                self.waits += 1
+                self.waited_seconds += wait
+
+        if wait:
+            self._sleep(wait)
+        return True
+
+    def available(self):
+        """Текущее число доступных токенов"""
+        with self._lock:
+            self._refill(self._clock())
+            return self._tokens
+
+
+class _Flight:
+    """Выполняющийся запрос, результат которого ждут другие потоки"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Объединение одновременных одинаковых вызовов в один"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, func, *args):
+        """Вызов func(*args) или ожидание уже выполняющегося вызова с тем же ключом"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func(*args)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            # Следующий вызов после завершения снова пойдет в API
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
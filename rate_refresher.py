@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Фоновое обновление курсов с адаптивным интервалом и бюджетом запросов
+
+RateRefresher - поток, который поддерживает котировки всех настроенных
+пар в кэше в свежем состоянии. Пары, которые пользователь сейчас смотрит,
+и волатильные пары (большое изменение за 24ч) обновляются чаще, остальные
+реже. Все пары, срок обновления которых наступает в ближайшее время,
+запрашиваются пакетно, а число запросов в минуту не превышает бюджет
+(бесплатный тариф CoinGecko допускает порядка 10-30 запросов в минуту).
+Низкоуровневым запросом по-прежнему остается get_crypto_price.
+"""
+
+import functools
+import sys
+import threading
+import time
+from collections import deque
+
+from crypto_core import extract_quote, get_price_client, group_price_requests, price_cache
+
+
+# Интервалы обновления в секундах
+HOT_INTERVAL = 15  # просматриваемые и волатильные пары
+IDLE_INTERVAL = 50  # остальные пары (меньше времени жизни записи в кэше)
+
+# Пары, обновление которых наступит в пределах этого окна, добавляются в текущий пакет
+COALESCE_WINDOW = 10
+
+# Пара считается волатильной при изменении за 24ч не меньше этого значения, %
+VOLATILE_CHANGE = 5.0
+
+# Сколько секунд пара считается просматриваемой после обращения пользователя
+VIEW_TTL = 300
+
+# Бюджет запросов к API в минуту
+CALLS_PER_MINUTE = 10
+
+
+class RateRefresher(threading.Thread):
+    """Фоновый поток, поддерживающий курсы выбранных пар в кэше"""
+
+    def __init__(self, pairs=(), cache=None, fetch=None, hot_interval=HOT_INTERVAL,
+                 idle_interval=IDLE_INTERVAL, calls_per_minute=CALLS_PER_MINUTE,
+                 volatile_change=VOLATILE_CHANGE, clock=time.monotonic):
+        super().__init__(name="rate-refresher", daemon=True)
+        self.cache = price_cache if cache is None else cache
+        # fetch(ids, vs_currencies) возвращает ответ в формате get_crypto_price
+        self._fetch = fetch
+        self.hot_interval = hot_interval
+        self.idle_interval = idle_interval
+        self.calls_per_minute = calls_per_minute
+        self.volatile_change = volatile_change
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._due = {}  # пара -> момент следующего обновления
+        self._viewed = {}  # пара -> момент, до которого пара считается просматриваемой
+        self._volatile = set()
+        self._calls = deque()  # моменты последних запросов для учета бюджета
+        self.stats = {"calls": 0, "pairs_refreshed": 0, "deferred": 0, "errors": 0}
+
+        self.add_pairs(pairs)
+
+    def add_pairs(self, pairs):
+        """Добавление пар для фонового обновления (новые пары обновляются сразу)"""
+        now = self._clock()
+        with self._lock:
+            for pair in pairs:
+                self._due.setdefault(pair, now)
+        self._wakeup.set()
+
+    def mark_viewed(self, crypto_id, vs_currency):
+        """Отметка пары как просматриваемой: она будет обновляться чаще"""
+        pair = (crypto_id, vs_currency)
+        now = self._clock()
+        with self._lock:
+            self._viewed[pair] = now + VIEW_TTL
+            if pair not in self._due:
+                # Новая пара обновляется сразу
+                self._due[pair] = now
+            else:
+                self._due[pair] = min(self._due[pair], now + self.hot_interval)
+        self._wakeup.set()
+
+    def interval_for(self, pair, now=None):
+        """Интервал обновления пары с учетом просмотра и волатильности"""
+        now = self._clock() if now is None else now
+        if self._viewed.get(pair, 0) > now or pair in self._volatile:
+            return self.hot_interval
+        return self.idle_interval
+
+    def _budget_left(self, now):
+        while self._calls and now - self._calls[0] >= 60:
+            self._calls.popleft()
+        return self.calls_per_minute - len(self._calls)
+
+    def refresh_due(self):
+        """Пакетное обновление пар, срок которых наступил; возвращает число запросов"""
+        now = self._clock()
+        with self._lock:
+            due_pairs = {pair: due for pair, due in self._due.items() if due <= now + COALESCE_WINDOW}
+        if not due_pairs:
+            return 0
+
+        # Пакеты с самыми просроченными парами отправляются первыми
+        batches = []
+        for ids, vs_currencies in group_price_requests(due_pairs):
+            # Запрос охватывает объединение валют: обновляются только пары, срок которых наступил
+            batch = [(crypto_id, vs_currency) for crypto_id in ids.split(",") for vs_currency in vs_currencies.split(",")
+                     if (crypto_id, vs_currency) in due_pairs]
+            batches.append((min(due_pairs[pair] for pair in batch), ids, vs_currencies, batch))
+        batches.sort(key=lambda item: item[0])
+
+        # Число запросов ограничивает собственный бюджет потока, а не ограничитель интерфейса
+        fetch = self._fetch or functools.partial(get_price_client().get_price, limiter=None)
+        calls = 0
+        for _, ids, vs_currencies, batch in batches:
+
+            with self._lock:
+                if self._budget_left(now) <= 0:
+                    # Бюджет исчерпан: пакет переносится до освобождения окна
+                    retry_at = self._calls[0] + 60
+                    for pair in batch:
+                        self._due[pair] = max(self._due.get(pair, retry_at), retry_at)
+                    self.stats["deferred"] += 1
+                    continue
+                self._calls.append(now)
+
+            price_data = fetch(ids, vs_currencies)
+            calls += 1
+            self._store(batch, price_data, now)
+
+        return calls
+
+    def _store(self, batch, price_data, now):
+        with self._lock:
+            self.stats["calls"] += 1
+            if not price_data:
+                self.stats["errors"] += 1
+
+            for pair in batch:
+                crypto_id, vs_currency = pair
+                quote = extract_quote(price_data, crypto_id, vs_currency)
+                if quote:
+                    self.cache.put(pair, quote)
+                    self.stats["pairs_refreshed"] += 1
+                    change = quote[crypto_id].get(f"{vs_currency}_24h_change") or 0
+                    if abs(change) >= self.volatile_change:
+                        self._volatile.add(pair)
+                    else:
+                        self._volatile.discard(pair)
+
+                # При ошибке пара тоже переносится, чтобы не тратить бюджет повторами
+                self._due[pair] = now + self.interval_for(pair, now)
+
+    def next_wakeup(self):
+        """Секунды до ближайшего запланированного обновления"""
+        with self._lock:
+            if not self._due:
+                return None
+            return max(min(self._due.values()) - self._clock(), 0)
+
+    def run(self):
+        while not self._stopped:
+            # Событие сбрасывается до обновления, чтобы не пропустить mark_viewed
+            self._wakeup.clear()
+            try:
+                self.refresh_due()
+            except Exception as e:
+                # Непредвиденная ошибка не должна останавливать фоновое обновление;
+                # сроки пар не сдвинулись, поэтому повтор откладывается на короткий интервал
+                with self._lock:
+                    self.stats["errors"] += 1
+                print(f"Ошибка фонового обновления курсов: {e!r}", file=sys.stderr)
+                self._wakeup.wait(self.hot_interval)
+                continue
+            self._wakeup.wait(self.next_wakeup())
+
+    def stop(self):
+        """Остановка фонового потока"""
+        self._stopped = True
+        self._wakeup.set()
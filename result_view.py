@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Содержимое окна результата без зависимости от tkinter
+
+Окно результата создается один раз и при каждой конвертации только
+меняет текст своих полей, а последние результаты хранятся в кольцевом
+буфере фиксированного размера. В режиме автообновления открытый
+результат пересчитывается по свежим курсам, и виджеты затрагиваются
+только для полей, текст которых изменился. Здесь находятся
+форматирование полей, их обновление и история, которые не требуют
+графического интерфейса.
+"""
+
+from collections import deque
+
+from crypto_core import format_age
+
+
+# Число последних результатов в истории окна
+RESULT_HISTORY_SIZE = 20
+
+# Поля окна результата в порядке отображения
+RESULT_FIELDS = ("result", "price", "market_cap", "volume", "change", "age", "route")
+
+
+def _format_change(change):
+    # У котировок по кросс-курсу нет изменения за 24ч в выбранной валюте
+    return "нет данных" if change is None else f"{change:+.2f}%"
+
+
+def result_fields(amount, fiat_currency, fiat_label, crypto_amount, crypto_name, crypto_price, crypto_data,
+                  data_age=0.0):
+    """Тексты полей окна результата"""
+    return {
+        "result": f"{amount:,.2f} {fiat_label} = {crypto_amount:,.8f} {crypto_name}",
+        "price": f"Стоимость одного {crypto_name} = {crypto_price:,.2f} {fiat_label}",
+        "market_cap": f"Рыночная капитализация криптовалюты = "
+                      f"{crypto_data.get(f'{fiat_currency}_market_cap', 0):,.0f} {fiat_label}",
+        "volume": f"Объем торгов на бирже за 24ч = {crypto_data.get(f'{fiat_currency}_24h_vol', 0):,.0f} {fiat_label}",
+        "change": f"Изменение стоимости за последние 24ч = "
+                  f"{_format_change(crypto_data.get(f'{fiat_currency}_24h_change'))}",
+        "age": f"Данные обновлены: {format_age(data_age)}",
+    }
+
+
+def _format_rate(rate):
+    # Малые курсы (например, BTC за рубль) показываются значащими цифрами
+    return f"{rate:,.2f}" if rate >= 1 else f"{rate:.8g}"
+
+
+def route_fields(amount, source_label, target_label, converted, rate, route_labels, data_age=0.0,
+                 source_digits=8, target_digits=2):
+    """Тексты полей окна результата для конвертации по маршруту графа курсов"""
+    return {
+        "result": f"{amount:,.{source_digits}f} {source_label} = {converted:,.{target_digits}f} {target_label}",
+        "price": f"Курс: 1 {source_label} = {_format_rate(rate)} {target_label}",
+        # Рыночные данные относятся к паре фиат/криптовалюта и здесь не показываются
+        "market_cap": "",
+        "volume": "",
+        "change": "",
+        "age": f"Данные обновлены: {format_age(data_age)}",
+        "route": f"Маршрут: {' → '.join(route_labels)}",
+    }
+
+
+class FieldUpdater:
+    """Обновление полей окна, текст которых действительно изменился"""
+
+    def __init__(self, setters):
+        # setters: {поле: функция, устанавливающая текст виджета}
+        self._setters = setters
+        self._shown = {}
+
+    def update(self, fields):
+        """Установка новых текстов; возвращает имена измененных полей"""
+        changed = [name for name, text in fields.items() if self._shown.get(name) != text]
+        for name in changed:
+            self._setters[name](fields[name])
+            self._shown[name] = fields[name]
+        return changed
+
+
+class ResultHistory:
+    """Последние результаты конвертации в кольцевом буфере"""
+
+    def __init__(self, size=RESULT_HISTORY_SIZE):
+        self._entries = deque(maxlen=size)
+
+    def add(self, text):
+        """Добавление результата; самый старый вытесняется при переполнении"""
+        self._entries.appendleft(text)
+
+    def entries(self):
+        """Результаты от последнего к первому"""
+        return list(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
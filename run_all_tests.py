@@ -6,6 +6,10 @@
 Этот модуль объединяет и координирует выполнение всех типов тестов:
 - Unit-тесты (основные функциональные тесты)
 - Интеграционные тесты (тесты взаимодействия компонентов)
+- Замеры производительности (по флагу --bench)
+
+С флагом --jobs тесты обоих модулей запускаются по отдельности в пуле
+процессов, а по итогам выводятся самые медленные тесты.
 
 Обеспечивает:
 - Последовательный запуск всех тестовых наборов
@@ -16,12 +20,21 @@
 
 Использование:
     python run_all_tests.py
+    python run_all_tests.py --bench
+    python run_all_tests.py --bench --update-baseline
+    python run_all_tests.py --jobs 4 --slowest 10
     
 Или импорт функции main() для использования в других скриптах.
 """
 
 import sys
 import os
+import io
+import time
+import argparse
+import unittest
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 import traceback
 
@@ -34,6 +47,12 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from test_crypto_currency import run_tests
 from test_integration import run_integration_tests
 
+# Модули, из которых параллельный запуск собирает тесты
+TEST_MODULES = ("test_crypto_currency", "test_integration")
+
+# Сколько самых медленных тестов показывать по умолчанию
+SLOWEST_TESTS = 10
+
 
 def print_header():
     """
@@ -107,7 +126,129 @@ def print_error_summary(error):
     print("=" * 80)
 
 
-def main():
+def discover_test_ids(modules=TEST_MODULES):
+    """
+    Поиск всех тестов в модулях
+    
+    Args:
+        modules (tuple): Имена тестовых модулей
+        
+    Returns:
+        list: Полные имена тестов вида модуль.Класс.метод
+    """
+    loader = unittest.TestLoader()
+    test_ids = []
+    pending = [loader.loadTestsFromName(module) for module in modules]
+    while pending:
+        item = pending.pop(0)
+        if isinstance(item, unittest.TestSuite):
+            pending[:0] = list(item)
+        else:
+            test_ids.append(item.id())
+    return test_ids
+
+
+def run_single_test(test_id):
+    """
+    Выполнение одного теста (в том числе в процессе пула)
+    
+    Args:
+        test_id (str): Полное имя теста
+        
+    Returns:
+        dict: Имя, статус (ok, fail, error, skip), длительность в секундах и детали ошибки
+    """
+    test = unittest.TestLoader().loadTestsFromName(test_id)
+    result = unittest.TestResult()
+    start = time.perf_counter()
+    # Вывод теста ("✓ ... прошел успешно") не смешивается с выводом других процессов
+    with redirect_stdout(io.StringIO()):
+        test.run(result)
+    duration = time.perf_counter() - start
+    
+    status, details = "ok", ""
+    if result.errors:
+        status, details = "error", result.errors[0][1]
+    elif result.failures:
+        status, details = "fail", result.failures[0][1]
+    elif result.skipped:
+        status, details = "skip", result.skipped[0][1]
+    return {"id": test_id, "status": status, "duration": duration, "details": details}
+
+
+def slowest_tests(results, count=SLOWEST_TESTS):
+    """Самые медленные тесты по убыванию длительности"""
+    return sorted(results, key=lambda item: item["duration"], reverse=True)[:count]
+
+
+def run_parallel_tests(jobs, test_ids=None, slowest=SLOWEST_TESTS):
+    """
+    Параллельный запуск тестов в пуле процессов
+    
+    Каждый тест выполняется отдельно, поэтому медленные тесты не задерживают
+    остальные. При jobs=1 тесты выполняются в текущем процессе.
+    
+    Args:
+        jobs (int): Число процессов
+        test_ids (list): Тесты для запуска (по умолчанию все тесты TEST_MODULES)
+        slowest (int): Сколько самых медленных тестов вывести
+        
+    Returns:
+        list: Результаты тестов (см. run_single_test)
+    """
+    test_ids = discover_test_ids() if test_ids is None else test_ids
+    start = time.perf_counter()
+    if jobs <= 1:
+        results = [run_single_test(test_id) for test_id in test_ids]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(run_single_test, test_id) for test_id in test_ids]
+            results = [future.result() for future in as_completed(futures)]
+    elapsed = time.perf_counter() - start
+    
+    failed = [item for item in results if item["status"] in ("fail", "error")]
+    for item in failed:
+        print(f"❌ {item['id']}: {item['details']}")
+    
+    print(f"\n⏱️  Самые медленные тесты:")
+    for item in slowest_tests(results, slowest):
+        print(f"   {item['duration'] * 1000:9.1f} мс  {item['id']}")
+    
+    total = sum(item["duration"] for item in results)
+    if failed:
+        print(f"\n❌ Обнаружены ошибки в {len(failed)} из {len(results)} тестов")
+    else:
+        print(f"\n✅ Все тесты прошли успешно! Выполнено: {len(results)} тестов")
+    print(f"⏱️  Время: {elapsed:.2f} с ({jobs} проц.), сумма длительностей тестов {total:.2f} с")
+    return results
+
+
+def parse_args(argv=None):
+    """
+    Разбор аргументов командной строки
+    
+    Args:
+        argv (list): Аргументы (по умолчанию sys.argv[1:])
+        
+    Returns:
+        argparse.Namespace: Флаги запуска
+    """
+    parser = argparse.ArgumentParser(description="Запуск всех тестов конвертера криптовалют")
+    parser.add_argument("--bench", action="store_true",
+                        help="выполнить замеры производительности после тестов")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="допустимое замедление медианы относительно базы (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="сохранить результаты замеров как новые базовые значения")
+    parser.add_argument("--jobs", "-j", type=int, default=None,
+                        help="запустить тесты в пуле из N процессов с замером длительности каждого теста "
+                             "(0 - по числу процессоров)")
+    parser.add_argument("--slowest", type=int, default=SLOWEST_TESTS,
+                        help="сколько самых медленных тестов показать при запуске с --jobs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """
     Главная функция для координированного запуска всех тестов
     
@@ -116,42 +257,80 @@ def main():
     2. Последовательный запуск всех типов тестов:
        - Unit-тесты (основные функциональные тесты)
        - Интеграционные тесты (тесты взаимодействия)
+       - Замеры производительности (только с флагом --bench)
+       С флагом --jobs unit- и интеграционные тесты выполняются одним этапом
+       в пуле процессов
     3. Обработку ошибок и исключений
     4. Вывод итоговой статистики и рекомендаций
     
+    Args:
+        argv (list): Аргументы командной строки (по умолчанию sys.argv[1:])
+    
     Returns:
-        int: Код возврата (0 - успех, 1 - ошибка)
+        int: Код возврата (0 - успех, 1 - ошибка или регрессия производительности)
         
     Raises:
         SystemExit: При критических ошибках выполнения
     """
+    args = parse_args(argv)
     try:
         # ИНИЦИАЛИЗАЦИЯ: Выводим заголовок системы тестирования
         print_header()
         
-        # ЭТАП 1: Запуск основных функциональных тестов (Unit-тесты)
-        # Эти тесты проверяют отдельные функции и компоненты изолированно
-        print_stage_separator(
-            1, 
-            "Основные функциональные тесты (Unit-тесты)",
-            "Проверка отдельных функций и компонентов системы"
-        )
-        
-        # Вызываем функцию запуска unit-тестов
-        # Она выполнит все тесты из test_crypto_currency.py и выведет результаты
-        run_tests()
-        
-        # ЭТАП 2: Запуск интеграционных тестов
-        # Эти тесты проверяют взаимодействие между компонентами
-        print_stage_separator(
-            2,
-            "Интеграционные тесты", 
-            "Проверка взаимодействия между компонентами системы"
-        )
+        if args.jobs is not None:
+            jobs = args.jobs or os.cpu_count() or 1
+            # ЭТАПЫ 1-2: Unit- и интеграционные тесты в пуле процессов
+            # Каждый тест запускается отдельно, его длительность замеряется
+            print_stage_separator(
+                "1-2",
+                "Unit- и интеграционные тесты (параллельно)",
+                f"Тесты {', '.join(TEST_MODULES)} в пуле из {jobs} процессов"
+            )
+            results = run_parallel_tests(jobs, slowest=args.slowest)
+            if any(item["status"] in ("fail", "error") for item in results):
+                print("=" * 80)
+                return 1
+        else:
+            # ЭТАП 1: Запуск основных функциональных тестов (Unit-тесты)
+            # Эти тесты проверяют отдельные функции и компоненты изолированно
+            print_stage_separator(
+                1, 
+                "Основные функциональные тесты (Unit-тесты)",
+                "Проверка отдельных функций и компонентов системы"
+            )
+            
+            # Вызываем функцию запуска unit-тестов
+            # Она выполнит все тесты из test_crypto_currency.py и выведет результаты
+            run_tests()
+            
+            # ЭТАП 2: Запуск интеграционных тестов
+            # Эти тесты проверяют взаимодействие между компонентами
+            print_stage_separator(
+                2,
+                "Интеграционные тесты", 
+                "Проверка взаимодействия между компонентами системы"
+            )
+            
+            # Вызываем функцию запуска интеграционных тестов
+            # Она выполнит все тесты из test_integration.py и выведет результаты
+            run_integration_tests()
         
-        # Вызываем функцию запуска интеграционных тестов
-        # Она выполнит все тесты из test_integration.py и выведет результаты
-        run_integration_tests()
+        # ЭТАП 3: Замеры производительности (по флагу --bench)
+        # Замеры выполняются на локальном заменителе API и сравниваются с базой
+        if args.bench:
+            print_stage_separator(
+                3,
+                "Замеры производительности",
+                "Медиана и p95 на локальном заменителе API, сравнение с базовыми значениями"
+            )
+            
+            # Модуль замеров импортируется только при необходимости
+            from benchmarks import BENCH_THRESHOLD, run_benchmarks
+            threshold = BENCH_THRESHOLD if args.threshold is None else args.threshold
+            if not run_benchmarks(threshold=threshold, update_baseline=args.update_baseline):
+                print("\n❌ ОБНАРУЖЕНА РЕГРЕССИЯ ПРОИЗВОДИТЕЛЬНОСТИ")
+                print("=" * 80)
+                return 1
         
         # ЗАВЕРШЕНИЕ: Выводим сводку об успешном завершении
         print_success_summary()
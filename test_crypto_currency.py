@@ -15,13 +15,46 @@ import unittest
 from unittest.mock import patch, MagicMock
 import sys
 import os
+import threading
+import asyncio
+import subprocess
+import tempfile
+import time
 
 # Добавляем путь к основному модулю для импорта
-# Это необходимо для корректного импорта функций из crypto_currency.py
+# Это необходимо для корректного импорта функций из crypto_core.py
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# NumPy нужен только для векторизованного движка конвертации
+try:
+    import numpy
+    from rate_engine import RateEngine
+except ImportError:
+    numpy = None
+
+# Бюджет времени импорта модуля crypto_core в секундах
+IMPORT_TIME_BUDGET = 0.05
+
 # Импортируем тестируемые функции и данные
-from crypto_currency import get_crypto_price, cryptocurrencies, fiat_currencies
+from crypto_core import get_crypto_price, cryptocurrencies, fiat_currencies
+from crypto_core import QuoteCache, get_quote
+from crypto_core import RateMatrix, fetch_rate_matrix
+from crypto_core import BackgroundFetcher
+from crypto_core import group_price_requests, get_crypto_prices
+from crypto_core import get_quote_with_age, peek_quote, quote_age, format_age
+from currency_registry import CurrencyRegistry, load_crypto_registry, load_fiat_registry
+from currency_registry import CurrencySearchIndex
+from rate_refresher import RateRefresher
+from rate_limit import SingleFlight, TokenBucket
+from quote_store import QuoteStore, warm_start
+from tick_store import TickStore
+from market_chart import chart_coordinates, get_chart_points, get_market_chart, lttb
+from result_view import FieldUpdater, ResultHistory, result_fields
+from benchmarks import find_regressions, measure, summarize
+from metrics import MetricsRegistry
+from profiling import LagWatchdog, ProfilingSession
+from rate_graph import RateGraph, find_conversion
+from cross_rates import CrossRates
 
 
 class TestCryptoCurrency(unittest.TestCase):
@@ -90,7 +123,7 @@ class TestCryptoCurrency(unittest.TestCase):
         
         print("✓ Тест словаря фиатных валют прошел успешно")
     
-    @patch('crypto_currency.requests.get')
+    @patch('crypto_core.requests.get')
     def test_get_crypto_price_success(self, mock_get):
         """
         Тест успешного получения данных о цене криптовалюты через API
@@ -132,7 +165,7 @@ class TestCryptoCurrency(unittest.TestCase):
         
         print("✓ Тест успешного получения цены криптовалюты прошел успешно")
     
-    @patch('crypto_currency.requests.get')
+    @patch('crypto_core.requests.get')
     def test_get_crypto_price_api_error(self, mock_get):
         """
         Тест обработки ошибок при запросе к API
@@ -159,7 +192,7 @@ class TestCryptoCurrency(unittest.TestCase):
         
         print("✓ Тест обработки ошибки API прошел успешно")
     
-    @patch('crypto_currency.requests.get')
+    @patch('crypto_core.requests.get')
     def test_get_crypto_price_timeout(self, mock_get):
         """
         Тест обработки таймаута при запросе к API
@@ -292,6 +325,1172 @@ class TestCryptoCurrency(unittest.TestCase):
         
         print("✓ Тест формата значений валют прошел успешно")
 
+    def test_quote_cache_ttl(self):
+        """
+        Тест времени жизни записей в кэше котировок
+        
+        Использует управляемые "часы", чтобы не ждать реального времени.
+        Проверяет:
+        - Что свежая запись возвращается из кэша (попадание)
+        - Что запись старше TTL удаляется и считается промахом
+        """
+        now = [0.0]
+        cache = QuoteCache(ttl=30, maxsize=10, clock=lambda: now[0])
+        cache.put(("bitcoin", "usd"), {"bitcoin": {"usd": 45000.0}})
+        
+        # Запись свежая - должна вернуться из кэша
+        now[0] = 29.0
+        self.assertEqual(cache.get(("bitcoin", "usd")), {"bitcoin": {"usd": 45000.0}})
+        
+        # Запись устарела - кэш должен вернуть None
+        now[0] = 31.0
+        self.assertIsNone(cache.get(("bitcoin", "usd")), 
+                          "Устаревшая котировка не должна возвращаться")
+        
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["expirations"], 1)
+        self.assertEqual(stats["size"], 0)
+        
+        print("✓ Тест времени жизни записей кэша прошел успешно")
+    
+    def test_quote_cache_lru_eviction(self):
+        """
+        Тест вытеснения давно не использованных записей (LRU)
+        
+        При превышении максимального размера кэш должен удалять
+        запись, к которой дольше всего не обращались.
+        """
+        cache = QuoteCache(ttl=60, maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        
+        # Обращение к "a" делает ее самой свежей, вытеснена будет "b"
+        cache.get("a")
+        cache.put("c", 3)
+        
+        self.assertEqual(len(cache), 2, "Размер кэша не должен превышать maxsize")
+        self.assertIsNone(cache.get("b"), "Запись 'b' должна быть вытеснена")
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+        
+        print("✓ Тест вытеснения LRU прошел успешно")
+    
+    @patch('crypto_core.requests.Session.get')
+    def test_get_quote_reuses_cached_quote(self, mock_get):
+        """
+        Тест повторного использования котировки из кэша
+        
+        Проверяет, что повторная конвертация той же пары через get_quote
+        не выполняет новый HTTP-запрос, а ошибочный ответ не сохраняется в кэш.
+        """
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"bitcoin": {"usd": 45000.0}}
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+        cache = QuoteCache(ttl=60, maxsize=10)
+        
+        with patch("crypto_core.price_cache", cache), \
+                patch("crypto_core.rate_matrix", RateMatrix(["bitcoin"], ["usd"])):
+            first = get_quote("bitcoin", "usd")
+            second = get_quote("bitcoin", "usd")
+            
+            self.assertEqual(first, second)
+            self.assertEqual(first["bitcoin"]["usd"], 45000.0)
+            self.assertEqual(mock_get.call_count, 1, 
+                             "Повторный запрос должен обслуживаться из кэша")
+            
+            # Ошибка API не должна попадать в кэш
+            mock_get.side_effect = Exception("API Error")
+            self.assertIsNone(get_quote("ethereum", "usd"))
+            self.assertIsNone(cache.get(("ethereum", "usd")))
+        
+        print("✓ Тест кэширования котировок прошел успешно")
+
+    @patch('crypto_core.requests.Session.get')
+    def test_fetch_rate_matrix_single_request(self, mock_get):
+        """
+        Тест получения полной матрицы курсов одним запросом
+        
+        Проверяет, что все криптовалюты и все фиатные валюты передаются
+        в API списками через запятую, а не отдельными запросами.
+        """
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"bitcoin": {"usd": 45000.0}}
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+        
+        fetch_rate_matrix()
+        
+        self.assertEqual(mock_get.call_count, 1, "Должен выполняться ровно один запрос")
+        params = mock_get.call_args.kwargs["params"]
+        self.assertEqual(params["ids"].split(","), list(cryptocurrencies))
+        self.assertEqual(params["vs_currencies"].split(","), list(fiat_currencies))
+        
+        print("✓ Тест пакетного запроса матрицы курсов прошел успешно")
+    
+    @patch('crypto_core.requests.Session.get')
+    def test_rate_matrix_quote(self, mock_get):
+        """
+        Тест выборки котировки из матрицы курсов
+        
+        Проверяет, что после одного обновления матрица отдает данные
+        по любой паре в формате ответа get_crypto_price.
+        """
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "bitcoin": {
+                "usd": 45000.0, "usd_market_cap": 850000000000,
+                "usd_24h_vol": 25000000000, "usd_24h_change": 2.5,
+                "eur": 41000.0, "eur_market_cap": 780000000000,
+                "eur_24h_vol": 23000000000, "eur_24h_change": 2.4
+            }
+        }
+        mock_response.raise_for_status.return_value = None
+        mock_get.return_value = mock_response
+        matrix = RateMatrix(["bitcoin"], ["usd", "eur"])
+        
+        self.assertFalse(matrix.is_fresh(), "Пустая матрица не считается свежей")
+        self.assertTrue(matrix.refresh())
+        self.assertTrue(matrix.is_fresh())
+        
+        self.assertEqual(matrix.price("bitcoin", "eur"), 41000.0)
+        self.assertEqual(matrix.quote("bitcoin", "usd"), {
+            "bitcoin": {
+                "usd": 45000.0, "usd_market_cap": 850000000000,
+                "usd_24h_vol": 25000000000, "usd_24h_change": 2.5
+            }
+        })
+        self.assertIsNone(matrix.quote("ethereum", "usd"))
+        self.assertEqual(mock_get.call_count, 1)
+        
+        print("✓ Тест выборки из матрицы курсов прошел успешно")
+
+    def _run_scheduled(self, scheduled):
+        """Выполнение отложенных вызовов, как это делал бы главный цикл Tk"""
+        while scheduled:
+            _, func, args = scheduled.pop(0)
+            func(*args)
+    
+    def test_background_fetcher_delivers_result(self):
+        """
+        Тест доставки результата фонового запроса в главный цикл
+        
+        Вместо root.after используется список отложенных вызовов.
+        Проверяет:
+        - Что запрос выполняется не в вызывающем потоке
+        - Что результат передается в on_done через планировщик
+        - Что после завершения fetcher больше не занят
+        """
+        scheduled = []
+        fetcher = BackgroundFetcher(lambda ms, func, *args: scheduled.append((ms, func, args)))
+        results = []
+        
+        fetcher.submit(lambda: threading.current_thread().name, (),
+                       on_done=results.append, on_error=self.fail)
+        self.assertTrue(fetcher.busy, "Во время запроса fetcher должен быть занят")
+        
+        self._run_scheduled(scheduled)
+        fetcher.shutdown()
+        
+        self.assertEqual(len(results), 1)
+        self.assertNotEqual(results[0], threading.current_thread().name, 
+                            "Запрос должен выполняться в фоновом потоке")
+        self.assertFalse(fetcher.busy)
+        
+        print("✓ Тест фонового получения данных прошел успешно")
+    
+    def test_background_fetcher_drops_superseded(self):
+        """
+        Тест отмены вытесненного запроса
+        
+        Если пользователь запустил новый запрос или отменил текущий,
+        результат старого запроса не должен попасть в интерфейс.
+        """
+        scheduled = []
+        fetcher = BackgroundFetcher(lambda ms, func, *args: scheduled.append((ms, func, args)))
+        results = []
+        release = threading.Event()
+        
+        fetcher.submit(lambda: release.wait(5) and "старый", (),
+                       on_done=results.append, on_error=self.fail)
+        fetcher.submit(lambda: "новый", (), on_done=results.append, on_error=self.fail)
+        release.set()
+        self._run_scheduled(scheduled)
+        
+        # Ошибка в фоновом потоке передается в on_error
+        errors = []
+        fetcher.submit(lambda: 1 / 0, (), on_done=results.append, on_error=errors.append)
+        self._run_scheduled(scheduled)
+        fetcher.shutdown()
+        
+        self.assertEqual(results, ["новый"], "Результат старого запроса должен быть отброшен")
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], ZeroDivisionError)
+        
+        print("✓ Тест отмены вытесненного запроса прошел успешно")
+
+    def test_group_price_requests(self):
+        """
+        Тест объединения пар валют в пакетные запросы
+        
+        Проверяет:
+        - Что повторяющиеся пары запрашиваются один раз
+        - Что пересекающиеся наборы пар идут одним запросом по объединению
+          криптовалют и валют
+        - Что валюты объединяются через запятую
+        """
+        pairs = [
+            ("bitcoin", "usd"), ("bitcoin", "eur"), ("bitcoin", "usd"),
+            ("ethereum", "usd"), ("ethereum", "eur"),
+            ("solana", "rub"),
+        ]
+        
+        batches = group_price_requests(pairs)
+        
+        self.assertEqual(batches, [("bitcoin,ethereum,solana", "eur,rub,usd")])
+        self.assertEqual(group_price_requests([("bitcoin", "usd"), ("bitcoin", "eur"), ("ethereum", "usd")]),
+                         [("bitcoin,ethereum", "eur,usd")], "Пересекающиеся пары - один запрос")
+        
+        # Ограничение числа криптовалют в одном запросе
+        many = [(f"coin-{i}", "usd") for i in range(5)]
+        self.assertEqual(len(group_price_requests(many, max_ids=2)), 3)
+        
+        print("✓ Тест объединения запросов прошел успешно")
+    
+    def test_get_crypto_prices_concurrent(self):
+        """
+        Тест асинхронного получения данных по многим парам
+        
+        Фиктивный клиент ждет на барьере, который пропускает потоки
+        только если все три запроса выполняются одновременно.
+        Проверяет:
+        - Что пакетные запросы выполняются параллельно
+        - Что результат имеет формат, который использует show_result,
+          и содержит только запрошенные пары
+        """
+        barrier = threading.Barrier(3, timeout=5)
+        calls = []
+        
+        class FakeClient:
+            def get_price(self, crypto_id, vs_currency, limiter=None):
+                calls.append((crypto_id, vs_currency))
+                barrier.wait()
+                crypto_data = {}
+                for fiat in vs_currency.split(","):
+                    crypto_data.update({fiat: 1.0, f"{fiat}_24h_change": 0.5})
+                return {crypto: dict(crypto_data) for crypto in crypto_id.split(",")}
+        
+        pairs = [("bitcoin", "usd"), ("ethereum", "eur"), ("ethereum", "usd"), ("solana", "rub")]
+        # По одной криптовалюте в запросе: три запроса
+        price_data = asyncio.run(get_crypto_prices(pairs, max_concurrency=3, client=FakeClient(), max_ids=1))
+        
+        self.assertEqual(len(calls), 3, "Пары должны быть объединены в три запроса")
+        self.assertEqual(price_data["bitcoin"], {"usd": 1.0, "usd_24h_change": 0.5})
+        self.assertEqual(set(price_data["ethereum"]), {"usd", "usd_24h_change", "eur", "eur_24h_change"})
+        self.assertEqual(price_data["solana"]["rub"], 1.0)
+        
+        # Пары из запроса, завершившегося ошибкой, собираются в failed
+        class FailingClient:
+            def get_price(self, crypto_id, vs_currency, limiter=None):
+                return None if crypto_id == "ethereum" else {crypto_id: {vs_currency: 1.0}}
+        
+        failed = set()
+        price_data = asyncio.run(get_crypto_prices(pairs, client=FailingClient(), failed=failed, max_ids=1))
+        self.assertEqual(failed, {("ethereum", "eur"), ("ethereum", "usd")})
+        self.assertNotIn("ethereum", price_data)
+        
+        print("✓ Тест асинхронного получения котировок прошел успешно")
+
+    def test_core_import_is_headless_and_fast(self):
+        """
+        Тест быстрого импорта ядра без графического интерфейса
+        
+        Импорт выполняется в отдельном процессе, чтобы измерить
+        "холодное" время загрузки. Проверяет:
+        - Что crypto_core не загружает tkinter и requests
+        - Что медиана времени импорта укладывается в IMPORT_TIME_BUDGET
+        - Что модуль интерфейса импортируется без создания окна
+        """
+        script = (
+            "import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import crypto_core\n"
+            "elapsed = time.perf_counter() - start\n"
+            "print(elapsed, 'tkinter' in sys.modules, 'requests' in sys.modules)\n"
+        )
+        project_dir = os.path.dirname(os.path.abspath(__file__))
+        timings = []
+        for _ in range(3):
+            output = subprocess.run([sys.executable, "-c", script], cwd=project_dir,
+                                    capture_output=True, text=True, check=True).stdout.split()
+            timings.append(float(output[0]))
+            self.assertEqual(output[1:], ["False", "False"], 
+                             "Импорт ядра не должен загружать tkinter и requests")
+        
+        median = sorted(timings)[1]
+        self.assertLess(median, IMPORT_TIME_BUDGET, 
+                        f"Импорт crypto_core занял {median * 1000:.1f} мс")
+        
+        # Модуль интерфейса создает окно только в main()
+        subprocess.run([sys.executable, "-c", "import crypto_currency"], cwd=project_dir,
+                       capture_output=True, check=True, env={**os.environ, "DISPLAY": ""})
+        
+        print(f"✓ Тест времени импорта ядра прошел успешно ({median * 1000:.1f} мс)")
+
+    @unittest.skipIf(numpy is None, "NumPy не установлен")
+    def test_rate_engine_vectorized_conversion(self):
+        """
+        Тест векторизованной конвертации по матрице курсов
+        
+        Проверяет:
+        - Конвертацию массива сумм по вектору разных пар за один вызов
+        - Обратное направление (криптовалюта -> фиат)
+        - Работу с целочисленными индексами вместо ключей
+        - NaN для пар без цены и KeyError для неизвестных валют
+        """
+        engine = RateEngine.from_price_data({
+            "bitcoin": {"usd": 50000.0, "eur": 40000.0},
+            "ethereum": {"usd": 2500.0},
+        }, crypto_ids=["bitcoin", "ethereum"], vs_currencies=["usd", "eur"])
+        
+        amounts = [1000.0, 800.0, 5000.0]
+        cryptos = ["bitcoin", "bitcoin", "ethereum"]
+        fiats = ["usd", "eur", "usd"]
+        
+        crypto_amounts = engine.to_crypto(amounts, cryptos, fiats)
+        numpy.testing.assert_allclose(crypto_amounts, [0.02, 0.02, 2.0])
+        
+        # Обратная конвертация возвращает исходные суммы
+        numpy.testing.assert_allclose(engine.convert(crypto_amounts, cryptos, fiats, reverse=True), amounts)
+        
+        # Целочисленные индексы дают тот же результат
+        rows = engine.crypto_indices(cryptos)
+        columns = engine.fiat_indices(fiats)
+        numpy.testing.assert_allclose(engine.to_crypto(amounts, rows, columns), crypto_amounts)
+        
+        self.assertTrue(numpy.isnan(engine.to_crypto(100.0, "ethereum", "eur")), 
+                        "Для пары без цены результат должен быть NaN")
+        with self.assertRaises(KeyError):
+            engine.to_crypto([1.0], ["solana"], ["usd"])
+        
+        print("✓ Тест векторизованной конвертации прошел успешно")
+
+    def test_currency_registry_lookup(self):
+        """
+        Тест справочника валют с поиском в обе стороны
+        
+        Проверяет:
+        - Что подпись из выпадающего списка превращается в id и обратно
+        - Поиск по тикеру без учета регистра
+        - Уникальность подписей для монет с одинаковым названием и тикером
+        """
+        registry = CurrencyRegistry.from_labels(cryptocurrencies)
+        
+        self.assertEqual(len(registry), len(cryptocurrencies))
+        self.assertEqual(registry.labels(), list(cryptocurrencies.values()))
+        for crypto_id, label in cryptocurrencies.items():
+            self.assertEqual(registry.id_for_label(label), crypto_id)
+            self.assertEqual(registry.label(crypto_id), label)
+        
+        self.assertEqual(registry.id_for_symbol("wbtc"), "wrapped-bitcoin")
+        self.assertEqual(registry.symbol("bitcoin-cash"), "BCH")
+        self.assertIsNone(registry.id_for_label("Несуществующая (XXX)"))
+        
+        # Две разные монеты с одинаковым названием и тикером
+        registry.add_coins([
+            {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"},
+            {"id": "bitcoin-token", "symbol": "btc", "name": "Bitcoin"},
+        ])
+        self.assertEqual(registry.label("bitcoin"), "Bitcoin (BTC)", 
+                         "Встроенная подпись не должна перезаписываться")
+        self.assertEqual(registry.label("bitcoin-token"), "Bitcoin (BTC, bitcoin-token)")
+        self.assertEqual(registry.id_for_label("Bitcoin (BTC, bitcoin-token)"), "bitcoin-token")
+        self.assertEqual(registry.ids_for_symbol("BTC"), ["bitcoin", "bitcoin-token"])
+        
+        print("✓ Тест справочника валют прошел успешно")
+    
+    def test_registry_loading_with_file_cache(self):
+        """
+        Тест загрузки полного справочника CoinGecko с файловым кэшем
+        
+        Проверяет:
+        - Что список загружается из API и сохраняется в файл
+        - Что повторная загрузка берет данные из файла без запроса
+        - Что при недоступном API используется устаревший кэш
+        """
+        class FakeClient:
+            def __init__(self, response):
+                self.response = response
+                self.calls = []
+            
+            def get_json(self, path, params=None):
+                self.calls.append(path)
+                return self.response
+        
+        coins = [{"id": f"coin-{i}", "symbol": f"c{i}", "name": f"Coin {i}"} for i in range(3000)]
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_path = os.path.join(tmp_dir, "coins.json")
+            
+            client = FakeClient(coins)
+            registry = load_crypto_registry(cache_path, client=client)
+            self.assertEqual(client.calls, ["/coins/list"])
+            self.assertEqual(len(registry), len(cryptocurrencies) + 3000)
+            self.assertEqual(registry.labels()[0], "Bitcoin (BTC)", 
+                             "Встроенные монеты должны идти первыми")
+            self.assertEqual(registry.id_for_label("Coin 2999 (C2999)"), "coin-2999")
+            
+            # Свежий кэш - запроса нет
+            client = FakeClient(None)
+            self.assertEqual(len(load_crypto_registry(cache_path, client=client)), len(registry))
+            self.assertEqual(client.calls, [])
+            
+            # Кэш устарел, API недоступен - используется последний сохраненный список
+            self.assertEqual(len(load_crypto_registry(cache_path, max_age=-1, client=client)), len(registry))
+            self.assertEqual(client.calls, ["/coins/list"])
+            
+            # Валюты котирования: известные получают русские подписи
+            fiat_registry = load_fiat_registry(os.path.join(tmp_dir, "vs.json"),
+                                               client=FakeClient(["usd", "btc", "xau"]))
+            self.assertEqual(fiat_registry.label("usd"), "Доллар США (USD)")
+            self.assertEqual(fiat_registry.id_for_label("XAU (XAU)"), "xau")
+        
+        print("✓ Тест загрузки справочника с кэшем прошел успешно")
+
+    def test_currency_search_index(self):
+        """
+        Тест поиска валют по мере ввода
+        
+        Справочник дополняется десятью тысячами монет. Проверяет:
+        - Поиск по началу названия, тикера, id и слова в названии
+        - Что популярные встроенные монеты идут первыми
+        - Что возвращается не больше limit различных валют
+        - Совпадение результатов для частых префиксов (готовые списки)
+          с результатами полного просмотра диапазона
+        """
+        registry = CurrencyRegistry.from_labels(cryptocurrencies)
+        registry.add_coins([
+            {"id": f"bit-token-{i}", "symbol": f"b{i}", "name": f"Bit Token {i}"}
+            for i in range(10000)
+        ])
+        index = CurrencySearchIndex(registry)
+        
+        self.assertEqual(index.search("", limit=3), ["bitcoin", "ethereum", "tether"])
+        self.assertEqual(index.search("btc", limit=1), ["bitcoin"])
+        self.assertEqual(index.search("wrapped-b", limit=5), ["wrapped-bitcoin"])
+        self.assertEqual(index.search("Cash"), ["bitcoin-cash"])
+        self.assertEqual(index.search("bit-token-9999"), ["bit-token-9999"])
+        self.assertEqual(index.search("нет такой"), [])
+        self.assertEqual(index.search_labels("sol", limit=1), ["Solana (SOL)"])
+        
+        # Частый префикс: популярные монеты первыми, без повторов
+        results = index.search("bit", limit=20)
+        self.assertEqual(results[:3], ["bitcoin", "wrapped-bitcoin", "bitcoin-cash"])
+        self.assertEqual(len(results), 20)
+        self.assertEqual(len(set(results)), 20)
+        
+        # Готовый список частого префикса совпадает с полным просмотром
+        start, end = index._range("bit")
+        self.assertEqual(results, index._best_ids(start, end, 20))
+        
+        print("✓ Тест поиска валют прошел успешно")
+
+    def test_rate_refresher_adaptive_polling(self):
+        """
+        Тест фонового обновления курсов с адаптивным интервалом
+        
+        Используются управляемые часы и фиктивный запрос. Проверяет:
+        - Что все пары обновляются одним пакетным запросом и попадают в кэш
+        - Что просматриваемые и волатильные пары обновляются чаще
+        - Что остальные пары ждут длинного интервала
+        """
+        now = [0.0]
+        requests_made = []
+        
+        def fake_fetch(ids, vs_currencies):
+            requests_made.append((ids, vs_currencies))
+            return {crypto: {fiat: 100.0 for fiat in vs_currencies.split(",")} | 
+                    {f"{fiat}_24h_change": 9.0 if crypto == "solana" else 1.0 for fiat in vs_currencies.split(",")}
+                    for crypto in ids.split(",")}
+        
+        cache = QuoteCache(ttl=60, maxsize=100)
+        pairs = [(crypto, fiat) for crypto in ("bitcoin", "ethereum", "solana") for fiat in ("usd", "eur")]
+        refresher = RateRefresher(pairs, cache=cache, fetch=fake_fetch, hot_interval=15,
+                                  idle_interval=50, calls_per_minute=100, clock=lambda: now[0])
+        
+        self.assertEqual(refresher.refresh_due(), 1, "Все пары должны обновиться одним запросом")
+        self.assertEqual(cache.get(("ethereum", "eur")), {"ethereum": {"eur": 100.0, "eur_24h_change": 1.0}})
+        
+        # Пользователь смотрит bitcoin/usd - пара переходит на короткий интервал
+        refresher.mark_viewed("bitcoin", "usd")
+        now[0] = 16.0
+        requests_made.clear()
+        refresher.refresh_due()
+        self.assertEqual(requests_made, [("bitcoin,solana", "eur,usd")],
+                         "Просматриваемые и волатильные пары обновляются одним запросом")
+        self.assertEqual(refresher._due[("bitcoin", "eur")], 50.0,
+                         "Пара bitcoin/eur из ответа на объединение валют не переносится раньше срока")
+        
+        # Через длинный интервал обновляются и остальные пары
+        now[0] = 51.0
+        requests_made.clear()
+        refresher.refresh_due()
+        self.assertEqual(len(requests_made), 1, "Все наступившие обновления идут одним пакетом")
+        self.assertEqual(requests_made[0][0].split(","), ["bitcoin", "ethereum", "solana"])
+        
+        print("✓ Тест адаптивного фонового обновления прошел успешно")
+    
+    def test_rate_refresher_call_budget(self):
+        """
+        Тест соблюдения бюджета запросов в минуту
+        
+        При бюджете в один запрос в минуту второй пакет должен быть
+        отложен до освобождения минутного окна, а не отправлен сразу.
+        """
+        now = [0.0]
+        requests_made = []
+        
+        def fake_fetch(ids, vs_currencies):
+            requests_made.append(ids)
+            return {crypto: {fiat: 1.0 for fiat in vs_currencies.split(",")} for crypto in ids.split(",")}
+        
+        refresher = RateRefresher([("bitcoin", "usd")], cache=QuoteCache(),
+                                  fetch=fake_fetch, idle_interval=100, calls_per_minute=1,
+                                  clock=lambda: now[0])
+        self.assertEqual(refresher.refresh_due(), 1)
+        
+        # Новая пара требует второго запроса в той же минуте
+        now[0] = 1.0
+        refresher.add_pairs([("ethereum", "eur")])
+        self.assertEqual(refresher.refresh_due(), 0)
+        self.assertEqual(refresher.stats["deferred"], 1)
+        self.assertAlmostEqual(refresher.next_wakeup(), 59.0, 
+                               msg="Отложенный пакет ждет освобождения минутного окна")
+        
+        # Отложенный пакет уходит, когда окно бюджета освобождается
+        now[0] = 60.0
+        self.assertEqual(refresher.refresh_due(), 1)
+        self.assertEqual(requests_made, ["bitcoin", "ethereum"])
+        
+        print("✓ Тест бюджета запросов прошел успешно")
+    
+    def test_rate_refresher_survives_errors(self):
+        """
+        Тест устойчивости фонового потока к непредвиденным ошибкам
+        
+        Первый запрос бросает исключение. Проверяет:
+        - Что поток не завершается и повторяет обновление
+        - Что ошибка учитывается в stats["errors"]
+        """
+        calls = []
+        
+        def flaky_fetch(ids, vs_currencies):
+            calls.append(ids)
+            if len(calls) == 1:
+                raise RuntimeError("сбой разбора ответа")
+            return {ids: {vs_currencies: 1.0}}
+        
+        cache = QuoteCache()
+        refresher = RateRefresher([("bitcoin", "usd")], cache=cache, fetch=flaky_fetch,
+                                  hot_interval=0.01, calls_per_minute=100)
+        with patch("sys.stderr"):
+            refresher.start()
+            deadline = time.monotonic() + 5
+            while cache.get(("bitcoin", "usd")) is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            refresher.stop()
+            refresher.join(5)
+        
+        self.assertEqual(cache.get(("bitcoin", "usd")), {"bitcoin": {"usd": 1.0}})
+        self.assertEqual(refresher.stats["errors"], 1)
+        self.assertGreaterEqual(len(calls), 2)
+        
+        print("✓ Тест устойчивости фонового обновления прошел успешно")
+    
+    def test_single_flight_shares_request(self):
+        """
+        Тест объединения одинаковых одновременных запросов
+        
+        Пять потоков одновременно запрашивают одну пару. Проверяет:
+        - Что выполняется только один запрос
+        - Что все потоки получают его результат
+        - Что после завершения следующий вызов снова идет в API
+        """
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+        
+        def slow_fetch(ids, vs_currencies):
+            calls.append((ids, vs_currencies))
+            release.wait(5)
+            return {"bitcoin": {"usd": 45000.0}}
+        
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            flights.do(("bitcoin", "usd"), slow_fetch, "bitcoin", "usd"))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        # Все потоки, кроме первого, должны присоединиться к выполняющемуся запросу
+        for _ in range(500):
+            if flights.shared == 4:
+                break
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        
+        self.assertEqual(len(calls), 1, "Одинаковые запросы должны выполняться один раз")
+        self.assertEqual(results, [{"bitcoin": {"usd": 45000.0}}] * 5)
+        self.assertEqual(flights.shared, 4)
+        
+        flights.do(("bitcoin", "usd"), slow_fetch, "bitcoin", "usd")
+        self.assertEqual(len(calls), 2, "Завершенный запрос не должен кэшироваться")
+        
+        # Ошибка ведущего запроса передается вызывающему
+        def failing_fetch():
+            raise RuntimeError("API Error")
+        with self.assertRaises(RuntimeError):
+            flights.do("key", failing_fetch)
+        
+        print("✓ Тест объединения одинаковых запросов прошел успешно")
+    
+    def test_token_bucket_queues_requests(self):
+        """
+        Тест ограничителя скорости "ведро с токенами"
+        
+        Используются поддельные часы и sleep. Проверяет:
+        - Что запросы в пределах запаса проходят без ожидания
+        - Что запросы сверх запаса ждут своей очереди, а не отклоняются
+        - Что при превышении таймаута токен не расходуется
+        """
+        now = [0.0]
+        sleeps = []
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleeps.append)
+        
+        self.assertTrue(bucket.acquire())
+        self.assertTrue(bucket.acquire())
+        self.assertEqual(sleeps, [], "Запросы в пределах запаса идут без ожидания")
+        
+        # Третий и четвертый запросы встают в очередь друг за другом
+        self.assertTrue(bucket.acquire())
+        self.assertTrue(bucket.acquire())
+        self.assertEqual(sleeps, [0.5, 1.0])
+        
+        self.assertFalse(bucket.acquire(timeout=1.0), "Ожидание дольше таймаута не допускается")
+        self.assertEqual(bucket.waits, 2)
+        
+        # Через секунду очередь рассасывается и запас снова пополняется
+        now[0] = 2.0
+        self.assertAlmostEqual(bucket.available(), 2.0)
+        
+        print("✓ Тест ограничителя скорости прошел успешно")
+    
+    def test_stale_while_revalidate(self):
+        """
+        Тест выдачи устаревшей котировки с фоновым обновлением
+        
+        Проверяет:
+        - Что свежая котировка выдается без обновления
+        - Что устаревшая котировка выдается сразу вместе с возрастом
+          и запускает фоновое обновление
+        - Что котировка старше stale_ttl больше не выдается
+        - Что возраст учитывает last_updated_at из CoinGecko
+        """
+        now = [0.0]
+        cache = QuoteCache(ttl=60, maxsize=10, clock=lambda: now[0], stale_ttl=3600)
+        quote = {"bitcoin": {"usd": 45000.0, "last_updated_at": 1000}}
+        cache.put(("bitcoin", "usd"), quote)
+        revalidated = []
+        revalidate = lambda *pair: revalidated.append(pair)
+        
+        with patch("crypto_core.price_cache", cache):
+            now[0] = 30.0
+            self.assertEqual(get_quote_with_age("bitcoin", "usd", revalidate), (quote, 30.0))
+            self.assertEqual(revalidated, [], "Свежая котировка не требует обновления")
+            
+            now[0] = 600.0
+            self.assertEqual(get_quote_with_age("bitcoin", "usd", revalidate), (quote, 600.0))
+            self.assertEqual(revalidated, [("bitcoin", "usd")])
+            self.assertIsNone(cache.get(("bitcoin", "usd")), "Для get устаревшая запись - промах")
+            self.assertEqual(cache.stats()["stale_hits"], 1)
+            
+            now[0] = 4000.0
+            self.assertIsNone(cache.get_stale(("bitcoin", "usd")))
+        
+        self.assertEqual(quote_age(quote, "bitcoin", 5.0, now=1100), 100)
+        self.assertEqual(quote_age({"bitcoin": {"usd": 1.0}}, "bitcoin", 5.0), 5.0)
+        self.assertEqual(format_age(3), "только что")
+        self.assertEqual(format_age(125), "2 мин назад")
+        
+        print("✓ Тест выдачи устаревших котировок прошел успешно")
+    
+    def test_quote_store_warm_start(self):
+        """
+        Тест сохранения котировок в SQLite и загрузки при запуске
+        
+        Проверяет:
+        - Что котировки из кэша записываются пакетами, а не по одной
+        - Что база работает в режиме WAL и имеет индекс (crypto, fiat, ts)
+        - Что после "перезапуска" в кэш загружается последняя котировка
+          каждой пары вместе с капитализацией, объемом и возрастом
+        """
+        now = [1000.0]
+        with tempfile.TemporaryDirectory() as data_dir:
+            path = os.path.join(data_dir, "quotes.sqlite3")
+            store = QuoteStore(path, batch_size=3, clock=lambda: now[0])
+            cache = QuoteCache(ttl=60, maxsize=10)
+            cache.stores.append(store)
+            
+            cache.put(("bitcoin", "usd"), {"bitcoin": {"usd": 45000.0}})
+            cache.put(("ethereum", "usd"), {"ethereum": {"usd": 3000.0}})
+            self.assertEqual(store.rows_written, 0, "Котировки должны накапливаться до пакета")
+            
+            now[0] = 1030.0
+            cache.put(("bitcoin", "usd"), {"bitcoin": {
+                "usd": 46000.0, "usd_market_cap": 900000000000, "usd_24h_vol": 25000000000,
+                "usd_24h_change": 2.5, "last_updated_at": 1029}})
+            self.assertEqual((store.rows_written, store.flushes), (3, 1))
+            
+            journal_mode = store._db.execute("PRAGMA journal_mode").fetchone()[0]
+            self.assertEqual(journal_mode, "wal")
+            index_columns = [row[2] for row in store._db.execute("PRAGMA index_info(idx_quotes_pair_ts)")]
+            self.assertEqual(index_columns, ["crypto", "fiat", "ts"])
+            store.close()
+            
+            # Новый запуск приложения: пустой кэш заполняется из базы
+            now[0] = 1100.0
+            store = QuoteStore(path, clock=lambda: now[0])
+            warm_cache = QuoteCache(ttl=60, maxsize=10, stale_ttl=3600)
+            self.assertEqual(warm_start(store, warm_cache, now=now[0]), 2)
+            
+            quote, age = warm_cache.get_stale(("bitcoin", "usd"))
+            self.assertEqual(quote["bitcoin"]["usd"], 46000.0, "Загружается последняя котировка пары")
+            self.assertEqual(quote["bitcoin"]["usd_market_cap"], 900000000000)
+            self.assertEqual(quote["bitcoin"]["last_updated_at"], 1029)
+            self.assertAlmostEqual(age, 70.0, places=3)
+            self.assertIn(store, warm_cache.stores)
+            store.close()
+            
+            # В долгом сеансе старые котировки удаляются при записи, без перезапуска
+            store = QuoteStore(":memory:", batch_size=1, retention=100, prune_interval=60,
+                               clock=lambda: now[0])
+            store.add(("bitcoin", "usd"), {"bitcoin": {"usd": 1.0}})
+            now[0] += 150
+            store.add(("bitcoin", "usd"), {"bitcoin": {"usd": 2.0}})
+            self.assertEqual(store.rows_pruned, 1, "Котировка старше срока хранения должна удаляться")
+            self.assertEqual(store._db.execute("SELECT COUNT(*) FROM quotes").fetchone()[0], 1)
+            now[0] += 10
+            store.add(("bitcoin", "usd"), {"bitcoin": {"usd": 3.0}})
+            self.assertEqual(store.rows_pruned, 1, "Очистка выполняется не чаще prune_interval")
+            store.close()
+        
+        print("✓ Тест хранилища котировок SQLite прошел успешно")
+    
+    def test_tick_store_history(self):
+        """
+        Тест истории котировок в сегментах, отображаемых в память
+        
+        Проверяет:
+        - Что каждая котировка из кэша дописывается в сегмент своей пары
+        - Что повторно полученная та же котировка не дублируется
+        - Что выборка за период и рост файла работают корректно
+        - Что история сохраняется после повторного открытия
+        """
+        with tempfile.TemporaryDirectory() as data_dir:
+            store = TickStore(data_dir)
+            cache = QuoteCache(ttl=60, maxsize=10)
+            cache.stores.append(store)
+            
+            quote = {"bitcoin": {"usd": 45000.0, "usd_24h_vol": 2.5e10, "usd_market_cap": 8.5e11,
+                                 "last_updated_at": 100}}
+            cache.put(("bitcoin", "usd"), quote)
+            cache.put(("bitcoin", "usd"), quote)
+            self.assertEqual(store.range(("bitcoin", "usd")), [(100.0, 0, 45000.0, 2.5e10, 8.5e11)],
+                             "Та же котировка не должна записываться повторно")
+            
+            # Больше записей, чем начальная емкость сегмента
+            for ts in range(101, 2101):
+                store.append(("ethereum", "eur"), float(ts), float(ts))
+            self.assertEqual([tick[0] for tick in store.range(("ethereum", "eur"), 500, 502.5)],
+                             [500.0, 501.0, 502.0])
+            self.assertEqual(store.range(("solana", "usd")), [])
+            store.close()
+            
+            store = TickStore(data_dir)
+            self.assertEqual(set(store.pairs()), {("bitcoin", "usd"), ("ethereum", "eur")})
+            self.assertEqual(len(store.range(("ethereum", "eur"))), 2000)
+            self.assertEqual(store.pair_id(("ethereum", "eur")), 1)
+            
+            if numpy is not None:
+                ticks = store.array(("ethereum", "eur"), 2000)
+                self.assertEqual(ticks["price"].tolist(), [2000.0 + i for i in range(101)])
+                self.assertFalse(ticks.flags.owndata, "Массив должен ссылаться на файл без копирования")
+            store.close()
+        
+        print("✓ Тест истории котировок прошел успешно")
+    
+    def test_market_chart_downsampling(self):
+        """
+        Тест загрузки истории цены и прореживания LTTB
+        
+        Проверяет:
+        - Что ряд из /coins/{id}/market_chart загружается один раз и кэшируется
+        - Что LTTB сокращает ряд до заданного числа точек, сохраняя
+          первую и последнюю точки и одиночный выброс
+        - Что координаты графика укладываются в размеры холста
+        - Что get_chart_points отдает прореженные точки и диапазон исходных цен
+        """
+        requests_made = []
+        
+        class FakeClient:
+            def get_json(self, path, params=None):
+                requests_made.append((path, params))
+                return {"prices": [[ts * 1000, 100.0 + ts % 10] for ts in range(20000)]}
+        
+        cache = QuoteCache(ttl=300, maxsize=4)
+        series = get_market_chart("bitcoin", "usd", 30, cache=cache, client=FakeClient())
+        get_market_chart("bitcoin", "usd", 30, cache=cache, client=FakeClient())
+        self.assertEqual(requests_made, [("/coins/bitcoin/market_chart", {"vs_currency": "usd", "days": 30})])
+        self.assertEqual(len(series), 20000)
+        self.assertEqual(series[1], (1.0, 101.0), "Моменты переводятся из миллисекунд в секунды")
+        
+        # Одиночный выброс должен пережить прореживание
+        series[12345] = (12345.0, 500.0)
+        sampled = lttb(series, 500)
+        self.assertEqual(len(sampled), 500)
+        self.assertEqual((sampled[0], sampled[-1]), (series[0], series[-1]))
+        self.assertIn((12345.0, 500.0), sampled)
+        self.assertEqual(lttb(series[:10], 500), series[:10], "Короткий ряд не прореживается")
+        
+        coordinates = chart_coordinates(sampled, 560, 160, padding=15)
+        self.assertEqual(len(coordinates), 1000)
+        self.assertTrue(all(15 <= x <= 545 for x in coordinates[0::2]))
+        self.assertTrue(all(15 <= y <= 145 for y in coordinates[1::2]))
+        self.assertEqual(coordinates[1::2][sampled.index((12345.0, 500.0))], 15, "Максимум рисуется сверху")
+        
+        points, low, high = get_chart_points("bitcoin", "usd", 560, 30, cache=cache, client=FakeClient())
+        self.assertEqual(len(points), 560)
+        self.assertEqual((low, high), (100.0, 500.0), "Диапазон берется по исходному ряду")
+        self.assertEqual(len(requests_made), 1, "Ряд берется из кэша")
+        self.assertIsNone(get_chart_points("bitcoin", "eur", 560, 30, cache=cache,
+                                           client=type("EmptyClient", (), {"get_json": lambda self, *a: None})()))
+        
+        print("✓ Тест графика истории цены прошел успешно")
+    
+    def test_result_fields_and_history(self):
+        """
+        Тест полей окна результата и кольцевого буфера истории
+        
+        Проверяет:
+        - Что поля окна результата форматируются из данных котировки
+        - Что история хранит не больше заданного числа результатов
+          даже после тысяч конвертаций, новые результаты идут первыми
+        """
+        crypto_data = {"usd": 50000.0, "usd_market_cap": 9.5e11, "usd_24h_vol": 2.5e10, "usd_24h_change": -1.234}
+        fields = result_fields(1000, "usd", "Доллар США (USD)", 0.02, "Bitcoin (BTC)", 50000.0, crypto_data, 125)
+        
+        self.assertEqual(fields["result"], "1,000.00 Доллар США (USD) = 0.02000000 Bitcoin (BTC)")
+        self.assertEqual(fields["price"], "Стоимость одного Bitcoin (BTC) = 50,000.00 Доллар США (USD)")
+        self.assertEqual(fields["volume"], "Объем торгов на бирже за 24ч = 25,000,000,000 Доллар США (USD)")
+        self.assertEqual(fields["change"], "Изменение стоимости за последние 24ч = -1.23%")
+        self.assertEqual(fields["age"], "Данные обновлены: 2 мин назад")
+        
+        history = ResultHistory(size=5)
+        for number in range(5000):
+            history.add(f"результат {number}")
+        self.assertEqual(len(history), 5)
+        self.assertEqual(history.entries()[0], "результат 4999")
+        self.assertEqual(history.entries()[-1], "результат 4995")
+        
+        print("✓ Тест окна результата и истории прошел успешно")
+    
+    def test_live_result_updates_changed_fields(self):
+        """
+        Тест автообновления результата с изменением только нужных полей
+        
+        Проверяет:
+        - Что при первом показе заполняются все поля
+        - Что при новом курсе обновляются только изменившиеся поля
+        - Что peek_quote берет котировку из кэша без ожидания сети и
+          запрашивает в фоне отсутствующую или устаревшую котировку
+        """
+        widgets = {}
+        updater = FieldUpdater({name: (lambda text, name=name: widgets.setdefault(name, []).append(text))
+                                for name in ("result", "price", "market_cap", "volume", "change", "age")})
+        
+        def fields_for(price, age):
+            crypto_data = {"usd": price, "usd_market_cap": 9.5e11, "usd_24h_vol": 2.5e10, "usd_24h_change": 1.5}
+            return result_fields(1000, "usd", "USD", 1000 / price, "Bitcoin (BTC)", price, crypto_data, age)
+        
+        self.assertEqual(len(updater.update(fields_for(50000.0, 0))), 6)
+        self.assertEqual(updater.update(fields_for(50000.0, 3)), [], "Неизменный текст не обновляется")
+        self.assertEqual(updater.update(fields_for(40000.0, 3)), ["result", "price"])
+        self.assertEqual(len(widgets["result"]), 2)
+        self.assertEqual(len(widgets["market_cap"]), 1)
+        
+        now = [0.0]
+        cache = QuoteCache(ttl=60, maxsize=10, clock=lambda: now[0], stale_ttl=3600)
+        revalidated = []
+        revalidate = lambda *pair: revalidated.append(pair)
+        with patch("crypto_core.price_cache", cache):
+            self.assertEqual(peek_quote("bitcoin", "usd", revalidate), (None, None))
+            self.assertEqual(revalidated, [("bitcoin", "usd")], "Отсутствующая котировка запрашивается в фоне")
+            
+            cache.put(("bitcoin", "usd"), {"bitcoin": {"usd": 45000.0}})
+            now[0] = 10.0
+            self.assertEqual(peek_quote("bitcoin", "usd", revalidate), ({"bitcoin": {"usd": 45000.0}}, 10.0))
+            self.assertEqual(len(revalidated), 1)
+            now[0] = 100.0
+            peek_quote("bitcoin", "usd", revalidate)
+            self.assertEqual(len(revalidated), 2, "Устаревшая котировка обновляется в фоне")
+        
+        print("✓ Тест автообновления результата прошел успешно")
+    
+    def test_benchmark_regression_check(self):
+        """
+        Тест статистики замеров и сравнения с базовыми значениями
+        
+        Проверяет:
+        - Что медиана и 95-й перцентиль считаются по всем запускам
+        - Что регрессией считается только замедление медианы сверх порога
+        - Что замедление в пределах p95 базового замера или меньше
+          минимального абсолютного значения считается шумом
+        - Что замеры без базового значения не считаются регрессией
+        """
+        summary = summarize([0.001 * run for run in range(1, 101)])
+        self.assertAlmostEqual(summary["median"], 0.0505)
+        self.assertAlmostEqual(summary["p95"], 0.095)
+        self.assertEqual(summary["runs"], 100)
+        
+        calls = []
+        timings = measure(lambda: calls.append(1), repeat=4, warmup=1, batch=10)
+        self.assertEqual((len(timings), len(calls)), (4, 41), "Выборка - серия из batch вызовов")
+        
+        baseline = {"fast": {"median": 0.010}, "slow": {"median": 0.010}}
+        results = {"fast": {"median": 0.012}, "slow": {"median": 0.013}, "new": {"median": 1.0}}
+        self.assertEqual(find_regressions(results, baseline, threshold=0.25), {"slow": (0.010, 0.013)})
+        
+        # Микросекундный замер: +80% медианы - это 40 мкс, меньше порога шума
+        baseline = {"tiny": {"median": 0.00005, "p95": 0.00006}, "noisy": {"median": 0.010, "p95": 0.020}}
+        results = {"tiny": {"median": 0.00009}, "noisy": {"median": 0.015}}
+        self.assertEqual(find_regressions(results, baseline, threshold=0.25, min_delta=0.00005), {})
+        results = {"tiny": {"median": 0.0002}, "noisy": {"median": 0.021}}
+        self.assertEqual(set(find_regressions(results, baseline, threshold=0.25, min_delta=0.00005)),
+                         {"tiny", "noisy"})
+        
+        print("✓ Тест проверки регрессий производительности прошел успешно")
+    
+    def test_metrics_histograms_and_export(self):
+        """
+        Тест метрик горячих путей и их экспорта
+        
+        Проверяет:
+        - Что таймер записывает длительность блока в гистограмму с метками
+        - Что квантили p50/p99 оцениваются по корзинам гистограммы
+        - Что экспорт в формате Prometheus содержит накопительные корзины,
+          сумму, число замеров и значения сборщиков
+        - Что запрос к API замеряется по этапам, а ошибка считается
+          с кодом ответа и этапом, на котором она произошла
+        """
+        now = [0.0]
+        registry = MetricsRegistry(clock=lambda: now[0])
+        for duration in [0.003] * 98 + [0.2, 3.0]:
+            with registry.timer("api_stage_seconds", stage="network"):
+                now[0] += duration
+        registry.register_collector(lambda reg: reg.set_gauge("price_cache_hit_ratio", 0.75))
+        
+        summary = registry.snapshot()["histograms"]["api_stage_seconds"][0]
+        self.assertEqual(summary["labels"], {"stage": "network"})
+        self.assertEqual(summary["count"], 100)
+        self.assertTrue(0.0025 <= summary["p50"] <= 0.005)
+        self.assertTrue(0.1 <= summary["p99"] <= 0.25)
+        
+        text = registry.to_prometheus()
+        self.assertIn('valutus_api_stage_seconds_bucket{stage="network",le="0.005"} 98', text)
+        self.assertIn('valutus_api_stage_seconds_bucket{stage="network",le="+Inf"} 100', text)
+        self.assertIn('valutus_api_stage_seconds_count{stage="network"} 100', text)
+        self.assertIn("valutus_price_cache_hit_ratio 0.75", text)
+        
+        # Ошибка 503 на этапе проверки статуса ответа
+        api_metrics = MetricsRegistry()
+        response = MagicMock()
+        response.raise_for_status.side_effect = Exception("503 Server Error")
+        response.raise_for_status.side_effect.response = MagicMock(status_code=503)
+        with patch('crypto_core.metrics', api_metrics), \
+             patch('crypto_core.requests.get', return_value=response):
+            self.assertIsNone(get_crypto_price("bitcoin", "usd"))
+        snapshot = api_metrics.snapshot()
+        self.assertEqual(snapshot["counters"]["api_errors_total"],
+                         [{"labels": {"kind": "503", "path": "/simple/price", "stage": "status"}, "value": 1}])
+        stages = {item["labels"]["stage"] for item in snapshot["histograms"]["api_stage_seconds"]}
+        self.assertEqual(stages, {"network", "status"})
+        
+        print("✓ Тест метрик и их экспорта прошел успешно")
+    
+    def test_profiling_session_and_lag_watchdog(self):
+        """
+        Тест режима профилирования и сторожа главного цикла
+        
+        Проверяет:
+        - Что обернутая функция профилируется и статистика сохраняется в pstats
+        - Что сторож снимает стек потока, который не отвечает дольше порога
+        - Что следующее сердцебиение закрывает зависание с его длительностью
+        - Что зависания записываются свернутыми стеками для flamegraph
+        """
+        import pstats
+        
+        def slow_sum():
+            return sum(range(10000))
+        
+        release = threading.Event()
+        
+        def blocking_handler():
+            release.wait(5)
+        
+        blocked = threading.Thread(target=blocking_handler)
+        blocked.start()
+        try:
+            now = [0.0]
+            scheduled = []
+            watchdog = LagWatchdog(lambda ms, func: scheduled.append(func), threshold=0.2, interval=50,
+                                   thread_id=blocked.ident, clock=lambda: now[0])
+            
+            # Сердцебиение вовремя - зависания нет
+            now[0] = 0.1
+            self.assertFalse(watchdog.check())
+            
+            # Главный цикл не отвечает 0.5 секунды - снимается стек
+            now[0] = 0.55
+            self.assertTrue(watchdog.check())
+            self.assertFalse(watchdog.check())
+            watchdog.beat()
+            self.assertEqual(len(scheduled), 1)
+        finally:
+            release.set()
+            blocked.join()
+        
+        self.assertEqual(len(watchdog.stalls), 1)
+        self.assertAlmostEqual(watchdog.stalls[0]["duration"], 0.5)
+        self.assertTrue(any(frame.startswith("blocking_handler") for frame in watchdog.stalls[0]["stack"]))
+        self.assertTrue(watchdog.folded_stacks()[0].endswith(" 500"))
+        
+        with tempfile.TemporaryDirectory() as directory:
+            session = ProfilingSession(directory=directory, name="session-test")
+            self.assertEqual(session.wrap(slow_sum)(), sum(range(10000)))
+            session.watchdog = watchdog
+            paths = session.save()
+            self.assertEqual([os.path.basename(path) for path in paths],
+                             ["session-test.pstats", "session-test-stalls.folded", "session-test-stalls.log"])
+            names = {function for _, _, function in pstats.Stats(paths[0]).stats}
+            self.assertIn("slow_sum", names)
+        
+        print("✓ Тест профилирования и сторожа главного цикла прошел успешно")
+    
+    def test_rate_graph_best_route(self):
+        """
+        Тест графа курсов и поиска лучшего маршрута
+        
+        Проверяет:
+        - Что обратная конвертация криптовалюта -> фиат идет по прямому ребру,
+          если обход через другие валюты не окупает стоимость обменов
+        - Что обмен криптовалют выбирает валюту-посредника с лучшим курсом
+        - Что изменение ребра сбрасывает только затронутые результаты поиска
+        - Что find_conversion строит граф по матрице курсов
+        - Что валюты вне матрицы добавляются из кросс-курсов или отдельным запросом цены,
+          который повторяется по истечении срока
+        - Что возраст результата считается только по ребрам маршрута
+        - Что поиск в кэше занимает меньше миллисекунды даже для тысяч валют
+        """
+        graph = RateGraph()
+        graph.update_from_price_data({
+            "bitcoin": {"usd": 65000.0, "eur": 60000.0, "usd_market_cap": 1.2e12, "last_updated_at": 1},
+            "ethereum": {"usd": 3200.0, "eur": 2950.0},
+        })
+        
+        rate, path = graph.best_route("bitcoin", "usd")
+        self.assertEqual((rate, path), (65000.0, ["bitcoin", "usd"]))
+        # Через евро за биткоин дают больше эфира: 60000 / 2950 > 65000 / 3200
+        rate, path = graph.best_route("bitcoin", "ethereum")
+        self.assertEqual(path, ["bitcoin", "eur", "ethereum"])
+        self.assertAlmostEqual(rate, 60000.0 / 2950.0)
+        self.assertEqual(graph.best_route("bitcoin", "jpy"), (None, None))
+        
+        # Результаты из tether не зависят от ребра bitcoin -> eur и остаются в кэше
+        graph.set_rate("tether", "rub", 92.0)
+        graph.best_route("tether", "rub")
+        searches = graph.searches
+        graph.set_rate("bitcoin", "eur", 59000.0)
+        graph.best_route("tether", "rub")
+        self.assertEqual(graph.searches, searches, "Незатронутый результат не пересчитывается")
+        rate, path = graph.best_route("bitcoin", "ethereum")
+        self.assertEqual(path, ["bitcoin", "usd", "ethereum"])
+        self.assertEqual(graph.searches, searches + 1)
+        
+        matrix = RateMatrix(["bitcoin"], ["usd"], clock=lambda: 100.0)
+        matrix.data = {"bitcoin": {"usd": 50000.0}}
+        matrix.fetched_at = 90.0
+        conversion = find_conversion(2.0, "bitcoin", "usd", graph=RateGraph(), matrix=matrix)
+        self.assertEqual(conversion["result"], 100000.0)
+        self.assertEqual(conversion["path"], ["bitcoin", "usd"])
+        self.assertEqual(conversion["age"], 10.0)
+        
+        # Валюта вне матрицы берется из кросс-курсов, криптовалюта вне их списка - отдельным запросом
+        rates = CrossRates(["bitcoin"], clock=lambda: 100.0)
+        rates.load({"bitcoin": {"usd": 50000.0}}, {"usd": 50000.0, "brl": 250000.0})
+        rates.fetched_at = 80.0
+        quotes_requested = []
+        
+        def fake_quote(crypto_id, vs_currency):
+            quotes_requested.append((crypto_id, vs_currency))
+            return {"pepe": {"usd": 0.5, "usd_market_cap": 1e9}} if crypto_id == "pepe" else None
+        
+        now = [100.0]
+        graph = RateGraph(clock=lambda: now[0])
+        conversion = find_conversion(1.0, "bitcoin", "brl", graph=graph, matrix=matrix, rates=rates,
+                                     fetch_quote=fake_quote)
+        self.assertEqual(conversion["path"], ["bitcoin", "usd", "brl"])
+        self.assertAlmostEqual(conversion["result"], 250000.0)
+        self.assertEqual(conversion["age"], 20.0, "Возраст - по самым старым данным маршрута")
+        self.assertEqual(quotes_requested, [])
+        
+        conversion = find_conversion(1000.0, "pepe", "bitcoin", graph=graph, matrix=matrix, rates=rates,
+                                     fetch_quote=fake_quote)
+        self.assertEqual(conversion["path"], ["pepe", "usd", "bitcoin"])
+        self.assertAlmostEqual(conversion["result"], 0.01)
+        self.assertEqual(quotes_requested, [("pepe", "usd")])
+        
+        # Маршрут по ребрам матрицы не наследует возраст кросс-курсов
+        conversion = find_conversion(2.0, "bitcoin", "usd", graph=graph, matrix=matrix, rates=rates,
+                                     fetch_quote=fake_quote)
+        self.assertEqual(graph.provider("bitcoin", "usd"), "matrix", "Кросс-курс не заменяет прямой курс")
+        self.assertEqual(conversion["age"], 10.0)
+        
+        # Цена из разового запроса запрашивается снова по истечении срока
+        find_conversion(1.0, "pepe", "usd", graph=graph, matrix=matrix, rates=rates, fetch_quote=fake_quote)
+        self.assertEqual(len(quotes_requested), 1)
+        now[0] += rates.max_age + 1
+        find_conversion(1.0, "pepe", "usd", graph=graph, matrix=matrix, rates=rates, fetch_quote=fake_quote)
+        self.assertEqual(len(quotes_requested), 2)
+        self.assertIsNone(find_conversion(1.0, "unknown", "usd", graph=graph, matrix=matrix, rates=rates,
+                                          fetch_quote=fake_quote))
+        
+        # 2000 криптовалют x 15 фиатных валют
+        large = RateGraph()
+        for index in range(2000):
+            for fiat_index in range(15):
+                large.set_rate(f"coin-{index}", f"fiat-{fiat_index}", (index + 1) * (1 + fiat_index / 10))
+        large.best_route("coin-1", "coin-2")
+        start = time.perf_counter()
+        for index in range(1000):
+            rate, path = large.best_route("coin-1", f"coin-{index}")
+        self.assertLess((time.perf_counter() - start) / 1000, 0.001)
+        self.assertAlmostEqual(rate, 2 / 1000)
+        
+        print("✓ Тест графа курсов прошел успешно")
+
 
 def run_tests():
     """
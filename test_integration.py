@@ -16,13 +16,23 @@ import unittest
 from unittest.mock import patch, MagicMock
 import sys
 import os
+import io
+import asyncio
+import time
+from contextlib import redirect_stdout
 
 # Добавляем путь к основному модулю для корректного импорта
 # Это необходимо для работы тестов независимо от текущей директории
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # Импортируем тестируемые компоненты
-from crypto_currency import get_crypto_price, cryptocurrencies, fiat_currencies
+from crypto_core import get_crypto_price, cryptocurrencies, fiat_currencies
+from crypto_core import PriceClient, QuoteCache, RateMatrix, get_crypto_prices, fetch_rate_matrix
+from cross_rates import CrossRates, quoted_precision
+from rate_graph import RateGraph, find_conversion
+from batch_convert import convert_stream, read_csv_rows, csv_row_writer
+from mock_api import MockCoinGecko
+from rate_limit import TokenBucket
 
 
 class TestIntegration(unittest.TestCase):
@@ -33,7 +43,7 @@ class TestIntegration(unittest.TestCase):
     работают вместе, а не по отдельности
     """
     
-    @patch('crypto_currency.requests.get')
+    @patch('crypto_core.requests.get')
     def test_full_conversion_workflow(self, mock_get):
         """
         Тест полного рабочего процесса конвертации от начала до конца
@@ -294,6 +304,294 @@ class TestIntegration(unittest.TestCase):
         
         print("✓ Тест согласованности данных прошел успешно")
 
+    def test_price_client_reuses_connection(self):
+        """
+        Тест переиспользования соединения клиентом с пулом keep-alive
+        
+        Поднимает локальный заменитель API и выполняет несколько запросов
+        через один PriceClient. Проверяет:
+        - Что все запросы возвращают корректные данные
+        - Что открыто только одно TCP-соединение
+        - Что остальные запросы прошли по уже открытому соединению
+        """
+        with MockCoinGecko() as api:
+            with PriceClient(base_url=api.base_url) as client:
+                for _ in range(3):
+                    price_data = client.get_price("bitcoin", "usd")
+                    self.assertEqual(price_data["bitcoin"]["usd"], 65000.0)
+                
+                stats = client.connection_stats()
+        
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["connections_opened"], 1, 
+                         "Все запросы должны идти через одно соединение")
+        self.assertEqual(stats["connections_reused"], 2)
+        
+        print("✓ Тест переиспользования соединений прошел успешно")
+
+    def test_get_crypto_price_over_http(self):
+        """
+        Тест полного HTTP-пути get_crypto_price без подмены requests
+        
+        Запросы идут к локальному заменителю CoinGecko API. Проверяет:
+        - Что параметры запроса и разбор ответа работают по-настоящему
+        - Что ответ содержит капитализацию, объем, изменение и last_updated_at
+        - Что ошибка сервера превращается в None
+        """
+        with MockCoinGecko() as api:
+            price_data = get_crypto_price("ethereum", "eur", base_url=api.base_url)
+            self.assertEqual(set(price_data["ethereum"]), {
+                "eur", "eur_market_cap", "eur_24h_vol", "eur_24h_change", "last_updated_at"})
+            self.assertAlmostEqual(price_data["ethereum"]["eur"], 3200.0 * 0.92)
+            
+            api.fail_next(500)
+            self.assertIsNone(get_crypto_price("ethereum", "eur", base_url=api.base_url))
+            # Неизвестная монета просто отсутствует в ответе, как у CoinGecko
+            self.assertEqual(get_crypto_price("unknown-coin", "eur", base_url=api.base_url), {})
+            self.assertEqual(api.counts["/simple/price"], 3)
+            self.assertEqual(api.errors[500], 1)
+        
+        print("✓ Тест HTTP-запроса к заменителю API прошел успешно")
+    
+    def test_price_client_retries_injected_errors(self):
+        """
+        Тест повторов клиента при внедренных ошибках 429 и 5xx
+        
+        Заменитель API отвечает 429, затем 503, затем успешно. Проверяет:
+        - Что PriceClient повторяет запрос и возвращает данные
+        - Что сервер получил ровно три запроса
+        """
+        with MockCoinGecko(retry_after=0) as api:
+            api.fail_next(429)
+            api.fail_next(503)
+            with PriceClient(base_url=api.base_url, backoff_factor=0, rate=None) as client:
+                price_data = client.get_price("bitcoin", "usd")
+            
+            self.assertEqual(price_data["bitcoin"]["usd"], 65000.0)
+            self.assertEqual(api.counts["/simple/price"], 3)
+            self.assertEqual(dict(api.errors), {429: 1, 503: 1})
+        
+        print("✓ Тест повторов при ошибках API прошел успешно")
+    
+    def test_batched_prices_against_mock_api(self):
+        """
+        Тест пакетного получения цен по всем парам через заменитель API
+        
+        С задержкой ответа 20 мс запрашиваются все встроенные пары. Проверяет:
+        - Что все пары получены
+        - Что для них выполнен один пакетный запрос, а не запрос на пару
+        - Что пакетный запрос не ждет исчерпанного ограничителя интерфейса
+        """
+        pairs = [(crypto_id, fiat) for crypto_id in cryptocurrencies for fiat in fiat_currencies]
+        with MockCoinGecko(latency=0.02, jitter=0.01, seed=1) as api:
+            # Ограничитель интерфейса исчерпан: следующий токен через 1000 секунд
+            with PriceClient(base_url=api.base_url, limiter=TokenBucket(0.001, 1)) as client:
+                client.get_price("bitcoin", "usd")
+                start = time.perf_counter()
+                price_data = asyncio.run(get_crypto_prices(pairs, client=client))
+                self.assertLess(time.perf_counter() - start, 5)
+            
+            self.assertEqual(api.total_requests(), 2)
+        
+        for crypto_id, fiat in pairs:
+            self.assertIn(fiat, price_data[crypto_id], f"Нет цены для пары {crypto_id}/{fiat}")
+        
+        print("✓ Тест пакетного получения цен через заменитель API прошел успешно")
+
+    def test_cross_rates_against_mock_api(self):
+        """
+        Тест кросс-курсов через базовую валюту на заменителе API
+        
+        Проверяет:
+        - Что для всех пар нужно ровно два запроса (/simple/price в USD и /exchange_rates)
+        - Что курсы криптовалюта/фиат совпадают с прямыми котировками в пределах погрешности
+        - Что выводятся курсы фиат/фиат и криптовалюта/криптовалюта
+        - Что котировка по кросс-курсу не содержит изменения за 24ч
+        """
+        with MockCoinGecko() as api:
+            with PriceClient(base_url=api.base_url, rate=None) as client:
+                rates = CrossRates()
+                self.assertTrue(rates.refresh(client))
+                self.assertEqual(api.total_requests(), 2)
+                self.assertEqual(api.counts["/exchange_rates"], 1)
+                
+                direct = fetch_rate_matrix(client=client)
+        
+        worst = rates.check(direct)
+        self.assertEqual(rates.checked, len(cryptocurrencies) * len(fiat_currencies))
+        self.assertLess(worst, 1e-9)
+        
+        # Показатель отражает последнюю проверку, наибольшее значение хранится отдельно
+        skewed = {"bitcoin": {"usd": direct["bitcoin"]["usd"] * 1.01}}
+        self.assertAlmostEqual(rates.check(skewed), 0.01 / 1.01)
+        self.assertEqual(rates.check(direct), rates.last_error)
+        self.assertLess(rates.last_error, 1e-9)
+        self.assertAlmostEqual(rates.peak_error, 0.01 / 1.01)
+        
+        # Проверка без общих пар не сбрасывает известное расхождение
+        last_error = rates.last_error
+        self.assertIsNone(rates.check({}))
+        self.assertIsNone(rates.check({"unknown-coin": {"usd": 1.0}}))
+        self.assertEqual(rates.last_error, last_error)
+        
+        # Погрешность учитывает наблюдаемое расхождение и округление целых котировок
+        rates.check(skewed)
+        self.assertGreater(rates.error_bound("bitcoin", "usd"), rates.last_error)
+        self.assertAlmostEqual(quoted_precision(65000), 0.5 * 1000 / 65000)
+        self.assertAlmostEqual(quoted_precision(65000.5), 0.5 * 0.1 / 65000.5)
+        self.assertAlmostEqual(quoted_precision(0.92), 0.5 * 0.01 / 0.92)
+        for crypto_id in cryptocurrencies:
+            for fiat in fiat_currencies:
+                self.assertLessEqual(abs(rates.rate(crypto_id, fiat) / direct[crypto_id][fiat] - 1),
+                                     rates.error_bound(crypto_id, fiat))
+        
+        self.assertAlmostEqual(rates.rate("eur", "usd"), 1 / 0.92)
+        self.assertAlmostEqual(rates.rate("ethereum", "bitcoin"), 3200.0 / 65000.0)
+        # Валюта вне встроенного списка доступна без отдельного запроса
+        self.assertAlmostEqual(rates.rate("bitcoin", "brl"), 65000.0 * 5.0)
+        
+        quote = rates.quote("bitcoin", "brl")["bitcoin"]
+        self.assertAlmostEqual(quote["brl"], 325000.0)
+        self.assertIn("brl_market_cap", quote)
+        self.assertNotIn("brl_24h_change", quote)
+        self.assertIsNone(rates.rate("bitcoin", "xyz"))
+        
+        print("✓ Тест кросс-курсов прошел успешно")
+
+    def test_route_conversion_outside_matrix(self):
+        """
+        Тест конвертации по маршруту для валют вне матрицы курсов
+        
+        Проверяет на заменителе API:
+        - Что фиатная валюта вне матрицы (BRL) достижима через кросс-курсы
+          и результат совпадает с котировкой get_quote
+        - Что криптовалюта вне встроенного списка добавляется в граф
+          отдельным запросом ее цены
+        - Что по истечении срока кросс-курсы запрашиваются снова, даже если
+          валюта уже есть в графе
+        """
+        from crypto_core import get_quote
+        
+        with MockCoinGecko(coins=list(cryptocurrencies) + ["pepe"]) as api:
+            with PriceClient(base_url=api.base_url, rate=None) as client:
+                with patch("crypto_core.price_client", client), patch("crypto_core.price_cache", QuoteCache()), \
+                        patch("cross_rates.cross_rates", CrossRates()):
+                    now = [0.0]
+                    clock = lambda: now[0]
+                    graph, matrix, rates = RateGraph(clock=clock), RateMatrix(clock=clock), CrossRates(clock=clock)
+                    conversion = find_conversion(1, "bitcoin", "brl", graph=graph, matrix=matrix, rates=rates)
+                    self.assertIsNotNone(conversion)
+                    self.assertEqual(len(conversion["path"]), 3)
+                    
+                    routed = find_conversion(1000, "pepe", "bitcoin", graph=graph, matrix=matrix, rates=rates)
+                    self.assertEqual(routed["path"], ["pepe", "usd", "bitcoin"])
+                    self.assertEqual(api.counts["/exchange_rates"], 1, "Кросс-курсы запрашиваются один раз")
+                    
+                    now[0] = 3600.0
+                    later = find_conversion(1, "bitcoin", "brl", graph=graph, matrix=matrix, rates=rates)
+                    self.assertEqual(api.counts["/exchange_rates"], 2, "Устаревшие кросс-курсы обновляются")
+                    self.assertEqual(rates.fetched_at, 3600.0)
+                    self.assertEqual(later["age"], 0.0)
+                    
+                    self.assertAlmostEqual(conversion["result"] / get_quote("bitcoin", "brl")["bitcoin"]["brl"], 1.0)
+        
+        print("✓ Тест конвертации по маршруту вне матрицы курсов прошел успешно")
+
+    def test_batch_convert_stream(self):
+        """
+        Тест потоковой пакетной конвертации CSV
+        
+        Файл обрабатывается порциями по две строки. Проверяет:
+        - Что курс каждой пары запрашивается только один раз
+        - Что новые пары из следующих порций дозапрашиваются
+        - Что некорректные строки и пары без цены помечаются ошибкой
+        - Что пара из неудавшегося запроса дозапрашивается до записи порции
+        """
+        source = io.StringIO(
+            "amount,fiat,crypto\n"
+            "1000,usd,bitcoin\n"
+            "500,USD,Bitcoin\n"
+            "1000,usd,bitcoin\n"
+            "300,eur,ethereum\n"
+            "abc,usd,bitcoin\n"
+            "10,usd,unknown-coin\n"
+        )
+        target = io.StringIO()
+        requested = []
+        
+        def fake_fetch(pairs):
+            requested.append(set(pairs))
+            prices = {("bitcoin", "usd"): 50000.0, ("ethereum", "eur"): 3000.0}
+            return {pair: prices.get(pair) for pair in pairs}
+        
+        stats = convert_stream(read_csv_rows(source), csv_row_writer(target),
+                               fetch_prices=fake_fetch, chunk_size=2)
+        
+        self.assertEqual(requested, [
+            {("bitcoin", "usd")},
+            {("ethereum", "eur")},
+            {("unknown-coin", "usd")},
+        ], "Каждая пара должна запрашиваться только один раз")
+        self.assertEqual(stats["rows"], 6)
+        self.assertEqual(stats["converted"], 4)
+        self.assertEqual(stats["errors"], 2)
+        
+        lines = target.getvalue().splitlines()
+        self.assertEqual(lines[0], "amount,fiat,crypto,price,crypto_amount,error")
+        self.assertEqual(lines[1], "1000,usd,bitcoin,50000.0,0.02,")
+        self.assertEqual(lines[4], "300,eur,ethereum,3000.0,0.1,")
+        self.assertTrue(lines[5].endswith("некорректная строка"))
+        self.assertTrue(lines[6].endswith("нет данных о цене"))
+        
+        # Первый запрос завершается ошибкой (пара не попадает в ответ), второй - успешно
+        requested.clear()
+        
+        def flaky_fetch(pairs):
+            requested.append(set(pairs))
+            return {} if len(requested) == 1 else {pair: 50000.0 for pair in pairs}
+        
+        rows = [{"amount": "1000", "fiat": "usd", "crypto": "bitcoin"}] * 3
+        stats = convert_stream(rows, lambda row: None, fetch_prices=flaky_fetch, chunk_size=10)
+        self.assertEqual(len(requested), 2, "После ошибки пара должна запрашиваться снова")
+        self.assertEqual(stats["converted"], 3, "Повтор выполняется до записи строк порции")
+        self.assertEqual(stats["errors"], 0)
+        
+        # Число попыток ограничено
+        requested.clear()
+        stats = convert_stream(rows * 2, lambda row: None, fetch_prices=lambda pairs: requested.append(pairs) or {},
+                               chunk_size=1, max_attempts=2)
+        self.assertEqual(len(requested), 2)
+        self.assertEqual(stats["errors"], 6)
+        
+        print("✓ Тест пакетной конвертации прошел успешно")
+
+    def test_parallel_test_runner(self):
+        """
+        Тест параллельного запуска тестов из run_all_tests.py
+        
+        Проверяет:
+        - Что тесты обоих модулей находятся по полным именам
+        - Что тесты выполняются в пуле процессов с замером длительности
+        - Что самые медленные тесты выбираются по убыванию длительности
+        """
+        from run_all_tests import discover_test_ids, run_parallel_tests, slowest_tests
+        
+        test_ids = discover_test_ids()
+        self.assertIn("test_integration.TestIntegration.test_batch_convert_stream", test_ids)
+        self.assertIn("test_crypto_currency.TestCryptoCurrency.test_cryptocurrencies_dict", test_ids)
+        
+        selected = ["test_integration.TestIntegration.test_batch_convert_stream",
+                    "test_crypto_currency.TestCryptoCurrency.test_cryptocurrencies_dict"]
+        with redirect_stdout(io.StringIO()):
+            results = run_parallel_tests(2, selected, slowest=1)
+        self.assertEqual(sorted(item["id"] for item in results), sorted(selected))
+        self.assertTrue(all(item["status"] == "ok" and item["duration"] > 0 for item in results))
+        
+        timings = [{"id": "a", "duration": 0.1}, {"id": "b", "duration": 0.3}, {"id": "c", "duration": 0.2}]
+        self.assertEqual([item["id"] for item in slowest_tests(timings, 2)], ["b", "c"])
+        
+        print("✓ Тест параллельного запуска тестов прошел успешно")
+
 
 def run_integration_tests():
     """
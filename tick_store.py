@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилище истории котировок в файлах, отображаемых в память (mmap)
+
+Каждая пара хранится в отдельном сегменте - файле с заголовком и
+записями фиксированной ширины (момент, id пары, цена, объем,
+капитализация), которые только дописываются в конец. Записи
+упорядочены по времени, поэтому выборка за период находится двоичным
+поиском, а NumPy-представление сегмента создается без копирования
+данных. В память подгружаются только читаемые страницы файла.
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from crypto_core import DATA_DIR
+
+
+# Каталог сегментов истории
+TICK_DIR = os.path.join(DATA_DIR, "ticks")
+
+# Формат записи: момент (unix time), id пары, цена, объем за 24ч, капитализация
+TICK_RECORD = struct.Struct("<dIddd")
+
+# Заголовок сегмента: сигнатура, версия, размер записи, id пары, число записей
+_HEADER = struct.Struct("<4sHHIQ")
+_HEADER_SIZE = 32
+_MAGIC = b"VTCK"
+_VERSION = 1
+
+# Начальная емкость сегмента в записях (файл растет удвоением)
+TICK_SEGMENT_CAPACITY = 1024
+
+
+def tick_dtype():
+    """Структурный тип NumPy, совпадающий с форматом записи"""
+    import numpy as np
+    return np.dtype([("ts", "<f8"), ("pair_id", "<u4"), ("price", "<f8"),
+                     ("volume", "<f8"), ("market_cap", "<f8")])
+
+
+class TickSegment:
+    """Файл истории одной пары с дописыванием записей в конец"""
+
+    def __init__(self, path, pair_id, capacity=TICK_SEGMENT_CAPACITY):
+        self.path = path
+        self.pair_id = pair_id
+        exists = os.path.exists(path) and os.path.getsize(path) >= _HEADER_SIZE
+        self._file = open(path, "r+b" if exists else "w+b")
+        if not exists:
+            self._file.truncate(_HEADER_SIZE + capacity * TICK_RECORD.size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+        if exists:
+            magic, version, record_size, pair_id, count = _HEADER.unpack_from(self._map, 0)
+            if magic != _MAGIC or version != _VERSION or record_size != TICK_RECORD.size:
+                raise ValueError(f"Неверный формат сегмента истории: {path}")
+            self.pair_id = pair_id
+            self.count = count
+        else:
+            self.count = 0
+            self._write_header()
+
+    def _write_header(self):
+        _HEADER.pack_into(self._map, 0, _MAGIC, _VERSION, TICK_RECORD.size, self.pair_id, self.count)
+
+    @property
+    def capacity(self):
+        return (len(self._map) - _HEADER_SIZE) // TICK_RECORD.size
+
+    def _grow(self):
+        self._map.flush()
+        self._file.truncate(_HEADER_SIZE + 2 * self.capacity * TICK_RECORD.size)
+        # Старое отображение не закрывается явно: на него могут ссылаться
+        # выданные ранее представления NumPy, оно освободится вместе с ними
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def last_ts(self):
+        """Момент последней записи или None"""
+        if not self.count:
+            return None
+        return TICK_RECORD.unpack_from(self._map, self._offset(self.count - 1))[0]
+
+    @staticmethod
+    def _offset(index):
+        return _HEADER_SIZE + index * TICK_RECORD.size
+
+    def append(self, ts, price, volume=math.nan, market_cap=math.nan):
+        """Добавление записи; записи не новее последней пропускаются"""
+        last_ts = self.last_ts()
+        if last_ts is not None and ts <= last_ts:
+            return False
+        if self.count == self.capacity:
+            self._grow()
+
+        TICK_RECORD.pack_into(self._map, self._offset(self.count), ts, self.pair_id, price, volume, market_cap)
+        # Счетчик в заголовке обновляется после записи, поэтому при сбое
+        # недописанная запись просто не учитывается
+        self.count += 1
+        self._write_header()
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return TICK_RECORD.unpack_from(self._map, self._offset(index))
+
+    def _bounds(self, start, end):
+        timestamps = _Timestamps(self)
+        lo = 0 if start is None else bisect_left(timestamps, start)
+        hi = self.count if end is None else bisect_right(timestamps, end)
+        return lo, max(lo, hi)
+
+    def range(self, start=None, end=None):
+        """Записи за период [start, end] в виде кортежей"""
+        lo, hi = self._bounds(start, end)
+        return [self[index] for index in range(lo, hi)]
+
+    def array(self, start=None, end=None):
+        """Записи за период в виде структурного массива NumPy без копирования"""
+        import numpy as np
+        view = np.frombuffer(self._map, dtype=tick_dtype(), count=self.count, offset=_HEADER_SIZE)
+        timestamps = view["ts"]
+        lo = 0 if start is None else np.searchsorted(timestamps, start, "left")
+        hi = self.count if end is None else np.searchsorted(timestamps, end, "right")
+        return view[lo:hi]
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        self._map.flush()
+        self._file.close()
+
+
+class _Timestamps:
+    """Последовательность моментов записей сегмента для двоичного поиска"""
+
+    def __init__(self, segment):
+        self._segment = segment
+
+    def __len__(self):
+        return len(self._segment)
+
+    def __getitem__(self, index):
+        return TICK_RECORD.unpack_from(self._segment._map, TickSegment._offset(index))[0]
+
+
+class TickStore:
+    """История котировок всех пар: по одному сегменту на пару"""
+
+    def __init__(self, directory=TICK_DIR, clock=time.time):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._segments = {}
+        self._closed = False
+        self._pairs_path = os.path.join(directory, "pairs.json")
+        self._pair_ids = self._read_pairs()
+
+    def _read_pairs(self):
+        try:
+            with open(self._pairs_path, encoding="utf-8") as pairs_file:
+                return {tuple(pair): pair_id for pair, pair_id in json.load(pairs_file)}
+        except (OSError, ValueError):
+            return {}
+
+    def _write_pairs(self):
+        tmp_path = f"{self._pairs_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as pairs_file:
+            json.dump([[list(pair), pair_id] for pair, pair_id in self._pair_ids.items()], pairs_file)
+        os.replace(tmp_path, self._pairs_path)
+
+    def pair_id(self, pair):
+        """Постоянный числовой id пары (новые пары регистрируются)"""
+        pair_id = self._pair_ids.get(pair)
+        if pair_id is None:
+            pair_id = len(self._pair_ids)
+            self._pair_ids[pair] = pair_id
+            self._write_pairs()
+        return pair_id
+
+    def pairs(self):
+        """Все пары, для которых есть история"""
+        return list(self._pair_ids)
+
+    def segment(self, pair):
+        """Сегмент истории пары (создается при первом обращении)"""
+        segment = self._segments.get(pair)
+        if segment is None:
+            crypto_id, vs_currency = pair
+            path = os.path.join(self.directory, f"{crypto_id}--{vs_currency}.ticks")
+            segment = TickSegment(path, self.pair_id(pair))
+            self._segments[pair] = segment
+        return segment
+
+    def append(self, pair, ts, price, volume=math.nan, market_cap=math.nan):
+        """Добавление записи в историю пары"""
+        with self._lock:
+            # Фоновые потоки могут обновлять кэш и после закрытия хранилища
+            if self._closed:
+                return False
+            return self.segment(pair).append(ts, price, volume, market_cap)
+
+    def add(self, pair, quote, ts=None):
+        """Добавление котировки в формате get_crypto_price (интерфейс хранилища кэша)"""
+        crypto_id, vs_currency = pair
+        crypto_data = (quote or {}).get(crypto_id) or {}
+        price = crypto_data.get(vs_currency)
+        if price is None:
+            return False
+
+        # Момент котировки берется из CoinGecko, поэтому повторно полученная
+        # та же котировка не создает новую запись
+        if ts is None:
+            ts = crypto_data.get("last_updated_at") or self._clock()
+
+        def number(field):
+            value = crypto_data.get(field)
+            return math.nan if value is None else value
+
+        return self.append(pair, ts, price, number(f"{vs_currency}_24h_vol"), number(f"{vs_currency}_market_cap"))
+
+    def range(self, pair, start=None, end=None):
+        """Записи пары за период [start, end] в виде кортежей"""
+        with self._lock:
+            if pair not in self._pair_ids:
+                return []
+            return self.segment(pair).range(start, end)
+
+    def array(self, pair, start=None, end=None):
+        """Записи пары за период в виде массива NumPy без копирования
+
+        Представление действительно до закрытия хранилища; новые записи
+        в него не попадают.
+        """
+        with self._lock:
+            if pair not in self._pair_ids:
+                import numpy as np
+                return np.empty(0, dtype=tick_dtype())
+            return self.segment(pair).array(start, end)
+
+    def flush(self):
+        """Сброс изменений всех сегментов на диск"""
+        with self._lock:
+            for segment in self._segments.values():
+                segment.flush()
+
+    def close(self):
+        """Сброс изменений и закрытие файлов"""
+        with self._lock:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+            self._closed = True
+
+
+def open_tick_store(directory=TICK_DIR):
+    """Открытие хранилища истории (None, если каталог недоступен)"""
+    try:
+        return TickStore(directory)
+    except OSError as e:
+        print(f"Не удалось открыть историю котировок {directory}: {e}", file=sys.stderr)
+        return None